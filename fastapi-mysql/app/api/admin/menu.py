@@ -4,6 +4,7 @@ from app.auth.deps import admin_required
 from app.db import execute, fetch_one
 from app.services.images import process_and_save
 from app.services.media_proxy import gen_signed_url
+from app.services.menu_cache import menu_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -23,6 +24,7 @@ async def create_category(data: dict, user=Depends(admin_required)):
             int(data.get("sort_order") or 0),
         ),
     )
+    await menu_cache.publish(await menu_cache.bump(changes=[("category", cid)]))
     return {"id": cid}
 
 @router.post("/items")
@@ -33,7 +35,7 @@ async def create_item(data: dict, user=Depends(admin_required)):
         INSERT INTO items (id, category_id, title_i18n, description_i18n, price, tax_class,
                            dietary_tags, availability, sort_order, image_path, is_86, active)
         VALUES (%s, %s, %s, %s, %s, %s,
-                %s, NULL, %s, %s, 0, 1)
+                %s, %s, %s, %s, 0, 1)
         """,
         (
             iid,
@@ -43,10 +45,12 @@ async def create_item(data: dict, user=Depends(admin_required)):
             str(data.get("price", "0.00")),
             data.get("tax_class") or "standard",
             json.dumps(data.get("dietary_tags") or []),
+            json.dumps(data["availability"]) if data.get("availability") else None,
             int(data.get("sort_order") or 0),
             data.get("image_path"),
         ),
     )
+    await menu_cache.publish(await menu_cache.bump(changes=[("item", iid)]))
     return {"id": iid}
 
 @router.post("/media")
@@ -1,59 +1,67 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.db import fetch_one, fetch_all
-from app.schemas.common import CategoryOut, ItemOut
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from app.tokens import extract_opaque
+from app.services.menu_cache import menu_cache, etag_matches
+from app.services.locales import negotiate
+from app.services.availability import overlay
+from app.services.tables import table_resolver
 
 router = APIRouter(prefix="/api/public", tags=["public"])
 
-@router.get("/menu", response_model=dict)
-async def get_menu(table_token: str = Query(...)):
+@router.get("/menu")
+async def get_menu(request: Request, table_token: str = Query(...), lang: str | None = Query(None)):
     opaque = extract_opaque(table_token)
     if not opaque:
         raise HTTPException(400, "Invalid table token")
 
-    table = await fetch_one("SELECT id FROM tables WHERE opaque_uid=%s LIMIT 1", (opaque,))
-    if not table:
+    if not await table_resolver.resolve(opaque):
         raise HTTPException(404, "Unknown table")
 
-    cats = await fetch_all(
-        "SELECT id, title_i18n, description_i18n, sort_order FROM categories WHERE active=1 ORDER BY sort_order"
-    )
-    items = await fetch_all(
-        """
-        SELECT id, category_id, title_i18n, description_i18n, price, tax_class, dietary_tags,
-               sort_order, image_path, is_86
-        FROM items
-        WHERE active=1
-        ORDER BY sort_order
-        """
-    )
-
-    def url_for(image_path):
-        return f"/media/{image_path}" if image_path else None
-
-    return {
-        "categories": [
-            CategoryOut(
-                id=c["id"],
-                title_i18n=c.get("title_i18n") or {},
-                description_i18n=c.get("description_i18n") or {},
-                sort_order=c["sort_order"],
-            ).model_dump()
-            for c in cats
-        ],
-        "items": [
-            ItemOut(
-                id=i["id"],
-                category_id=i.get("category_id"),
-                title_i18n=i.get("title_i18n") or {},
-                description_i18n=i.get("description_i18n") or {},
-                price=str(i["price"]),
-                tax_class=i["tax_class"],
-                dietary_tags=i.get("dietary_tags") or [],
-                sort_order=i["sort_order"],
-                image_url=url_for(i.get("image_path")),
-                is_86=bool(i["is_86"]),
-            ).model_dump()
-            for i in items
-        ],
-    }
+    # Served from the process-wide snapshot; the DB is only read when the menu version moves.
+    snap = await menu_cache.get()
+    headers = {"Cache-Control": "no-cache"}
+    if lang is not None:
+        # Single-locale projection; unsupported or "auto" falls back to Accept-Language.
+        lang = negotiate(lang, request.headers.get("accept-language"))
+        headers.update({"Vary": "Accept-Language", "Content-Language": lang})
+    # Only items orderable right now (dayparts/date ranges); clients refetch at the next boundary.
+    body, etag = snap.view(lang)
+    headers["ETag"] = etag
+    next_change = snap.schedule.next_change()
+    if next_change:
+        headers["X-Menu-Valid-Until"] = str(int(next_change.timestamp()))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/menu/changes")
+async def get_menu_changes(request: Request, since: str = Query(...), table_token: str = Query(...), lang: str | None = Query(None)):
+    opaque = extract_opaque(table_token)
+    if not opaque:
+        raise HTTPException(400, "Invalid table token")
+
+    if not await table_resolver.resolve(opaque):
+        raise HTTPException(404, "Unknown table")
+
+    if lang is not None:
+        lang = negotiate(lang, request.headers.get("accept-language"))
+    body = await menu_cache.changes_since(since, lang)
+    if body is None:
+        # Version unknown here (never existed or pruned): the client must refetch /menu.
+        raise HTTPException(410, "Unknown menu version")
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
+
+@router.get("/menu/availability")
+async def get_menu_availability(request: Request, table_token: str = Query(...)):
+    # Hot 86 overlay, fetched apart from the cached menu body (pushed as availability_changed).
+    opaque = extract_opaque(table_token)
+    if not opaque:
+        raise HTTPException(400, "Invalid table token")
+
+    if not await table_resolver.resolve(opaque):
+        raise HTTPException(404, "Unknown table")
+
+    await overlay.refresh()
+    headers = {"ETag": overlay.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), overlay.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=overlay.body, media_type="application/json", headers=headers)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.auth.deps import staff_required
+from app.db import execute, fetch_one
+from app.schemas.staff import AvailabilityIn
+from app.services.availability import overlay
+
+router = APIRouter(prefix="/api/staff", tags=["staff"])
+
+@router.post("/items/{item_id}/availability")
+async def set_item_availability(item_id: str, payload: AvailabilityIn, user=Depends(staff_required)):
+    # 86 toggles only touch the overlay; the cached menu version stays put.
+    row = await fetch_one("SELECT id FROM items WHERE id=%s LIMIT 1", (item_id,))
+    if not row:
+        raise HTTPException(404, "item not found")
+    await execute("UPDATE items SET is_86=%s WHERE id=%s", (0 if payload.available else 1, item_id))
+    await overlay.set(item_id, payload.available)
+    return {"ok": True, "item_id": item_id, "available": payload.available}
@@ -1,51 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64, json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from app.auth.deps import staff_required
-from app.db import fetch_all, fetch_one, execute
+from app.db import UnitOfWork, fetch_all, fetch_one
 from app.schemas.staff import ActionIn
-from app.redis_ext import redis, channel_for_table, channel_staff
-import json
+from app.services.outbox import stage, outbox_relay
+from app.services.intake import intake_workers
 
 router = APIRouter(prefix="/api/staff", tags=["staff"])
 
-def _to_row(o):
+def _to_row(o, items: list[dict]):
+    created = o.get("created_at")
     return {
         "id": o["id"],
         "table_id": o["table_id"],
         "state": o["state"],
-        "items": [],
-        "created_at": (o.get("created_at") or "").isoformat() if o.get("created_at") else "",
-        "elapsed_s": 0,
+        "items": items,
+        "created_at": created.isoformat() if created else "",
+        "elapsed_s": max(0, int((o["now"] - created).total_seconds())) if created else 0,
+        "ticket_s": o.get("ticket_seconds"),
     }
 
+def _to_item(i) -> dict:
+    options = i["options"]
+    return {
+        "id": i["id"],
+        "item_id": i["item_id"],
+        "title": i["title_snapshot"],
+        "quantity": i["quantity"],
+        "options": json.loads(options) if isinstance(options, (str, bytes)) else options or {},
+        "notes": i["notes"],
+        "state": i["state"],
+    }
+
+# One encoder for every listing, built once; rows hold only JSON-native values,
+# so nothing goes through FastAPI's per-field response encoding.
+_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, check_circular=False).encode
+
+# Orders page on (state, created_at, id), newest first within a state, each state
+# read as one range of idx_orders_state_created; a page touches at most one range
+# per listed state, however many orders the table has accumulated.
+ACTIVE_STATES = ("submitted", "accepted", "in_prep", "ready")
+ALL_STATES = ACTIVE_STATES + ("served", "voided", "comped")
+
+def _states(state: str | None) -> list[str]:
+    if not state:
+        return list(ACTIVE_STATES)
+    if state == "all":
+        return list(ALL_STATES)
+    return sorted({s for s in state.split(",") if s})
+
+def _encode_cursor(o) -> str:
+    return base64.urlsafe_b64encode(json.dumps([o["state"], o["created_at"].isoformat(), o["id"]]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[str, datetime, str]:
+    try:
+        state, created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return state, datetime.fromisoformat(created_at), order_id
+    except Exception:
+        raise HTTPException(400, "bad cursor")
+
+# One LIMITed branch per state, each a range of idx_orders_state_created, merged
+# in a single statement. CURRENT_TIMESTAMP is read with the rows, so timers run on
+# the clock that stamped created_at.
+_BRANCH_SQL = ("SELECT * FROM (SELECT id, table_id, state, created_at, ticket_seconds FROM orders "
+               "WHERE state=%s{after} ORDER BY created_at DESC, id DESC LIMIT %s) s{n}")
+_PAGE_SQL = "SELECT p.*, CURRENT_TIMESTAMP AS now FROM ({branches}) p ORDER BY state DESC, created_at DESC, id DESC LIMIT %s"
+# (created_at, id) < cursor, spelled out: MySQL does not always turn a row comparison
+# into an index range, but the plain created_at bound always is one.
+_AFTER_SQL = " AND created_at <= %s AND (created_at < %s OR id < %s)"
+_ITEMS_SQL = ("SELECT id, order_id, item_id, title_snapshot, quantity, options, notes, state "
+              "FROM order_items WHERE order_id IN ({ids}) ORDER BY created_at, id")
+
 @router.get("/orders")
-async def list_orders(state: str | None = None, user=Depends(staff_required)):
-    if state:
-        rows = await fetch_all(
-            "SELECT id, table_id, state, created_at FROM orders WHERE state=%s ORDER BY created_at DESC",
-            (state,),
-        )
-    else:
-        rows = await fetch_all(
-            "SELECT id, table_id, state, created_at FROM orders ORDER BY created_at DESC"
-        )
-    return {"orders": [_to_row(r) for r in rows]}
+async def list_orders(state: str | None = None, cursor: str | None = None, limit: int = Query(50, ge=1, le=200),
+                      user=Depends(staff_required)):
+    """Active orders by default; `state` takes one state, a comma-separated list or "all".
+    Pass the returned next_cursor to get the following page.
 
-async def _broadcast_state(table_id: int, order_id: str, new_state: str):
-    msg = json.dumps({"event": "order_state_changed", "data": {"order_id": order_id, "state": new_state}})
-    await redis.publish(channel_for_table(table_id), msg)
-    await redis.publish(channel_staff(), msg)
+    Two queries per page: the orders, and all of their lines by order id."""
+    after = _decode_cursor(cursor) if cursor else None
+    branches, params = [], []
+    for st in _states(state):
+        if after and st > after[0]:
+            continue  # pages before the cursor already covered this state
+        if after and st == after[0]:
+            branches.append(_BRANCH_SQL.format(after=_AFTER_SQL, n=len(branches)))
+            params += [st, after[1], after[1], after[2], limit + 1]
+        else:
+            branches.append(_BRANCH_SQL.format(after="", n=len(branches)))
+            params += [st, limit + 1]
+    rows = []
+    if branches:
+        rows = await fetch_all(_PAGE_SQL.format(branches=" UNION ALL ".join(branches)), (*params, limit + 1))
+    page = rows[:limit]
+    items: dict[str, list[dict]] = {r["id"]: [] for r in page}
+    if page:
+        for i in await fetch_all(_ITEMS_SQL.format(ids=", ".join(["%s"] * len(items))), tuple(items)):
+            items[i["order_id"]].append(_to_item(i))
+    body = {"orders": [_to_row(r, items[r["id"]]) for r in page],
+            "next_cursor": _encode_cursor(page[-1]) if len(rows) > limit else None}
+    return Response(_encode(body).encode(), media_type="application/json")
 
-async def _update_state(order_id: str, new_state: str, user):
+async def _update_state(order_id: str, new_state: str, user, reason: str | None = None):
     o = await fetch_one("SELECT id, table_id FROM orders WHERE id=%s LIMIT 1", (order_id,))
     if not o:
         raise HTTPException(404, "order not found")
-    await execute("UPDATE orders SET state=%s WHERE id=%s", (new_state, order_id))
-    await execute(
+    # Transition, audit event and outbox row commit together; see app.services.outbox.
+    uow = UnitOfWork()
+    if new_state == "served":
+        # Time to serve, on the database clock that stamped created_at.
+        uow.execute("UPDATE orders SET state=%s, ticket_seconds=TIMESTAMPDIFF(SECOND, created_at, NOW()) WHERE id=%s",
+                    (new_state, order_id))
+    else:
+        uow.execute("UPDATE orders SET state=%s WHERE id=%s", (new_state, order_id))
+    uow.execute(
         "INSERT INTO order_events (order_id, order_item_id, actor_user_id, actor_table_user, action, reason) "
-        "VALUES (%s, NULL, %s, NULL, %s, NULL)",
-        (order_id, user["uid"], new_state),
+        "VALUES (%s, NULL, %s, NULL, %s, %s)",
+        (order_id, user["uid"], new_state, reason),
     )
-    await _broadcast_state(o["table_id"], order_id, new_state)
+    stage(uow, o["table_id"], "order_state_changed", {"order_id": order_id, "state": new_state})
+    await uow.commit()
+    outbox_relay.kick()
     return {"ok": True, "state": new_state}
 
 @router.post("/orders/{order_id}/accept")
@@ -62,14 +138,9 @@ async def served_order(order_id: str, user=Depends(staff_required)):
 
 @router.post("/orders/{order_id}/void")
 async def void_order(order_id: str, payload: ActionIn, user=Depends(staff_required)):
-    o = await fetch_one("SELECT id, table_id FROM orders WHERE id=%s LIMIT 1", (order_id,))
-    if not o:
-        raise HTTPException(404, "order not found")
-    await execute("UPDATE orders SET state='voided' WHERE id=%s", (order_id,))
-    await execute(
-        "INSERT INTO order_events (order_id, order_item_id, actor_user_id, actor_table_user, action, reason) "
-        "VALUES (%s, NULL, %s, NULL, 'voided', %s)",
-        (order_id, user["uid"], (payload.reason or "")[:255]),
-    )
-    await _broadcast_state(o["table_id"], order_id, "voided")
-    return {"ok": True, "state": "voided"}
+    return await _update_state(order_id, "voided", user, (payload.reason or "")[:255])
+
+@router.get("/intake")
+async def intake_stats(user=Depends(staff_required)):
+    """Order intake queue depth, in-flight count and lag (see app.services.intake)."""
+    return await intake_workers.stats()
@@ -17,17 +17,36 @@ class Settings(BaseModel):
     token_key_k0: str = os.getenv("TOKEN_KEY_K0", "dev-k0")
     session_secret: str = os.getenv("SESSION_SECRET", "dev-session-secret")
     csrf_salt: str = os.getenv("CSRF_SALT", "dev-csrf-salt")
+    token_memo_size: int = int(os.getenv("TOKEN_MEMO_SIZE", "4096"))
+    idempotency_memo_size: int = int(os.getenv("IDEMPOTENCY_MEMO_SIZE", "4096"))
     cookie_domain: str = os.getenv("COOKIE_DOMAIN", "localhost")
     cors_allowlist: str = os.getenv("CORS_ALLOWLIST", "http://localhost:8000")
     csp_default_src: str = os.getenv("CSP_DEFAULT_SRC", "'self'")
     csp_img_src: str = os.getenv("CSP_IMG_SRC", "'self' data:")
     csp_connect_src: str = os.getenv("CSP_CONNECT_SRC", "'self'")
     currency: str = os.getenv("CURRENCY", "USD")
+    tax_rates: str = os.getenv("TAX_RATES", "standard:0.10")  # tax_class:rate,...
     locale_default: str = os.getenv("LOCALE_DEFAULT", "en")
     locales: str = os.getenv("LOCALES", "en,ja")
+    timezone: str = os.getenv("TIMEZONE", "UTC")  # wall clock for item dayparts
     media_root: str = os.getenv("MEDIA_ROOT", "./media")
     media_base_url: str = os.getenv("MEDIA_BASE_URL", "/media")
     media_sign_key: str = os.getenv("MEDIA_SIGN_KEY", "dev-media-sign")
+    menu_cache_check_seconds: float = float(os.getenv("MENU_CACHE_CHECK_SECONDS", "2"))
+    availability_check_seconds: float = float(os.getenv("AVAILABILITY_CHECK_SECONDS", "1"))
+    table_cache_ttl_seconds: float = float(os.getenv("TABLE_CACHE_TTL_SECONDS", "60"))
+    session_flush_seconds: float = float(os.getenv("SESSION_FLUSH_SECONDS", "5"))
+    cart_backend: str = os.getenv("CART_BACKEND", "db")  # db | redis
+    cart_flush_seconds: float = float(os.getenv("CART_FLUSH_SECONDS", "2"))
+    cart_ttl_seconds: int = int(os.getenv("CART_TTL_SECONDS", "86400"))
+    cart_lease_ms: int = int(os.getenv("CART_LEASE_MS", "5000"))
+    cart_lease_wait_seconds: float = float(os.getenv("CART_LEASE_WAIT_SECONDS", "10"))
+    outbox_poll_seconds: float = float(os.getenv("OUTBOX_POLL_SECONDS", "0.5"))
+    outbox_batch_size: int = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+    order_intake: str = os.getenv("ORDER_INTAKE", "sync")  # sync | queue
+    intake_consumers: int = int(os.getenv("INTAKE_CONSUMERS", "2"))
+    intake_batch_size: int = int(os.getenv("INTAKE_BATCH_SIZE", "50"))
+    intake_give_up_seconds: float = float(os.getenv("INTAKE_GIVE_UP_SECONDS", "60"))
     rate_limit_public: str = os.getenv("RATE_LIMIT_PUBLIC", "30/minute")
     qr_output_dir: str = os.getenv("QR_OUTPUT_DIR", "./qr")
 settings = Settings()
@@ -79,3 +79,39 @@ async def fetch_one(sql: str, params=None):
 
 async def fetch_all(sql: str, params=None):
     return await anyio.to_thread.run_sync(fetch_all_sync, sql, params)
+
+
+class UnitOfWork:
+    """Statements queued with execute()/executemany() and run by commit() on one
+    pooled connection, in one transaction and a single thread hop. Nothing touches
+    the database before commit(); if any statement fails, none of them apply."""
+    def __init__(self):
+        self.steps: list[tuple[bool, str, object]] = []
+        self.required: dict[int, Exception] = {}  # step index -> raised if it changes no row
+
+    def execute(self, sql: str, params=None):
+        self.steps.append((False, sql, params or ()))
+
+    def executemany(self, sql: str, seq):
+        self.steps.append((True, sql, list(seq)))
+
+    def require(self, sql: str, params, error: Exception):
+        """Queue a statement that must change a row: if it changes none, commit()
+        rolls the whole unit back and raises `error`."""
+        self.required[len(self.steps)] = error
+        self.execute(sql, params)
+
+    async def commit(self):
+        steps, self.steps = self.steps, []
+        required, self.required = self.required, {}
+        await anyio.to_thread.run_sync(_run_steps_sync, steps, required)
+
+def _run_steps_sync(steps, required=None):
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            for n, (many, sql, params) in enumerate(steps):
+                if many:
+                    if params:
+                        cur.executemany(sql, params)
+                elif not cur.execute(sql, params) and required and n in required:
+                    raise required[n]
@@ -12,10 +12,15 @@ from app.api.public.cart import router as public_cart_router
 from app.api.staff import router as staff_router
 from app.api.staff.auth import router as staff_auth_router
 from app.api.staff.orders import router as staff_orders_router
+from app.api.staff.menu import router as staff_menu_router
 from app.api.admin import router as admin_router
 from app.api.admin.menu import router as admin_menu_router
 from app.ws.routes import router as ws_router
-from app.db import fetch_one
+from app.services.tables import table_resolver
+from app.services.session_tracker import session_tracker
+from app.services.cart_store import cart_store
+from app.services.outbox import outbox_relay
+from app.services.intake import intake_workers
 
 app = FastAPI(title=settings.app_name)
 
@@ -42,10 +47,23 @@ app.include_router(public_cart_router)
 app.include_router(staff_router)
 app.include_router(staff_auth_router)
 app.include_router(staff_orders_router)
+app.include_router(staff_menu_router)
 app.include_router(admin_router)
 app.include_router(admin_menu_router)
 app.include_router(ws_router)
 
+@app.on_event("startup")
+async def start_background_workers():
+    outbox_relay.start()  # also relays events a previous process committed but never published
+    await intake_workers.start()  # no-op unless ORDER_INTAKE=queue
+
+@app.on_event("shutdown")
+async def flush_write_behind():
+    await session_tracker.close()
+    await cart_store.close()
+    await intake_workers.close()
+    await outbox_relay.close()
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.get("/", response_class=HTMLResponse)
@@ -54,8 +72,8 @@ async def home():
 
 @app.get("/t/{opaque}", response_class=HTMLResponse)
 async def table_entry(opaque: str, request: Request, response: Response):
-    row = await fetch_one("SELECT id FROM tables WHERE opaque_uid = %s LIMIT 1", (opaque,))
-    if not row:
+    table = await table_resolver.resolve(opaque)
+    if not table:
         return HTMLResponse("<h1>Invalid table</h1>", status_code=404)
     html = open("static/table/index.html", "r", encoding="utf-8").read()
     return HTMLResponse(html)
@@ -60,4 +60,14 @@ DDL = [
       KEY idx_mv_token (version_token)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
+    ,
+    """
+    CREATE TABLE IF NOT EXISTS menu_changes (
+      id INT AUTO_INCREMENT PRIMARY KEY,
+      version_id INT NOT NULL,
+      entity VARCHAR(16) NOT NULL,
+      entity_id CHAR(36) NOT NULL,
+      KEY idx_mc_version (version_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    """
 ]
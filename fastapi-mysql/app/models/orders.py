@@ -3,8 +3,9 @@ DDL = [
     CREATE TABLE IF NOT EXISTS carts (
       id CHAR(36) PRIMARY KEY,
       table_id INT NOT NULL,
+      fence BIGINT NOT NULL DEFAULT 0,
       created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
-      KEY idx_carts_table (table_id)
+      UNIQUE KEY ux_carts_table (table_id)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
     ,
@@ -18,6 +19,7 @@ DDL = [
       notes VARCHAR(280) NULL,
       added_by VARCHAR(64) NOT NULL,
       state VARCHAR(16) NOT NULL DEFAULT 'in_cart',
+      version INT NOT NULL DEFAULT 0,
       created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
       updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
       KEY idx_ci_cart (cart_id),
@@ -39,7 +41,8 @@ DDL = [
       updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
       menu_version VARCHAR(64) NULL,
       ticket_seconds INT NULL,
-      KEY idx_orders_table (table_id)
+      KEY idx_orders_table (table_id),
+      KEY idx_orders_state_created (state, created_at, id)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
     ,
@@ -72,4 +75,13 @@ DDL = [
       KEY idx_oe_order (order_id)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
+    ,
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+      id BIGINT AUTO_INCREMENT PRIMARY KEY,
+      table_id INT NULL,
+      message MEDIUMTEXT NOT NULL,
+      created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    """
 ]
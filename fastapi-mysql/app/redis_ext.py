@@ -11,3 +11,9 @@ def channel_for_table(table_id: int) -> str:
 
 def channel_staff() -> str:
     return "staff:all"
+
+def channel_menu() -> str:
+    return "menu:all"
+
+def channel_tables() -> str:
+    return "tables:invalidate"
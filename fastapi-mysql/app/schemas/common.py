@@ -11,6 +11,21 @@ class CategoryOut(BaseModel):
     description_i18n: Dict[str, str] = {}
     sort_order: int
 
+class OptionOut(BaseModel):
+    id: str
+    name_i18n: Dict[str, str] = {}
+    price_delta: str
+    max_per_item: int
+    is_exclusion: bool = False
+
+class OptionGroupOut(BaseModel):
+    id: str
+    name_i18n: Dict[str, str] = {}
+    required: bool = False
+    min_qty: int
+    max_qty: int
+    options: List[OptionOut] = []
+
 class ItemOut(BaseModel):
     id: str
     category_id: str | None = None
@@ -21,4 +36,37 @@ class ItemOut(BaseModel):
     dietary_tags: List[str] = []
     sort_order: int
     image_url: str | None = None
-    is_86: bool = False
+    option_groups: List[OptionGroupOut] = []
+
+class CategoryLocalizedOut(BaseModel):
+    id: str
+    title: str | None = None
+    description: str | None = None
+    sort_order: int
+
+class OptionLocalizedOut(BaseModel):
+    id: str
+    name: str | None = None
+    price_delta: str
+    max_per_item: int
+    is_exclusion: bool = False
+
+class OptionGroupLocalizedOut(BaseModel):
+    id: str
+    name: str | None = None
+    required: bool = False
+    min_qty: int
+    max_qty: int
+    options: List[OptionLocalizedOut] = []
+
+class ItemLocalizedOut(BaseModel):
+    id: str
+    category_id: str | None = None
+    title: str | None = None
+    description: str | None = None
+    price: str
+    tax_class: str
+    dietary_tags: List[str] = []
+    sort_order: int
+    image_url: str | None = None
+    option_groups: List[OptionGroupLocalizedOut] = []
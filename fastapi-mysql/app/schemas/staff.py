@@ -22,3 +22,6 @@ class OrderRow(BaseModel):
 
 class ActionIn(BaseModel):
     reason: Optional[str] = None
+
+class AvailabilityIn(BaseModel):
+    available: bool
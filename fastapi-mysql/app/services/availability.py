@@ -0,0 +1,52 @@
+import hashlib, json, time
+from app.db import fetch_all
+from app.config import settings
+from app.redis_ext import redis, channel_menu
+
+# Hot 86 state, kept out of the cached menu document so flipping it never
+# invalidates the snapshot. Redis hash: item_id -> "1" (available) / "0" (86'd);
+# items without a field are available.
+AVAIL_KEY = "menu:avail"
+_SEEDED = "_seeded"
+
+class AvailabilityOverlay:
+    def __init__(self):
+        self.flags: dict[str, bool] = {}
+        self.body = b'{"unavailable":[]}'
+        self.etag = '"a0"'
+        self._synced_at = 0.0
+
+    async def refresh(self, force: bool = False):
+        if not force and time.monotonic() - self._synced_at < settings.availability_check_seconds:
+            return
+        raw = await redis.hgetall(AVAIL_KEY)
+        if _SEEDED not in raw:
+            raw = await self._seed()
+        self._apply({k: v == "1" for k, v in raw.items() if k != _SEEDED})
+        self._synced_at = time.monotonic()
+
+    async def _seed(self) -> dict:
+        rows = await fetch_all("SELECT id FROM items WHERE is_86=1")
+        mapping = {r["id"]: "0" for r in rows}
+        mapping[_SEEDED] = "1"
+        await redis.hset(AVAIL_KEY, mapping=mapping)
+        return mapping
+
+    def _apply(self, flags: dict[str, bool]):
+        if flags == self.flags:
+            return
+        self.flags = flags
+        self.body = json.dumps({"unavailable": sorted(k for k, v in flags.items() if not v)}, separators=(",", ":")).encode()
+        self.etag = '"a' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+
+    async def is_available(self, item_id: str) -> bool:
+        await self.refresh()
+        return self.flags.get(item_id, True)
+
+    async def set(self, item_id: str, available: bool):
+        await redis.hset(AVAIL_KEY, item_id, "1" if available else "0")
+        self._apply({**self.flags, item_id: available})
+        msg = json.dumps({"event": "availability_changed", "data": {"item_id": item_id, "available": available}})
+        await redis.publish(channel_menu(), msg)
+
+overlay = AvailabilityOverlay()
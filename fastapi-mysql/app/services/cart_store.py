@@ -0,0 +1,325 @@
+import asyncio, json, time, uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from app.config import settings
+import anyio
+from app.db import UnitOfWork, get_conn, fetch_all, executemany
+from app.redis_ext import redis
+from app.services.outbox import stage, message, publish_to, outbox_relay
+from app.services.cart_lock import LeaseLost
+
+# Cart persistence behind one interface so the public cart endpoints don't care
+# where live lines are kept. CART_BACKEND=db (default) reads and writes
+# carts/cart_items directly. CART_BACKEND=redis keeps each cart's lines in a
+# Redis hash and persists them write-behind (batched upserts of dirty carts)
+# and at submit time.
+#
+# A line is a plain dict: id, item_id, quantity, options, notes, added_by,
+# state, ts (epoch seconds, used for ordering) and v, the cart version at
+# which the line last changed (see CartStore.next_version). Removed lines stay
+# behind with state "removed" so that change queries (lines(since=...)) report them.
+
+def _json_loadmaybe(v):
+    if v is None:
+        return {}
+    if isinstance(v, (dict, list)):
+        return v
+    try:
+        return json.loads(v)
+    except Exception:
+        return {}
+
+def _line(row: dict) -> dict:
+    created = row.get("created_at")
+    return {
+        "id": row["id"], "item_id": row["item_id"], "quantity": row["quantity"],
+        "options": _json_loadmaybe(row.get("options")), "notes": row.get("notes"),
+        "added_by": row.get("added_by"), "state": row.get("state"),
+        "ts": created.timestamp() if created else time.time(), "v": row.get("version") or 0,
+    }
+
+def _params(cart_id: str, line: dict) -> tuple:
+    return (line["id"], cart_id, line["item_id"], line["quantity"], json.dumps(line["options"] or {}),
+            line["notes"], line["added_by"], line["state"], datetime.fromtimestamp(line["ts"]), line["v"])
+
+# Bare placeholders only, so executemany sends one multi-row statement rather
+# than a statement per line (pymysql only rewrites plain VALUES lists).
+_INSERT_SQL = """
+    INSERT INTO cart_items
+      (id, cart_id, item_id, quantity, options, notes, added_by, state, created_at, version)
+    VALUES
+      (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Lines only move forward (state from in_cart, version upwards), so a late
+# write-behind flush can never pull a submitted line back into the cart.
+_UPSERT_SQL = _INSERT_SQL + """
+    ON DUPLICATE KEY UPDATE
+      quantity = VALUES(quantity), options = VALUES(options), notes = VALUES(notes),
+      state = IF(state = 'in_cart', VALUES(state), state),
+      version = GREATEST(version, VALUES(version))
+"""
+
+async def _upsert(params: list[tuple]):
+    await executemany(_UPSERT_SQL, params)
+
+_VERSION_KEY = "cart:{}:version"
+
+class CartStore:
+    async def next_version(self, cart_id: str) -> int:
+        """Bump the cart's change counter. Call while holding the cart lease so
+        versions follow write order; clients resync when they see a gap. The counter
+        only hands out versions: readers take the version from the lines themselves,
+        which are written together with it."""
+        key = _VERSION_KEY.format(cart_id)
+        pipe = redis.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, settings.cart_ttl_seconds)
+        version, _ = await pipe.execute()
+        if version == 1:
+            # New cart, or the counter expired: continue above what the lines already carry.
+            top = max((l["v"] for l in await self.lines(cart_id)), default=0)
+            if top:
+                version = top + 1
+                await redis.set(key, version, ex=settings.cart_ttl_seconds)
+        return version
+
+def _get_or_create_sync(table_id: int) -> str:
+    # Upsert then read back on one connection and transaction. The unique key on
+    # carts.table_id makes this race-free: a concurrent creator's row is returned.
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO carts (id, table_id) VALUES (%s, %s) ON DUPLICATE KEY UPDATE table_id = table_id",
+                (str(uuid.uuid4()), table_id),
+            )
+            cur.execute("SELECT id FROM carts WHERE table_id=%s", (table_id,))
+            return cur.fetchone()["id"]
+
+class DbCartStore(CartStore):
+    def __init__(self):
+        # table_id -> cart id. A table keeps one cart for good (unique carts.table_id),
+        # so entries never go stale and the common path skips the carts table entirely.
+        self.known: dict[int, str] = {}
+
+    async def cart_id(self, table_id: int) -> str:
+        cart_id = self.known.get(table_id)
+        if cart_id is None:
+            cart_id = self.known[table_id] = await anyio.to_thread.run_sync(_get_or_create_sync, table_id)
+        return cart_id
+
+    async def lines(self, cart_id: str, since: int = 0) -> list[dict]:
+        changed = " AND version > %s" if since else ""
+        rows = await fetch_all(
+            f"""
+            SELECT id, item_id, quantity, options, notes, added_by, state, created_at, version
+            FROM cart_items
+            WHERE cart_id=%s{changed}
+            ORDER BY created_at
+            """,
+            (cart_id, since) if since else (cart_id,),
+        )
+        return [_line(r) for r in rows]
+
+    async def save(self, cart_id: str, lines: list[dict], events=(), lease=None):
+        """Upsert `lines`; `events`, (table_id, event, payload) triples, are staged in the
+        outbox and commit with them, and so does `lease`'s fencing token (LeaseLost if stale)."""
+        if not events and lease is None:
+            await _upsert([_params(cart_id, l) for l in lines])
+            return
+        uow = UnitOfWork()
+        uow.executemany(_UPSERT_SQL, [_params(cart_id, l) for l in lines])
+        for table_id, event, payload in events:
+            stage(uow, table_id, event, payload)
+        if lease is not None:
+            lease.fence(uow, cart_id)
+        await uow.commit()
+        if events:
+            outbox_relay.kick()
+
+    @asynccontextmanager
+    async def submitting(self, cart_id: str, uow: UnitOfWork, lease=None):
+        """Yield (in_cart lines, new cart version); marking them submitted is queued on
+        `uow`, so it commits with the caller's order, which the caller fences with
+        `lease`. The version is None when there is nothing to submit."""
+        lines = [l for l in await self.lines(cart_id) if l["state"] == "in_cart"]
+        version = await self.next_version(cart_id) if lines else None
+        if lines:
+            marks = ", ".join(["%s"] * len(lines))
+            uow.execute(
+                f"UPDATE cart_items SET state='submitted', version=%s WHERE state='in_cart' AND id IN ({marks})",
+                (version, *(l["id"] for l in lines)),
+            )
+        yield lines, version
+
+    async def close(self):
+        pass
+
+_TABLE_KEY = "cart:table:{}"   # table_id -> live cart id
+_LINES_KEY = "cart:{}:lines"   # hash: line id -> line json
+_DIRTY_KEY = "cart:dirty"      # cart ids with lines not yet persisted
+_HYDRATED = "~hydrated"        # lines hash field: the hash was loaded from the DB
+
+# A fenced save: written only while the lease key still holds the writer's token
+# (ARGV[1]; empty when unfenced). ARGV: token, ttl, cart id to mark dirty (empty
+# for none), field count, the line fields and values, then the (channel, message)
+# pairs to publish.
+_SAVE = """
+if ARGV[1] ~= '' and redis.call('get', KEYS[1]) ~= ARGV[1] then
+  return 0
+end
+local n = tonumber(ARGV[4])
+for i = 5, 4 + 2 * n, 2 do
+  redis.call('hset', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call('expire', KEYS[2], ARGV[2])
+if ARGV[3] ~= '' then
+  redis.call('sadd', KEYS[3], ARGV[3])
+end
+for i = 5 + 2 * n, #ARGV, 2 do
+  redis.call('publish', ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# Put back lines the hash still holds as submitting() wrote them, so a later
+# holder's edits are never undone. ARGV: (field, written, original) triples.
+_RESTORE = """
+for i = 1, #ARGV, 3 do
+  if redis.call('hget', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+    redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 2])
+  end
+end
+return 1
+"""
+
+class _Publishes(list):
+    """Collects publish_to()'s (channel, message) pairs as script arguments."""
+    def publish(self, channel: str, msg: str):
+        self.extend((channel, msg))
+
+class RedisCartStore(CartStore):
+    def __init__(self):
+        self.db = DbCartStore()
+        self._flusher: asyncio.Task | None = None
+
+    async def cart_id(self, table_id: int) -> str:
+        self._ensure_flusher()
+        ttl = settings.cart_ttl_seconds
+        table_key = _TABLE_KEY.format(table_id)
+        cart_id = self.db.known.get(table_id) or await redis.get(table_key)
+        if cart_id:
+            # Both keys are kept alive together, and the lines must really be there: a
+            # hash that expired or was evicted under a live table key is reloaded below,
+            # not read as an empty cart.
+            key = _LINES_KEY.format(cart_id)
+            pipe = redis.pipeline()
+            pipe.getex(table_key, ex=ttl)
+            pipe.expire(key, ttl)
+            pipe.hexists(key, _HYDRATED)
+            live, _, hydrated = await pipe.execute()
+            if live == cart_id and hydrated:
+                return cart_id
+        # Cold: hydrate from the DB, lines before the table key so no reader sees a half-loaded
+        # cart. HSETNX keeps any line written to Redis meanwhile; it is newer than its row.
+        cart_id = await self.db.cart_id(table_id)
+        lines = await self.db.lines(cart_id)
+        key = _LINES_KEY.format(cart_id)
+        pipe = redis.pipeline()
+        for l in lines:
+            pipe.hsetnx(key, l["id"], json.dumps(l))
+        pipe.hset(key, _HYDRATED, "1")
+        pipe.expire(key, ttl)
+        pipe.set(table_key, cart_id, ex=ttl)
+        await pipe.execute()
+        return cart_id
+
+    @staticmethod
+    def _decode(raw: dict) -> list[dict]:
+        return sorted((json.loads(v) for k, v in raw.items() if k != _HYDRATED), key=lambda l: l["ts"])
+
+    async def lines(self, cart_id: str, since: int = 0) -> list[dict]:
+        lines = self._decode(await redis.hgetall(_LINES_KEY.format(cart_id)))
+        return [l for l in lines if l["v"] > since] if since else lines
+
+    async def save(self, cart_id: str, lines: list[dict], events=(), lease=None):
+        # Lines live in Redis here, so their events do too: published by the same script
+        # as the write, which is as atomic as an outbox row and costs no extra trip.
+        publishes = _Publishes()
+        for table_id, event, payload in events:
+            publish_to(publishes, table_id, message(event, payload))
+        await self._write(cart_id, {l["id"]: json.dumps(l) for l in lines}, lease, publishes)
+
+    async def _write(self, cart_id: str, fields: dict[str, str], lease, publishes=(), dirty: bool = True):
+        """Set line fields through _SAVE, fenced by `lease` when given (LeaseLost if stale)."""
+        key = _LINES_KEY.format(cart_id)
+        fenced = lease is not None and lease.token
+        if not await redis.eval(_SAVE, 3, lease.key if fenced else key, key, _DIRTY_KEY,
+                                lease.token if fenced else "", settings.cart_ttl_seconds,
+                                cart_id if dirty else "", len(fields),
+                                *(x for f in fields.items() for x in f), *publishes):
+            raise LeaseLost(lease.table_id)
+
+    @asynccontextmanager
+    async def submitting(self, cart_id: str, uow: UnitOfWork, lease=None):
+        """Yield (in_cart lines, new cart version), the lines marked submitted in Redis
+        right away under `lease` (LeaseLost if stale); writing the whole cart is queued on `uow`, so it commits with the caller's
+        order. If the block fails, lines still as marked are put back. The version is
+        None when there is nothing to submit."""
+        key = _LINES_KEY.format(cart_id)
+        everything = await self.lines(cart_id)
+        lines = [l for l in everything if l["state"] == "in_cart"]
+        version, marked = None, {}
+        if lines:
+            version = await self.next_version(cart_id)
+            done = {l["id"]: {**l, "state": "submitted", "v": version} for l in lines}
+            marked = {i: json.dumps(l) for i, l in done.items()}
+            # Not marked dirty: the write-behind flush must not persist the mark before the order commits.
+            await self._write(cart_id, marked, lease, dirty=False)
+            uow.executemany(_UPSERT_SQL, [_params(cart_id, done.get(l["id"], l)) for l in everything])
+        try:
+            yield lines, version
+        except BaseException:
+            if lines:
+                await redis.eval(_RESTORE, 1, key, *(x for l in lines for x in (l["id"], marked[l["id"]], json.dumps(l))))
+            raise
+
+    async def flush(self, limit: int = 100) -> int:
+        cart_ids = await redis.spop(_DIRTY_KEY, limit)
+        if not cart_ids:
+            return 0
+        pipe = redis.pipeline()
+        for cart_id in cart_ids:
+            pipe.hgetall(_LINES_KEY.format(cart_id))
+        raws = await pipe.execute()
+        params = [_params(cart_id, l) for cart_id, raw in zip(cart_ids, raws) for l in self._decode(raw)]
+        if not params:
+            return 0
+        try:
+            await _upsert(params)
+        except Exception:
+            await redis.sadd(_DIRTY_KEY, *cart_ids)
+            return 0
+        return len(cart_ids)
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.cart_flush_seconds)
+            try:
+                while await self.flush():
+                    pass
+            except Exception:
+                pass  # Redis unavailable; dirty carts stay queued for the next tick.
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+            while await self.flush():
+                pass
+
+cart_store = RedisCartStore() if settings.cart_backend == "redis" else DbCartStore()
@@ -1,7 +1,11 @@
-from app.db import fetch_one
+from app.services.menu_cache import menu_cache
+from app.services.availability import overlay
 
+# O(1) checks against in-memory state: the active, in-schedule menu comes from
+# the menu snapshot, 86 status from the availability overlay. No per-call SELECT.
 async def is_item_available(item_id: str) -> bool:
-    row = await fetch_one("SELECT active, is_86 FROM items WHERE id=%s LIMIT 1", (item_id,))
-    if not row:
+    snap = await menu_cache.get()
+    _segment, orderable = snap.schedule.lookup()
+    if item_id not in orderable:
         return False
-    return bool(row["active"]) and not bool(row["is_86"])
+    return await overlay.is_available(item_id)
@@ -0,0 +1,35 @@
+from app.config import settings
+
+def supported_locales() -> list[str]:
+    return [l.strip() for l in settings.locales.split(",") if l.strip()]
+
+def _parse_accept_language(header: str) -> list[str]:
+    ranked = []
+    for n, part in enumerate(header.split(",")):
+        tag, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if tag and q > 0:
+            ranked.append((-q, n, tag.strip().lower()))
+    return [tag for _q, _n, tag in sorted(ranked)]
+
+def negotiate(lang: str | None, accept_language: str | None) -> str:
+    """Pick a supported locale: explicit lang first, then Accept-Language, then the default."""
+    supported = supported_locales()
+    for tag in ([lang] if lang else []) + _parse_accept_language(accept_language or ""):
+        tag = tag.lower()
+        if tag in supported:
+            return tag
+        primary = tag.split("-", 1)[0]
+        if primary in supported:
+            return primary
+    return settings.locale_default if settings.locale_default in supported else (supported or ["en"])[0]
+
+def pick(i18n: dict | None, lang: str) -> str | None:
+    if not i18n:
+        return None
+    return i18n.get(lang) or i18n.get(settings.locale_default) or next(iter(i18n.values()), None)
@@ -0,0 +1,116 @@
+import asyncio, json, uuid
+from app.db import UnitOfWork, fetch_all, execute
+from app.config import settings
+from app.redis_ext import redis, channel_for_table, channel_staff
+
+# Transactional outbox for realtime order/cart events. Writers stage an event
+# row in the same transaction as the change it announces (stage), so an event
+# exists exactly when its change committed; OutboxRelay publishes committed
+# rows in id order, a batch per pipeline, and deletes them once Redis took
+# them. Requests never wait on pub/sub, and a crash between commit and publish
+# only delays the event until a relay runs again.
+#
+# Delivery is at-least-once: a relay that dies after publishing a batch but
+# before deleting it sends the batch again. Clients already cope (cart deltas
+# carry versions, order state events are absolute). A Redis lease elects one
+# relay across workers so that rows go out in a single stream.
+
+def message(event: str, payload: dict) -> str:
+    return json.dumps({"event": event, "data": payload})
+
+def publish_to(pipe, table_id: int | None, msg: str):
+    """Queue one event's publishes on a Redis pipeline: the table, then staff (who receive all)."""
+    if table_id is not None:
+        pipe.publish(channel_for_table(table_id), msg)
+    pipe.publish(channel_staff(), msg)
+
+INSERT_SQL = "INSERT INTO outbox (table_id, message) VALUES (%s, %s)"
+
+def stage(uow: UnitOfWork, table_id: int | None, event: str, payload: dict):
+    """Queue an event row on the caller's unit of work; call outbox_relay.kick() after commit."""
+    uow.execute(INSERT_SQL, (table_id, message(event, payload)))
+
+_LEADER_KEY = "outbox:relay"
+_LEADER_MS = 5000
+
+# Take the lease if free, extend it if already ours.
+_LEAD = """
+local cur = redis.call('get', KEYS[1])
+if cur == false or cur == ARGV[1] then
+  redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+  return 1
+end
+return 0
+"""
+
+class OutboxRelay:
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self._wake = asyncio.Event()
+        self._relay: asyncio.Task | None = None
+
+    def kick(self):
+        """Relay soon instead of at the next poll; for callers that just committed events."""
+        self._ensure_relay()
+        self._wake.set()
+
+    async def _fetch(self, limit: int) -> list[tuple[int, int | None, str]]:
+        rows = await fetch_all("SELECT id, table_id, message FROM outbox ORDER BY id LIMIT %s", (limit,))
+        return [(r["id"], r["table_id"], r["message"]) for r in rows]
+
+    async def _delete(self, ids: list[int]):
+        await execute(f"DELETE FROM outbox WHERE id IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+
+    async def relay(self, limit: int | None = None) -> int:
+        """Publish and delete the oldest batch of events; returns how many went out.
+        Failures propagate with the rows still in place, to be retried as they are."""
+        rows = await self._fetch(limit or settings.outbox_batch_size)
+        if not rows:
+            return 0
+        pipe = redis.pipeline(transaction=False)
+        for _id, table_id, msg in rows:
+            publish_to(pipe, table_id, msg)
+        await pipe.execute()
+        await self._delete([r[0] for r in rows])
+        return len(rows)
+
+    async def _lead(self) -> bool:
+        return bool(await redis.eval(_LEAD, 1, _LEADER_KEY, self.token, _LEADER_MS))
+
+    def _ensure_relay(self):
+        if self._relay is None or self._relay.done():
+            self._relay = asyncio.create_task(self._run())
+
+    async def _run(self):
+        failures = 0
+        while True:
+            # Poll even without kicks: events from other workers, or left by a crash.
+            delay = min(settings.outbox_poll_seconds * 2 ** failures, 30)
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if await self._lead():
+                    while await self.relay() == settings.outbox_batch_size:
+                        pass
+                failures = 0
+            except Exception:
+                failures = min(failures + 1, 6)  # Redis or DB down; back off, rows stay queued.
+
+    def start(self):
+        self._ensure_relay()
+
+    async def close(self):
+        if self._relay is not None:
+            self._relay.cancel()
+            self._relay = None
+            try:
+                if await self._lead():
+                    while await self.relay() == settings.outbox_batch_size:
+                        pass
+            except Exception:
+                pass  # whatever is left goes out with the next relay
+
+outbox_relay = OutboxRelay()
@@ -0,0 +1,73 @@
+import asyncio, time
+from datetime import datetime
+from app.config import settings
+from app.db import executemany
+
+# Write-behind buffer for table_sessions. Session starts and heartbeats are
+# recorded in memory and upserted in one statement every
+# SESSION_FLUSH_SECONDS, so neither /session/start nor the cart endpoints wait
+# on a commit. A crash loses at most one interval of last_seen_at updates.
+
+_UPSERT_SQL = """
+INSERT INTO table_sessions (id, table_id, created_at, last_seen_at)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE last_seen_at = VALUES(last_seen_at)
+"""
+
+class SessionTracker:
+    def __init__(self):
+        # session_id -> (table_id, first_seen, last_seen) as epoch seconds
+        self.pending: dict[str, tuple[int, float, float]] = {}
+        self._flusher: asyncio.Task | None = None
+
+    def start(self, table_id: int, session_id: str):
+        now = time.time()
+        self.pending[session_id] = (table_id, now, now)
+        self._ensure_flusher()
+
+    def touch(self, table_id: int, session_id: str):
+        now = time.time()
+        cur = self.pending.get(session_id)
+        self.pending[session_id] = (table_id, cur[1] if cur else now, now)
+        self._ensure_flusher()
+
+    async def flush(self) -> int:
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+        try:
+            await self._write(batch)
+        except Exception:
+            # Keep the rows for the next tick, merged with anything recorded meanwhile.
+            for sid, (tid, first, last) in batch.items():
+                cur = self.pending.get(sid)
+                self.pending[sid] = (tid, min(first, cur[1]), max(last, cur[2])) if cur else (tid, first, last)
+            return 0
+        return len(batch)
+
+    async def _write(self, batch: dict[str, tuple[int, float, float]]):
+        # Plain %s placeholders only: pymysql folds executemany into one multi-row
+        # INSERT just for VALUES lists of bare placeholders, so times go as datetimes
+        # (local time, as FROM_UNIXTIME would give) rather than through SQL functions.
+        await executemany(
+            _UPSERT_SQL,
+            [(sid, tid, datetime.fromtimestamp(first), datetime.fromtimestamp(last))
+             for sid, (tid, first, last) in batch.items()],
+        )
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.session_flush_seconds)
+            await self.flush()
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+session_tracker = SessionTracker()
@@ -4,7 +4,8 @@ from app.tokens import extract_opaque, verify_session_cap
 from app.ws.manager import manager
 from app.auth.deps import staff_required
 from app.config import settings
-from app.db import fetch_one
+from app.services.tables import table_resolver
+from app.services.session_tracker import session_tracker
 
 router = APIRouter()
 
@@ -25,14 +26,16 @@ async def ws_table(websocket: WebSocket, token: str = Query(...), session_id: st
         cap = verify_session_cap(session_cap)
         if not opaque or not cap:
             await websocket.close(code=4401); return
-        row = await fetch_one("SELECT id FROM tables WHERE opaque_uid=%s LIMIT 1", (opaque,))
-        if not row or row["id"] != cap.get("tid"):
+        table = await table_resolver.resolve(opaque)
+        if not table or table.id != cap.get("tid"):
             await websocket.close(code=4403); return
-        table_id = row["id"]
+        table_id = table.id
+        session_tracker.touch(table_id, cap["sid"])
         await manager.connect_table(table_id, websocket)
         await websocket.send_json({"event": "hello", "data": {"table_id": table_id}})
         while True:
             await websocket.receive_text()
+            session_tracker.touch(table_id, cap["sid"])
     except WebSocketDisconnect:
         pass
     finally:
@@ -0,0 +1,54 @@
+"""Many devices hammering one table's cart vs the same load spread over tables.
+
+Each operation is a read-modify-write of a shared counter with a simulated
+1 ms write in between, so unserialized runs lose updates.
+
+Run from the project root:  python benchmarks/bench_cart_contention.py [--redis]
+(--redis uses the cross-worker lease against REDIS_URL; default is the
+per-worker queue only.)
+"""
+import os, sys, time, asyncio, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.cart_lock import CartSerializer
+
+DEVICES = 24
+OPS = 20
+WRITE_S = 0.001
+
+async def run(label: str, hold, tables: int):
+    counters = {t: 0 for t in range(tables)}
+    latencies = []
+
+    async def device(d: int):
+        table_id = d % tables
+        for _ in range(OPS):
+            t0 = time.perf_counter()
+            async with hold(table_id):
+                seen = counters[table_id]
+                await asyncio.sleep(WRITE_S)
+                counters[table_id] = seen + 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(device(d) for d in range(DEVICES)))
+    elapsed = time.perf_counter() - t0
+    lost = DEVICES * OPS - sum(counters.values())
+    lat = sorted(latencies)
+    print(f"{label:<34} {DEVICES * OPS / elapsed:8.0f} ops/s  p50 {statistics.median(lat) * 1e3:6.1f} ms"
+          f"  p99 {lat[int(len(lat) * 0.99)] * 1e3:6.1f} ms  lost updates {lost}")
+
+class _Unserialized:
+    async def __aenter__(self):
+        pass
+    async def __aexit__(self, *exc):
+        pass
+
+async def main():
+    ser = CartSerializer(distributed="--redis" in sys.argv)
+    await run("unserialized, 1 table", lambda t: _Unserialized(), 1)
+    await run("serialized, 1 table", ser.hold, 1)
+    await run(f"serialized, {DEVICES} tables", ser.hold, DEVICES)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""Pricing a 10k-line tab: Decimal per line vs the integer-cents engine.
+
+Run from the project root:  python benchmarks/bench_pricing.py
+"""
+import os, random, sys, timeit
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pricing import compute_totals, price_lines, to_decimal, money
+
+LINES = 10_000
+N = 20
+
+def _legacy(line_items, tax_inclusive=False, tax_rate=Decimal("0.10")):
+    # Previous compute_totals: Decimal(str(x)) arithmetic on every line.
+    subtotal = tax = Decimal("0.00")
+    for li in line_items:
+        line_sub = to_decimal(li.get("quantity", 1)) * to_decimal(li.get("price_each", "0"))
+        rate = to_decimal(li["tax_rate"]) if "tax_rate" in li else tax_rate
+        if tax_inclusive:
+            base = line_sub / (Decimal("1.0") + rate)
+            subtotal += base
+            tax += line_sub - base
+        else:
+            subtotal += line_sub
+            tax += line_sub * rate
+    subtotal, tax = money(subtotal), money(tax)
+    return {"subtotal": subtotal, "tax": tax, "total": money(subtotal + tax)}
+
+def run(label: str, fn):
+    per = timeit.timeit(fn, number=N) / N
+    print(f"{label:<48} {per * 1e3:8.2f} ms/tab")
+
+def main():
+    rng = random.Random(1)
+    rates = {"standard": Decimal("0.10"), "food": Decimal("0.08"), "alcohol": Decimal("0.2")}
+    qty = [rng.randint(1, 6) for _ in range(LINES)]
+    cents = [rng.randint(100, 5000) for _ in range(LINES)]
+    opts = [rng.choice((0, 0, 50, 150)) for _ in range(LINES)]
+    classes = [rng.choice(list(rates)) for _ in range(LINES)]
+    dicts = [{"quantity": q, "price_each": str(Decimal(c + o).scaleb(-2)), "tax_rate": rates[k]}
+             for q, c, o, k in zip(qty, cents, opts, classes)]
+    assert _legacy(dicts) == compute_totals(dicts)
+    assert _legacy(dicts, True) == compute_totals(dicts, True)
+
+    for inclusive in (False, True):
+        mode = "inclusive" if inclusive else "exclusive"
+        run(f"Decimal per line ({mode})", lambda: _legacy(dicts, inclusive))
+        run(f"compute_totals, dict lines ({mode})", lambda: compute_totals(dicts, inclusive))
+        run(f"price_lines, arrays ({mode})",
+            lambda: price_lines(qty, cents, opts, classes, rates, tax_inclusive=inclusive))
+        run(f"price_lines, arrays + per-line tax ({mode})",
+            lambda: price_lines(qty, cents, opts, classes, rates, tax_inclusive=inclusive, per_line=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Staff order listing as history grows: the old unbounded, created_at-sorted
+query vs keyset pages over (state, created_at, id).
+
+Uses an in-memory SQLite database with the same index and query shapes as the
+app, so it runs anywhere; the curves, not the absolute numbers, carry over.
+Run from the project root:  python benchmarks/bench_staff_orders.py [sizes...]
+(default 1000 100000 1000000; add 10000000 for the full range, about a minute to build).
+"""
+import random, sqlite3, sys, time, timeit
+
+STATES = ("accepted", "in_prep", "ready", "served", "submitted", "voided")
+ACTIVE = ("submitted", "accepted", "in_prep", "ready")
+LIMIT = 50
+
+def build(n: int) -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, table_id INT, state TEXT, created_at REAL)")
+    rng = random.Random(n)
+    start = time.time() - n
+    # History is almost all served/voided; a floor's worth of orders is active.
+    def rows():
+        for i in range(n):
+            active = i >= n - 200
+            yield (f"{i:012d}", rng.randint(1, 40),
+                   rng.choice(ACTIVE) if active else rng.choice(("served", "served", "served", "voided")), start + i)
+    db.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", rows())
+    db.execute("CREATE INDEX ix_orders_state_created_id ON orders (state, created_at, id)")
+    db.execute("ANALYZE")
+    return db
+
+def legacy(db):
+    return db.execute("SELECT id, table_id, state, created_at FROM orders ORDER BY created_at DESC").fetchall()
+
+def page(db, states, after=None):
+    rows = []
+    for st in sorted(states, reverse=True):
+        if after and st > after[0]:
+            continue
+        want = LIMIT + 1 - len(rows)
+        if after and st == after[0]:
+            rows += db.execute(
+                "SELECT id, table_id, state, created_at FROM orders WHERE state=? "
+                "AND created_at <= ? AND (created_at < ? OR id < ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (st, after[1], after[1], after[2], want)).fetchall()
+        else:
+            rows += db.execute(
+                "SELECT id, table_id, state, created_at FROM orders WHERE state=? "
+                "ORDER BY created_at DESC, id DESC LIMIT ?", (st, want)).fetchall()
+        if len(rows) > LIMIT:
+            break
+    return rows[:LIMIT], (rows[LIMIT - 1][2], rows[LIMIT - 1][3], rows[LIMIT - 1][0]) if len(rows) > LIMIT else None
+
+def run(label: str, fn, number: int):
+    per = timeit.timeit(fn, number=number) / number
+    print(f"  {label:<44} {per * 1e3:10.3f} ms")
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    for n in sizes:
+        db = build(n)
+        print(f"{n:,} orders")
+        # Deep into history: a cursor up to 100 pages into served orders.
+        after, depth = None, min(100, n // LIMIT // 2)
+        for _ in range(depth):
+            _rows, after = page(db, ["served"], after)
+        run("old: every order, created_at DESC", lambda: legacy(db), 1 if n > 100_000 else 5)
+        run("keyset: first page, active states", lambda: page(db, ACTIVE), 200)
+        run("keyset: first page, all states", lambda: page(db, STATES), 200)
+        if after:
+            run(f"keyset: page {depth + 1} of served", lambda: page(db, ["served"], after), 200)
+        db.close()
+
+if __name__ == "__main__":
+    main()
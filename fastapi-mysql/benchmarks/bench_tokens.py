@@ -0,0 +1,42 @@
+"""Per-request token cost: legacy key-scan verify vs key-id verify vs memo hit.
+
+Run from the project root:  python benchmarks/bench_tokens.py
+"""
+import os, sys, timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import tokens
+from app.config import settings
+
+N = 20000
+
+def _legacy(payload: dict, key: str) -> str:
+    # Pre key-id format: body.sig, found by trying every configured key.
+    return tokens.sign(payload, key).split(".", 1)[1]
+
+def run(label: str, fn):
+    per = timeit.timeit(fn, number=N) / N
+    print(f"{label:<44} {per * 1e6:8.2f} us/op")
+
+def main():
+    keys = [settings.token_key_k1, settings.token_key_k0]
+    table_legacy = _legacy({"tab": "abcdef123456"}, settings.token_key_k0)
+    table_kid = tokens.sign({"tab": "abcdef123456"}, settings.token_key_k0)
+    cap = tokens.issue_session_cap(1, "sid", 600)
+
+    def cold(fn):
+        def go():
+            tokens._memo.clear()
+            fn()
+        return go
+
+    run("table token, legacy format (2 HMACs)", cold(lambda: tokens.verify(table_legacy, keys)))
+    run("table token, key id (1 HMAC)", cold(lambda: tokens.verify(table_kid, keys)))
+    run("table token, memo hit", lambda: tokens.verify(table_kid, keys))
+    run("session cap, cold", cold(lambda: tokens.verify_session_cap(cap)))
+    run("session cap, memo hit", lambda: tokens.verify_session_cap(cap))
+    run("extract_opaque, raw opaque", lambda: tokens.extract_opaque("abcdef123456"))
+    run("extract_opaque, signed + memo hit", lambda: tokens.extract_opaque(table_kid))
+
+if __name__ == "__main__":
+    main()
@@ -103,6 +103,14 @@ def qr():
         img.save(os.path.join(settings.qr_output_dir, f"{r['name']}.png"))
         typer.echo(f"QR for {r['name']} -> {url}")
 
+@cli.command()
+def invalidate_tables():
+    """Drop cached opaque_uid lookups in all workers after editing tables by hand."""
+    from redis import Redis
+    from app.redis_ext import channel_tables
+    Redis.from_url(settings.redis_url).publish(channel_tables(), "*")
+    typer.echo("Table cache invalidated.")
+
 @cli.command()
 def assets():
     base = Path("static")
@@ -0,0 +1,19 @@
+import asyncio
+from app.services.cart_lock import CartSerializer
+
+def test_same_table_runs_in_order_other_tables_in_parallel():
+    async def scenario():
+        ser=CartSerializer(distributed=False)
+        log=[]; active={}
+        async def op(table_id, n):
+            async with ser.hold(table_id):
+                active[table_id]=active.get(table_id, 0)+1
+                assert active[table_id]==1  # never two writers on one table
+                log.append((table_id, n))
+                await asyncio.sleep(0.001)
+                active[table_id]-=1
+        await asyncio.gather(*(op(t, n) for n in range(20) for t in (1, 2)))
+        assert [n for t, n in log if t==1]==list(range(20))
+        assert log[:2]==[(1, 0), (2, 0)]  # table 2 did not wait behind table 1
+        assert ser._queues=={} and ser._waiting=={}
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+from app.api.public import cart
+from app.schemas.public import CartOpsIn
+from app.services.cart_lock import CartSerializer
+
+class _Store:
+    def __init__(self):
+        self.rows={}
+        self.version=0
+        self.saves=[]
+        self.events=[]
+    async def cart_id(self, table_id):
+        return "c1"
+    async def lines(self, cart_id, since=0):
+        return [dict(l) for l in self.rows.values() if l["v"] > since]
+    async def next_version(self, cart_id):
+        self.version+=1
+        return self.version
+    async def save(self, cart_id, lines, events=(), lease=None):
+        self.saves.append(lines)
+        self.events.extend(events)
+        self.rows.update({l["id"]: l for l in lines})
+
+def _patch(monkeypatch):
+    store=_Store(); done={}
+    async def idempotent(key, compute=None, pending=None):
+        if key in done:
+            return done[key], True
+        done[key]=await compute()
+        return done[key], False
+    async def resolve(opaque):
+        return SimpleNamespace(id=7)
+    async def available(item_id):
+        return item_id!="gone"
+    async def menu():
+        return SimpleNamespace(catalog={"i1": ("Ramen", "12.50", "standard")})
+    monkeypatch.setattr(cart, "extract_opaque", lambda t: "opq")
+    monkeypatch.setattr(cart, "verify_session_cap", lambda c: {"tid": 7, "sid": "s1"})
+    monkeypatch.setattr(cart.table_resolver, "resolve", resolve)
+    monkeypatch.setattr(cart.session_tracker, "touch", lambda *a: None)
+    monkeypatch.setattr(cart, "cart_store", store)
+    monkeypatch.setattr(cart, "cart_lock", CartSerializer(distributed=False))
+    monkeypatch.setattr(cart, "idempotent", idempotent)
+    monkeypatch.setattr(cart, "is_item_available", available)
+    monkeypatch.setattr(cart.menu_cache, "get", menu)
+    return store
+
+def _add(key, item_id="i1"):
+    return {"op": "add", "idem_key": key, "item": {"client_uid": "u-"+key, "item_id": item_id}}
+
+def test_batch_applies_once_with_one_write_and_one_event(monkeypatch):
+    store=_patch(monkeypatch)
+    async def scenario():
+        first=await cart.apply_ops(CartOpsIn(ops=[_add("a"), _add("b"), _add("c", "gone")]), "t", "cap", "anon")
+        assert [r["status"] for r in first["results"]]==["applied", "applied", "rejected"]
+        a, b=(r["item"]["id"] for r in first["results"][:2])
+        second=await cart.apply_ops(CartOpsIn(ops=[
+            _add("a"),  # replayed from an offline queue
+            {"op": "update", "idem_key": "d", "line_id": a, "quantity": 3},
+            {"op": "remove", "idem_key": "e", "line_id": b},
+            {"op": "remove", "idem_key": "f", "line_id": b},
+        ]), "t", "cap", "anon")
+        return first, second, a, b
+    first, second, a, b=asyncio.run(scenario())
+    assert [r["status"] for r in second["results"]]==["replayed", "applied", "applied", "rejected"]
+    assert (first["version"], second["version"])==(1, 2)
+    assert [len(s) for s in store.saves]==[2, 2]
+    assert store.rows[a]["quantity"]==3 and store.rows[b]["state"]=="removed"
+    assert [(t, e) for t, e, _ in store.events]==[(7, "cart_updated")]*2  # staged with each write
+    sent=[p for _, _, p in store.events]
+    assert [x["client_uid"] for x in sent[0]["added"]]==["u-a", "u-b"]
+    assert (sent[0]["added"][0]["title"], sent[0]["added"][0]["price_each"])==("Ramen", "12.50")
+    assert [x["id"] for x in sent[1]["changed"]]==[a] and sent[1]["removed"]==[b]
+
+def test_cart_version_is_that_of_the_lines_read(monkeypatch):
+    store=_patch(monkeypatch)
+    async def scenario():
+        await cart.apply_ops(CartOpsIn(ops=[_add("a")]), "t", "cap", "anon")
+        await store.next_version("c1")  # a writer has taken version 2 but not committed it yet
+        full=await cart.get_cart("t", "cap")
+        since=await cart.get_cart("t", "cap", since_version=1)
+        return full, since
+    full, since=asyncio.run(scenario())
+    # Version 2 is not reported before its lines exist, so its delta is not dropped as old.
+    assert (full.version, len(full.items))==(1, 1)
+    assert (since.version, since.items)==(1, [])
@@ -0,0 +1,187 @@
+import asyncio, json
+import pytest
+from pymysql.cursors import RE_INSERT_VALUES
+from app.db import UnitOfWork
+from app.services import cart_store as cs
+from app.services.cart_lock import Lease, LeaseLost
+
+class _Hashes:
+    def __init__(self):
+        self.h={}
+        self.kv={}
+        self.published=[]
+        self.dirty=set()
+    async def eval(self, script, nkeys, *args):
+        keys, argv=args[:nkeys], [str(a) for a in args[nkeys:]]
+        if script==cs._RESTORE:
+            h=self.h.setdefault(keys[0], {})
+            for field, written, original in zip(argv[::3], argv[1::3], argv[2::3]):
+                if h.get(field)==written:
+                    h[field]=original
+            return 1
+        assert script==cs._SAVE
+        if argv[0] and self.kv.get(keys[0])!=argv[0]:
+            return 0
+        n=int(argv[3])
+        fields=argv[4:4+2*n]
+        self.h.setdefault(keys[1], {}).update(zip(fields[::2], fields[1::2]))
+        if argv[2]:
+            self.dirty.add(argv[2])
+        self.published+=zip(argv[4+2*n::2], argv[5+2*n::2])
+        return 1
+    async def hgetall(self, key):
+        return dict(self.h.get(key, {}))
+    async def get(self, key):
+        return self.kv.get(key)
+    async def set(self, key, value, ex=None):
+        self.kv[key]=str(value)
+    def pipeline(self):
+        return _Pipe(self)
+
+class _Pipe:
+    def __init__(self, fake):
+        self.fake=fake
+        self.ops=[]
+    def incr(self, key):
+        def incr():
+            self.fake.kv[key]=str(int(self.fake.kv.get(key, 0))+1)
+            return int(self.fake.kv[key])
+        self.ops.append(incr)
+    def expire(self, key, ttl):
+        self.ops.append(lambda: True)
+    def getex(self, key, ex=None):
+        self.ops.append(lambda: self.fake.kv.get(key))
+    def set(self, key, value, ex=None):
+        self.ops.append(lambda: self.fake.kv.update({key: str(value)}))
+    def hexists(self, key, field):
+        self.ops.append(lambda: field in self.fake.h.get(key, {}))
+    def hsetnx(self, key, field, value):
+        self.ops.append(lambda: self.fake.h.setdefault(key, {}).setdefault(field, value))
+    def hset(self, key, field=None, value=None, mapping=None):
+        self.ops.append(lambda: self.fake.h.setdefault(key, {}).update(mapping or {field: value}))
+    async def execute(self):
+        return [op() for op in self.ops]
+
+def _line(i, state="in_cart", v=0):
+    return {"id":f"l{i}","item_id":"i1","quantity":1,"options":{},"notes":None,"added_by":"u","state":state,"ts":float(i),"v":v}
+
+def test_redis_submit_marks_lines_and_restores_on_failure(monkeypatch):
+    fake=_Hashes()
+    monkeypatch.setattr(cs, "redis", fake)
+    store=cs.RedisCartStore()
+    key=cs._LINES_KEY.format("c1")
+    fake.h[key]={l["id"]: json.dumps(l) for l in (_line(2), _line(1), _line(0, "submitted"))}
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with store.submitting("c1", UnitOfWork()) as (lines, version):
+                assert [l["id"] for l in lines]==["l1","l2"]
+                assert version==1
+                raise RuntimeError("order insert failed")
+        assert [l["state"] for l in await store.lines("c1")]==["submitted","in_cart","in_cart"]
+        uow=UnitOfWork()
+        async with store.submitting("c1", uow) as (lines, version):
+            assert len(lines)==2
+            assert version==2
+        [(many, sql, params)]=uow.steps  # queued for the caller's commit, not written yet
+        assert many and sql==cs._UPSERT_SQL
+        assert RE_INSERT_VALUES.match(sql)  # so pymysql sends the cart as one statement
+        assert {p[0]: p[7] for p in params}=={"l0":"submitted","l1":"submitted","l2":"submitted"}
+        assert {l["state"] for l in await store.lines("c1")}=={"submitted"}
+    asyncio.run(scenario())
+
+def test_versions_continue_past_lines_and_filter_changes(monkeypatch):
+    fake=_Hashes()
+    monkeypatch.setattr(cs, "redis", fake)
+    store=cs.RedisCartStore()
+    fake.h[cs._LINES_KEY.format("c1")]={l["id"]: json.dumps(l) for l in (_line(0, v=3), _line(1, v=7))}
+
+    async def scenario():
+        # Counter gone (expired or fresh cart): restart above the newest line, not at 1.
+        assert await store.next_version("c1")==8
+        assert await store.next_version("c1")==9
+        assert fake.kv[cs._VERSION_KEY.format("c1")]=="9"
+        assert [l["id"] for l in await store.lines("c1", since=3)]==["l1"]
+        assert len(await store.lines("c1"))==2
+    asyncio.run(scenario())
+
+def test_cart_id_is_created_once_then_memoized(monkeypatch):
+    calls=[]
+    def get_or_create(table_id):
+        calls.append(table_id)
+        return f"cart-{table_id}"
+    monkeypatch.setattr(cs, "_get_or_create_sync", get_or_create)
+    store=cs.DbCartStore()
+
+    async def scenario():
+        return [await store.cart_id(t) for t in (1, 1, 2, 1)]
+    assert asyncio.run(scenario())==["cart-1","cart-1","cart-2","cart-1"]
+    assert calls==[1, 2]
+
+def test_redis_cart_rehydrates_lines_lost_under_a_live_table_key(monkeypatch):
+    fake=_Hashes()
+    monkeypatch.setattr(cs, "redis", fake)
+    store=cs.RedisCartStore()
+    store._ensure_flusher=lambda: None
+    loads=[]
+    async def db_cart_id(table_id):
+        return "c1"
+    async def db_lines(cart_id):
+        loads.append(cart_id)
+        return [_line(0), _line(1)]
+    store.db.cart_id, store.db.lines=db_cart_id, db_lines
+    key=cs._LINES_KEY.format("c1")
+
+    async def scenario():
+        assert await store.cart_id(7)=="c1"
+        assert await store.cart_id(7)=="c1"
+        assert loads==["c1"]  # warm: both keys live, no DB read
+        # The hash expired or was evicted; a later write recreated part of it.
+        fake.h[key]={"l1": json.dumps(_line(1, v=2))}
+        assert await store.cart_id(7)=="c1"
+        assert loads==["c1", "c1"]
+        assert {l["id"]: l["v"] for l in await store.lines("c1")}=={"l0": 0, "l1": 2}  # Redis's newer line kept
+    asyncio.run(scenario())
+
+def test_redis_save_is_fenced_by_the_lease(monkeypatch):
+    fake=_Hashes()
+    monkeypatch.setattr(cs, "redis", fake)
+    store=cs.RedisCartStore()
+    lease=Lease(7, 5)
+    key=cs._LINES_KEY.format("c1")
+
+    async def scenario():
+        fake.kv[lease.key]="5"
+        await store.save("c1", [_line(0)], events=[(7, "cart_updated", {"v": 1})], lease=lease)
+        assert set(fake.h[key])=={"l0"} and len(fake.published)==2  # table, then staff
+        fake.kv[lease.key]="6"  # our lease lapsed and the next writer holds the cart
+        with pytest.raises(LeaseLost):
+            await store.save("c1", [_line(1)], events=[(7, "cart_updated", {"v": 2})], lease=lease)
+        assert set(fake.h[key])=={"l0"} and len(fake.published)==2
+    asyncio.run(scenario())
+
+def test_redis_submit_mark_is_fenced_and_restores_only_its_own_writes(monkeypatch):
+    fake=_Hashes()
+    monkeypatch.setattr(cs, "redis", fake)
+    store=cs.RedisCartStore()
+    lease=Lease(7, 5)
+    key=cs._LINES_KEY.format("c1")
+    fake.h[key]={l["id"]: json.dumps(l) for l in (_line(0), _line(1))}
+
+    async def scenario():
+        fake.kv[lease.key]="6"  # a later holder owns the cart: nothing is marked
+        with pytest.raises(LeaseLost):
+            async with store.submitting("c1", UnitOfWork(), lease):
+                pass
+        assert {l["state"] for l in await store.lines("c1")}=={"in_cart"}
+
+        fake.kv[lease.key]="5"
+        with pytest.raises(RuntimeError):
+            async with store.submitting("c1", UnitOfWork(), lease):
+                assert {l["state"] for l in await store.lines("c1")}=={"submitted"}
+                assert not fake.dirty  # the flush must not persist the mark before the order commits
+                # Our lease lapses mid-submit and the next holder edits l1.
+                fake.h[key]["l1"]=json.dumps(_line(1, v=9))
+                raise RuntimeError("order insert failed")
+        assert [(l["state"], l["v"]) for l in await store.lines("c1")]==[("in_cart", 0), ("in_cart", 9)]
+    asyncio.run(scenario())
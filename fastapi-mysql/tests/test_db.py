@@ -0,0 +1,76 @@
+import asyncio
+from queue import Queue
+import pytest
+from app import db
+
+class _Conn:
+    def __init__(self):
+        self.log=[]
+    def cursor(self):
+        return _Cursor(self)
+    def commit(self):
+        self.log.append("commit")
+    def rollback(self):
+        self.log.append("rollback")
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn=conn
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def execute(self, sql, params):
+        if sql=="FAIL":
+            raise RuntimeError(sql)
+        self.conn.log.append(("execute", sql))
+        return 0 if sql.startswith("NOOP") else 1
+    def executemany(self, sql, seq):
+        self.conn.log.append(("executemany", sql, len(seq)))
+
+def _patch(monkeypatch):
+    conns=[]
+    def make():
+        conns.append(_Conn())
+        return conns[-1]
+    monkeypatch.setattr(db, "_pool", Queue(maxsize=1))
+    monkeypatch.setattr(db, "_make_conn", make)
+    return conns
+
+def test_unit_of_work_commits_once_on_one_connection(monkeypatch):
+    conns=_patch(monkeypatch)
+    uow=db.UnitOfWork()
+    uow.execute("A", (1,))
+    uow.executemany("B", [(1,), (2,), (3,)])
+    uow.executemany("C", [])
+    uow.execute("D")
+    assert conns==[]  # nothing runs before commit
+    asyncio.run(uow.commit())
+    assert len(conns)==1
+    assert conns[0].log==[("execute", "A"), ("executemany", "B", 3), ("execute", "D"), "commit"]
+
+def test_unit_of_work_rolls_back_everything_on_failure(monkeypatch):
+    conns=_patch(monkeypatch)
+    uow=db.UnitOfWork()
+    uow.execute("A")
+    uow.execute("FAIL")
+    uow.execute("B")
+    with pytest.raises(RuntimeError):
+        asyncio.run(uow.commit())
+    assert conns[0].log==[("execute", "A"), "rollback"]
+
+def test_unit_of_work_required_statement_must_change_a_row(monkeypatch):
+    conns=_patch(monkeypatch)
+    uow=db.UnitOfWork()
+    uow.execute("A")
+    uow.require("FENCE", (), LookupError("stale"))
+    asyncio.run(uow.commit())
+    assert conns[0].log==[("execute", "A"), ("execute", "FENCE"), "commit"]
+    assert uow.required=={}
+
+    uow.execute("A")
+    uow.require("NOOP FENCE", (), LookupError("stale"))
+    uow.execute("B")
+    with pytest.raises(LookupError):
+        asyncio.run(uow.commit())
+    assert conns[0].log[3:]==[("execute", "A"), ("execute", "NOOP FENCE"), "rollback"]
@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from app.services import idempotency as idem
+
+class _Redis:
+    """Just enough Redis for the reservation scripts, with BLMOVE that really blocks."""
+    def __init__(self):
+        self.kv={}
+        self.lists={}
+        self.pushed=asyncio.Event()
+        self.calls=0
+    async def eval(self, script, numkeys, key, wake, *args):
+        self.calls+=1
+        cur=self.kv.get(key)
+        if script is idem._RESERVE:
+            if cur is not None:
+                return [cur, 15000]
+            self.kv[key]=args[0]
+            self.lists.pop(wake, None)
+            return None
+        if script is idem._FINISH:
+            if cur is None or cur==args[0]:
+                self.kv[key]=args[1]
+            self._push(wake, "1")
+        if script is idem._RELEASE and cur==args[0]:
+            del self.kv[key]
+            self._push(wake, "0")
+    def _push(self, wake, v):
+        self.lists.setdefault(wake, []).append(v)
+        self.pushed.set()
+    async def blmove(self, src, dst, timeout, a, b):
+        while not self.lists.get(src):
+            self.pushed.clear()
+            await asyncio.wait_for(self.pushed.wait(), timeout)
+        return self.lists[src][0]
+    def pipeline(self):
+        return _Pipe(self)
+
+class _Pipe:
+    def __init__(self, fake):
+        self.fake=fake
+        self.ops=[]
+    def eval(self, *args):
+        self.ops.append(args)
+    async def execute(self):
+        return [await self.fake.eval(*args) for args in self.ops]
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(idem, "redis", _Redis())
+    monkeypatch.setattr(idem, "_memo", idem.OrderedDict())
+    monkeypatch.setattr(idem, "_inflight", {})
+    return idem.redis
+
+def test_duplicates_in_one_worker_share_one_computation(fake):
+    runs=[]
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return {"order_id": "o1"}
+    async def scenario():
+        both=await asyncio.gather(idem.idempotent("k", compute=compute), idem.idempotent("k", compute=compute))
+        calls=fake.calls
+        again=await idem.idempotent("k", compute=compute)
+        assert fake.calls==calls  # served from the in-process tier
+        return both, again
+    both, again=asyncio.run(scenario())
+    assert runs==[1]
+    assert sorted(r for _, r in both)==[False, True]
+    assert again==({"order_id": "o1"}, True)
+
+def test_failure_releases_the_key_for_an_immediate_retry(fake):
+    async def boom():
+        raise RuntimeError("cart busy")
+    async def ok():
+        return {"ok": True}
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await idem.idempotent("k", compute=boom)
+        assert fake.kv=={}
+        return await asyncio.wait_for(idem.idempotent("k", compute=ok), 0.5)
+    assert asyncio.run(scenario())==({"ok": True}, False)
+
+def test_waiter_wakes_when_another_worker_finishes(fake):
+    key=idem._cache_key("k")
+    fake.kv[key]="?other-worker"
+    async def never():
+        raise AssertionError("must not recompute")
+    async def scenario():
+        waiter=asyncio.create_task(idem.idempotent("k", compute=never))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await fake.eval(idem._FINISH, 2, key, key+":wake", "?other-worker", '{"order_id": "o9"}', 60, 15000)
+        return await asyncio.wait_for(waiter, 0.5)
+    assert asyncio.run(scenario())==({"order_id": "o9"}, True)
+
+def test_pending_results_are_recorded_only_when_finished(fake):
+    key=idem._cache_key("k")
+    async def ok():
+        return {"status": "applied"}
+    async def scenario():
+        pending=idem.Pending()
+        assert await idem.idempotent("k", compute=ok, pending=pending)==({"status": "applied"}, False)
+        assert await idem.idempotent("k", compute=ok, pending=pending)==({"status": "applied"}, True)
+        assert fake.kv[key].startswith("?")  # still only reserved: the write has not committed
+        duplicate=asyncio.create_task(idem.idempotent("k", compute=ok))
+        await asyncio.sleep(0.01)
+        assert not duplicate.done()
+        await pending.release()  # the write failed
+        assert key not in fake.kv
+        assert await asyncio.wait_for(duplicate, 0.5)==({"status": "applied"}, False)
+
+        pending=idem.Pending()
+        await idem.idempotent("k2", compute=ok, pending=pending)
+        await pending.finish()  # the write committed
+        assert fake.kv[idem._cache_key("k2")]=='{"status": "applied"}'
+        assert await idem.idempotent("k2", compute=ok)==({"status": "applied"}, True)
+    asyncio.run(scenario())
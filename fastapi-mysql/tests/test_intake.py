@@ -0,0 +1,88 @@
+import asyncio, json, time
+from app.services import intake
+
+class _Redis:
+    def __init__(self):
+        self.acked=[]
+        self.deleted=[]
+    def pipeline(self, transaction=True):
+        return _Pipe(self)
+
+class _Pipe:
+    def __init__(self, fake):
+        self.fake=fake
+        self.ops=[]
+    def xack(self, stream, group, *ids):
+        self.ops.append((self.fake.acked, ids))
+    def xdel(self, stream, *ids):
+        self.ops.append((self.fake.deleted, ids))
+    async def execute(self):
+        for into, ids in self.ops:
+            into.extend(ids)
+
+def _entry(entry_id, order_id, at=None):
+    order={"id": order_id, "table_id": 7, "version": 3, "at": at or time.time(), "lines": []}
+    return entry_id, {"order": json.dumps(order)}
+
+def test_consume_acks_written_and_stale_entries_only(monkeypatch):
+    fake=_Redis()
+    monkeypatch.setattr(intake, "redis", fake)
+    monkeypatch.setattr(intake.settings, "intake_give_up_seconds", 60)
+    workers=intake.IntakeWorkers()
+    seen=[]
+    async def persist(orders):
+        seen.append([o["id"] for o in orders])
+        return [o for o in orders if o["id"]=="o1" or time.time()-o["at"]>60]
+    workers.persist=persist
+
+    entries=[
+        _entry("1-0", "o1"),                        # cart committed: written
+        _entry("2-0", "o2"),                        # cart commit not landed yet: stays pending
+        _entry("3-0", "o3", at=time.time()-120),    # submit failed long ago: given up
+        ("4-0", None),                              # deleted while pending
+    ]
+    assert asyncio.run(workers.consume(entries))==3
+    assert seen==[["o1", "o2", "o3"]]  # one batch, one transaction
+    assert fake.acked==fake.deleted==["1-0", "3-0", "4-0"]
+
+class _Cursor:
+    def __init__(self, landed, existing):
+        self.landed=landed
+        self.existing=existing
+        self.many={}
+        self.rowcount=0
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def execute(self, sql, params):
+        if sql.lstrip().startswith("SELECT"):
+            self.rows=[{"id": i, "version": v} for i, v in self.landed.items() if i in params]
+        else:
+            self.rowcount=0 if params[0] in self.existing else 1
+            self.existing.add(params[0])
+    def fetchall(self):
+        return self.rows
+    def executemany(self, sql, seq):
+        self.many[sql]=list(seq)
+
+def test_persist_writes_landed_orders_once(monkeypatch):
+    cur=_Cursor(landed={"l1": 3, "l2": 3, "l3": 2}, existing={"o0"})
+    class _Conn:
+        def cursor(self):
+            return cur
+    class _Ctx:
+        def __enter__(self):
+            return _Conn()
+        def __exit__(self, *exc):
+            return False
+    monkeypatch.setattr(intake, "get_conn", lambda: _Ctx())
+    line=lambda i: {"id": "oi-"+i, "line_id": i, "item_id": "i1", "title": "Ramen", "quantity": 1,
+                    "price_each": "12.50", "options": {}, "notes": None}
+    order=lambda oid, *lines: {"id": oid, "table_id": 7, "version": 3, "subtotal": "12.50", "tax": "1.25",
+                               "total": "13.75", "menu_version": "m1", "actor": "u", "lines": [line(i) for i in lines]}
+    ready, wrote=intake._persist_sync([order("o0", "l1"), order("o1", "l1", "l2"), order("o2", "l3")])
+    assert ready==["o0", "o1"]  # o2's cart lines are not at its version yet
+    assert wrote
+    assert [p[1] for p in cur.many[intake._ITEMS_SQL]]==["o1", "o1"]  # o0 was already written
+    assert [m for _, m in cur.many[intake.OUTBOX_SQL]]==[intake.message("order_submitted", {"order_id": "o1"})]
@@ -0,0 +1,69 @@
+import json
+from app.services.menu_cache import MenuSnapshot, build_document, etag_matches
+
+def test_snapshot_decodes_json_columns():
+    cats=[{"id":"c1","title_i18n":'{"en": "Mains"}',"description_i18n":None,"sort_order":0}]
+    items=[{"id":"i1","category_id":"c1","title_i18n":'{"en": "Ramen"}',"description_i18n":None,"price":"12.50",
+            "tax_class":"standard","dietary_tags":'["vegan"]',"sort_order":0,"image_path":None}]
+    snap=MenuSnapshot("v1", build_document(cats, items))
+    assert snap.etag=='"v1"'
+    doc=json.loads(snap.body)
+    assert doc["categories"][0]["title_i18n"]=={"en":"Mains"}
+    assert doc["items"][0]["dietary_tags"]==["vegan"]
+
+def test_etag_matches():
+    assert etag_matches('"v0", "v1"', '"v1"')
+    assert not etag_matches('"v0"', '"v1"')
+
+def test_localized_projection_and_negotiation():
+    from app.services.locales import negotiate
+    from app.services.menu_cache import project
+    doc={"categories":[{"id":"c1","title_i18n":{"en":"Mains","ja":"主菜"},"description_i18n":{},"sort_order":0}],
+         "items":[{"id":"i1","category_id":"c1","title_i18n":{"en":"Ramen"},"description_i18n":{},"price":"12.50",
+                   "tax_class":"standard","dietary_tags":[],"sort_order":0,"image_url":None}]}
+    ja=project(doc, "ja")
+    assert ja["categories"][0]["title"]=="主菜"
+    assert ja["items"][0]["title"]=="Ramen"  # falls back to the default locale
+    assert "title_i18n" not in ja["items"][0]
+    assert negotiate("ja", None)=="ja"
+    assert negotiate("auto", "ja-JP,ja;q=0.9,en;q=0.8")=="ja"
+    assert negotiate("fr", "de;q=0.9,en;q=0.5")=="en"
+
+def test_delta_reports_upserts_and_removals():
+    doc={"categories":[{"id":"c1","title_i18n":{"en":"Mains"},"description_i18n":{},"sort_order":0}],
+         "items":[{"id":"i1","category_id":"c1","title_i18n":{"en":"Ramen"},"description_i18n":{},"price":"12.50",
+                   "tax_class":"standard","dietary_tags":[],"sort_order":0,"image_url":None}]}
+    snap=MenuSnapshot("v2", doc)
+    delta=json.loads(snap.delta("v1", [("item","i1"),("item","i1"),("item","gone")]))
+    assert delta["since"]=="v1" and delta["version"]=="v2"
+    assert [i["id"] for i in delta["items"]]==["i1"]
+    assert delta["removed"]=={"categories":[],"items":["gone"]}
+    assert json.loads(snap.delta("v1", [("category","c1")], "en"))["categories"][0]["title"]=="Mains"
+
+def test_availability_overlay_body_tracks_flags():
+    from app.services.availability import AvailabilityOverlay
+    ov=AvailabilityOverlay()
+    before=ov.etag
+    ov._apply({"i1": False, "i2": True})
+    assert json.loads(ov.body)=={"unavailable":["i1"]}
+    assert ov.etag!=before and ov.flags.get("i3", True)
+
+def test_view_filters_items_outside_their_daypart():
+    from datetime import datetime, timezone
+    doc={"categories":[],
+         "items":[{"id":i,"category_id":None,"title_i18n":{},"description_i18n":{},"price":"1.00",
+                   "tax_class":"standard","dietary_tags":[],"sort_order":0,"image_url":None} for i in ("i1","i2")]}
+    snap=MenuSnapshot("v1", doc, {"i2":{"dayparts":[{"start":"17:00","end":"22:00"}]}})
+    noon=datetime(2026,10,19,12,0,tzinfo=timezone.utc)
+    body, etag=snap.view(None, noon)
+    assert [i["id"] for i in json.loads(body)["items"]]==["i1"] and etag!=snap.etag
+    assert snap.view(None, datetime(2026,10,19,18,0,tzinfo=timezone.utc))==(snap.body, snap.etag)
+
+def test_modifiers_embedded_from_rows():
+    items=[{"id":"i1","category_id":None,"title_i18n":'{"en": "Ramen"}',"description_i18n":None,"price":"12.50",
+            "tax_class":"standard","dietary_tags":None,"sort_order":0,"image_path":None}]
+    groups=[{"id":"g1","item_id":"i1","name_i18n":'{"en": "Toppings"}',"required":0,"min_qty":0,"max_qty":3}]
+    options=[{"id":"o1","group_id":"g1","name_i18n":'{"en": "Egg"}',"price_delta":"1.50","max_per_item":2,"is_exclusion":0}]
+    doc=build_document([], items, groups, options)
+    group=doc["items"][0]["option_groups"][0]
+    assert group["name_i18n"]=={"en":"Toppings"} and group["options"][0]["price_delta"]=="1.50"
@@ -0,0 +1,37 @@
+import asyncio
+from app.services.session_tracker import SessionTracker
+
+def test_heartbeats_coalesce_and_failed_flush_requeues():
+    async def scenario():
+        t=SessionTracker()
+        writes=[]
+        async def write(batch):
+            if not writes:
+                writes.append(None)
+                raise RuntimeError("db down")
+            writes.append(dict(batch))
+        t._write=write
+        t.start(1, "s1")
+        first=t.pending["s1"][1]
+        t.touch(1, "s1"); t.touch(2, "s2")
+        assert len(t.pending)==2 and t.pending["s1"][1]==first
+        assert await t.flush()==0  # failed write keeps the rows
+        t.touch(1, "s1")
+        assert await t.flush()==2
+        assert writes[1]["s1"][1]==first and set(writes[1])=={"s1","s2"}
+        assert t.pending=={}
+        await t.close()
+    asyncio.run(scenario())
+
+def test_flush_is_one_multi_row_statement(monkeypatch):
+    from pymysql.cursors import RE_INSERT_VALUES
+    from app.services import session_tracker as mod
+    calls=[]
+    async def executemany(sql, rows):
+        calls.append((sql, rows))
+    monkeypatch.setattr(mod, "executemany", executemany)
+    t=SessionTracker()
+    t.pending={"s1": (1, 1.0, 2.0), "s2": (2, 1.0, 3.0)}
+    assert asyncio.run(t.flush())==2
+    (sql, rows),=calls
+    assert RE_INSERT_VALUES.match(sql) and len(rows)==2
@@ -0,0 +1,72 @@
+import asyncio, json, sqlite3
+from datetime import datetime, timedelta
+from app.api.staff import orders as staff
+
+def _db():
+    # The listing's SQL runs as written on SQLite, bar the placeholder style.
+    db=sqlite3.connect(":memory:")
+    db.row_factory=sqlite3.Row
+    db.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, table_id INT, state TEXT, created_at TEXT, ticket_seconds INT)")
+    db.execute("CREATE TABLE order_items (id TEXT PRIMARY KEY, order_id TEXT, item_id TEXT, title_snapshot TEXT, "
+               "quantity INT, options TEXT, notes TEXT, state TEXT, created_at TEXT)")
+    t0=datetime(2026, 1, 1)
+    states=["served", "submitted", "ready", "served", "accepted", "voided"]
+    for i in range(30):
+        # Pairs of orders share a second, as MySQL TIMESTAMPs do under load.
+        st=states[i % 6]
+        db.execute("INSERT INTO orders VALUES (?, 1, ?, ?, ?)",
+                   (f"o{i:02d}", st, str(t0 + timedelta(seconds=i // 2)), 300 + i if st=="served" else None))
+        for n in range(i % 3):
+            db.execute("INSERT INTO order_items VALUES (?, ?, 'm1', ?, 2, ?, NULL, 'submitted', ?)",
+                       (f"o{i:02d}-{n}", f"o{i:02d}", f"Dish {n}", json.dumps({"size": "L"}), str(t0 + timedelta(seconds=n))))
+    return db
+
+def _patch(monkeypatch, db):
+    queries=[]
+    async def fetch_all(sql, params):
+        queries.append(sql)
+        rows=[dict(r) for r in db.execute(sql.replace("%s", "?"), [str(p) if isinstance(p, datetime) else p for p in params])]
+        for r in rows:
+            for k in ("created_at", "now"):
+                if k in r:
+                    r[k]=datetime.fromisoformat(r[k])
+        return rows
+    monkeypatch.setattr(staff, "fetch_all", fetch_all)
+    return queries
+
+def _walk(state, queries):
+    async def walk():
+        seen, cursor=[], None
+        while True:
+            before=len(queries)
+            page=json.loads((await staff.list_orders(state=state, cursor=cursor, limit=4, user=None)).body)
+            assert len(queries) - before==2  # the orders, then all their lines
+            seen+=page["orders"]
+            cursor=page["next_cursor"]
+            if not cursor:
+                return seen
+    return asyncio.run(walk())
+
+def test_pages_walk_every_order_once_in_key_order(monkeypatch):
+    db=_db()
+    queries=_patch(monkeypatch, db)
+    everything=[o["id"] for o in _walk("all", queries)]
+    assert everything==[r[0] for r in db.execute("SELECT id FROM orders ORDER BY state DESC, created_at DESC, id DESC")]
+
+    active=_walk(None, queries)
+    assert {o["state"] for o in active}=={"submitted", "ready", "accepted"}
+    assert len(active)==15
+
+def test_rows_carry_their_lines_and_timers_from_one_clock(monkeypatch):
+    db=_db()
+    queries=_patch(monkeypatch, db)
+    page=json.loads(asyncio.run(staff.list_orders(state="all", cursor=None, limit=50, user=None)).body)
+    assert len(queries)==2 and page["next_cursor"] is None
+    rows={o["id"]: o for o in page["orders"]}
+    assert [i["id"] for i in rows["o05"]["items"]]==["o05-0", "o05-1"]
+    assert rows["o05"]["items"][0]=={"id": "o05-0", "item_id": "m1", "title": "Dish 0", "quantity": 2,
+                                     "options": {"size": "L"}, "notes": None, "state": "submitted"}
+    assert rows["o03"]["items"]==[]
+    # Every row is timed against the same instant: elapsed differs exactly as created_at does.
+    assert rows["o00"]["elapsed_s"] - rows["o29"]["elapsed_s"]==14
+    assert rows["o00"]["ticket_s"]==300 and rows["o01"]["ticket_s"] is None
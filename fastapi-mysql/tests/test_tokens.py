@@ -0,0 +1,25 @@
+import time
+from app import tokens
+from app.config import settings
+
+def test_key_id_token_roundtrip_and_rotation():
+    tok=tokens.sign({"tab":"abcdef123456"}, settings.token_key_k0)
+    assert tok.count(".")==2
+    assert tokens.verify(tok, [settings.token_key_k1, settings.token_key_k0])=={"tab":"abcdef123456"}
+    tokens._memo.clear()
+    assert tokens.verify(tok, [settings.token_key_k1]) is None
+    assert tokens.extract_opaque(tok)=="abcdef123456"
+
+def test_legacy_two_part_tokens_still_verify():
+    legacy=tokens.sign({"tab":"abcdef123456"}, settings.token_key_k0).split(".", 1)[1]
+    assert tokens.parse_table_token(legacy)=={"tab":"abcdef123456"}
+
+def test_memo_is_scoped_to_keys_and_respects_expiry():
+    cap=tokens.issue_session_cap(7, "sid", 600)
+    assert tokens.verify_session_cap(cap)["tid"]==7
+    assert tokens.parse_table_token(cap) is None  # memo hit must not cross key sets
+    tampered=cap[:-2]+("AA" if not cap.endswith("AA") else "BB")
+    assert tokens.verify_session_cap(tampered) is None
+    expired=tokens.sign({"tid":7,"sid":"s","exp":int(time.time())-1}, settings.session_secret)
+    assert tokens.verify_session_cap(expired) is None
+    assert expired not in tokens._memo
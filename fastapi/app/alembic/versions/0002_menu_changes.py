@@ -0,0 +1,25 @@
+"""menu change log
+
+Revision ID: 0002_menu_changes
+Revises: 0001_init
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_menu_changes'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('menu_changes',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('version_id', sa.Integer(), index=True),
+        sa.Column('entity', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.String(length=36), nullable=False)
+    )
+
+def downgrade():
+    op.drop_table('menu_changes')
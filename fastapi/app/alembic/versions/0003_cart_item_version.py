@@ -0,0 +1,20 @@
+"""cart item version
+
+Revision ID: 0003_cart_item_version
+Revises: 0002_menu_changes
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_cart_item_version'
+down_revision = '0002_menu_changes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('cart_items', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('cart_items', 'version')
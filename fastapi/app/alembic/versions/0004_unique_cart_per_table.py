@@ -0,0 +1,39 @@
+"""one cart per table
+
+Revision ID: 0004_unique_cart_per_table
+Revises: 0003_cart_item_version
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_unique_cart_per_table'
+down_revision = '0003_cart_item_version'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Fold duplicate carts (from the old select-then-insert race) into the newest one per table.
+    op.execute("""
+        WITH ranked AS (
+            SELECT id, first_value(id) OVER (PARTITION BY table_id ORDER BY created_at DESC, id) AS keep
+            FROM carts
+        )
+        UPDATE cart_items SET cart_id = ranked.keep
+        FROM ranked WHERE cart_items.cart_id = ranked.id AND ranked.id <> ranked.keep
+    """)
+    op.execute("""
+        DELETE FROM carts WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY table_id ORDER BY created_at DESC, id) AS n
+                FROM carts
+            ) ranked WHERE n > 1
+        )
+    """)
+    op.drop_index('ix_carts_table_id', table_name='carts')
+    op.create_index('ix_carts_table_id', 'carts', ['table_id'], unique=True)
+
+def downgrade():
+    op.drop_index('ix_carts_table_id', table_name='carts')
+    op.create_index('ix_carts_table_id', 'carts', ['table_id'])
@@ -0,0 +1,25 @@
+"""event outbox
+
+Revision ID: 0005_outbox
+Revises: 0004_unique_cart_per_table
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_outbox'
+down_revision = '0004_unique_cart_per_table'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('outbox',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('table_id', sa.Integer(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'))
+    )
+
+def downgrade():
+    op.drop_table('outbox')
@@ -0,0 +1,20 @@
+"""orders listing index
+
+Revision ID: 0006_orders_state_index
+Revises: 0005_outbox
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_orders_state_index'
+down_revision = '0005_outbox'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_orders_state_created_id', 'orders', ['state', 'created_at', 'id'])
+
+def downgrade():
+    op.drop_index('ix_orders_state_created_id', table_name='orders')
@@ -0,0 +1,20 @@
+"""cart fencing token
+
+Revision ID: 0007_cart_fence
+Revises: 0006_orders_state_index
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_cart_fence'
+down_revision = '0006_orders_state_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('carts', sa.Column('fence', sa.BigInteger(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('carts', 'fence')
@@ -6,6 +6,7 @@ from app.auth.deps import admin_required
 from app.models.menu import Category, Item
 from app.services.images import process_and_save
 from app.services.media_proxy import gen_signed_url
+from app.services.menu_cache import menu_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -20,7 +21,9 @@ async def create_category(data: dict, session: AsyncSession = Depends(get_async_
         active=True
     )
     session.add(c)
+    token = await menu_cache.stage_bump(session, changes=[("category", c.id)])
     await session.commit()
+    await menu_cache.publish(session, token)
     return {"id": c.id}
 
 @router.post("/items")
@@ -33,11 +36,14 @@ async def create_item(data: dict, session: AsyncSession = Depends(get_async_sess
         price=str(data.get("price", "0.00")),
         tax_class=data.get("tax_class") or "standard",
         dietary_tags=data.get("dietary_tags") or [],
+        availability=data.get("availability"),
         sort_order=int(data.get("sort_order") or 0),
         active=True
     )
     session.add(i)
+    token = await menu_cache.stage_bump(session, changes=[("item", i.id)])
     await session.commit()
+    await menu_cache.publish(session, token)
     return {"id": i.id}
 
 @router.post("/media")
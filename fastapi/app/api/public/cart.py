@@ -1,16 +1,20 @@
-import uuid, json, bleach
+import uuid, time, bleach
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, Depends, Header, HTTPException
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_async_session
-from app.models.orders import Cart, CartItem, Order, OrderItem, OrderEvent
-from app.models.menu import Item
-from app.models.tables import Table
+from app.config import settings
 from app.services.inventory import is_item_available
-from app.services.idempotency import idempotent
-from app.redis_ext import redis, channel_for_table, channel_staff
+from app.services.menu_cache import menu_cache
+from app.services.cart_store import cart_store
+from app.services.cart_lock import cart_lock, LeaseLost
+from app.services.tables import table_resolver
+from app.services.session_tracker import session_tracker
+from app.services.idempotency import idempotent, Pending
+from app.services.outbox import stage, outbox_relay
+from app.services.intake import order_entry, add_order, enqueue, discard
 from app.tokens import extract_opaque, verify_session_cap
-from app.schemas.public import AddCartItemIn, CartOut, CartItemOut, SubmitOut
+from app.schemas.public import AddCartItemIn, AddCartItemOut, CartOpIn, CartOpsIn, CartOpsOut, CartOut, SubmitOut
 
 router = APIRouter(prefix="/api/public", tags=["public"])
 
@@ -19,39 +23,81 @@ def _sanitize(s: str | None) -> str | None:
         return None
     return bleach.clean(s, strip=True)[:280]
 
-async def _cart_for_table(session: AsyncSession, table_id: int) -> Cart:
-    res = await session.execute(select(Cart).where(Cart.table_id==table_id))
-    cart = res.scalar_one_or_none()
-    if not cart:
-        cart = Cart(id=str(uuid.uuid4()), table_id=table_id)
-        session.add(cart)
-        await session.commit()
-    return cart
+_OFF_MENU = (None, None, None)
 
-async def _broadcast(table_id: int, event: str, payload: dict):
-    msg = json.dumps({"event": event, "data": payload})
-    await redis.publish(channel_for_table(table_id), msg)
-    await redis.publish(channel_staff(), msg)  # staff receive all
+def _items_out(lines: list[dict], catalog: dict) -> list[dict]:
+    # Titles, prices and tax classes come from the menu snapshot's catalog, one
+    # dict lookup per line; an item that has left the menu keeps its id as title.
+    out = []
+    for l in lines:
+        title, price, tax_class = catalog.get(l["item_id"], _OFF_MENU)
+        out.append({
+            "id": l["id"], "client_uid": None, "item_id": l["item_id"], "title": title or str(l["item_id"]),
+            "quantity": l["quantity"], "options": l["options"], "notes": l["notes"], "added_by": l["added_by"],
+            "state": l["state"], "version": l["v"], "price_each": price, "tax_class": tax_class,
+        })
+    return out
+
+def _new_line(payload: AddCartItemIn, anon_user_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "item_id": payload.item_id,
+        "quantity": max(1, payload.quantity or 1),
+        "options": payload.options or {},
+        "notes": _sanitize(payload.notes),
+        "added_by": anon_user_id,
+        "state": "in_cart",
+        "ts": time.time(),
+    }
+
+@asynccontextmanager
+async def _cart_writer(table_id: int):
+    # One writer per table at a time, across workers; see app.services.cart_lock.
+    try:
+        async with cart_lock.hold(table_id) as lease:
+            yield lease
+    except LeaseLost:
+        raise HTTPException(409, "Cart busy, retry")
+
+def _version(lines) -> int:
+    # Every write stamps its lines with its version in the same write, so the newest
+    # line read is the cart version of exactly that snapshot.
+    return max((l["v"] for l in lines), default=0)
+
+def _cart_delta(cart_id: str, version: int, added=(), changed=(), removed=()) -> dict:
+    # Versioned delta: clients apply it in place and refetch only on a version gap.
+    # Events go out through the outbox (app.services.outbox); stage them under
+    # _cart_writer so versions are queued in write order.
+    return {
+        "cart_id": cart_id, "version": version,
+        "added": list(added), "changed": list(changed), "removed": list(removed),
+    }
 
 @router.get("/cart", response_model=CartOut)
-async def get_cart(table_token: str, session_cap: str, session: AsyncSession = Depends(get_async_session)):
+async def get_cart(table_token: str, session_cap: str, since_version: int | None = None,
+                   session: AsyncSession = Depends(get_async_session)):
     opaque = extract_opaque(table_token)
     cap = verify_session_cap(session_cap)
     if not opaque or not cap:
         raise HTTPException(401, "Invalid token")
-    res = await session.execute(select(Table).where(Table.opaque_uid==opaque))
-    table = res.scalar_one_or_none()
+    table = await table_resolver.resolve(session, opaque)
     if not table or table.id != cap.get("tid"):
         raise HTTPException(403, "Token mismatch")
-    cart = await _cart_for_table(session, table.id)
-    items = (await session.execute(select(CartItem).where(CartItem.cart_id==cart.id))).scalars().all()
-    out = [CartItemOut(
-        id=i.id, client_uid=None, item_id=i.item_id, title=str(i.item_id), quantity=i.quantity,
-        options=i.options, notes=i.notes, added_by=i.added_by, state=i.state
-    ).model_dump() for i in items]
-    return CartOut(cart_id=cart.id, items=out)
-
-@router.post("/cart/items", response_model=CartOut)
+    session_tracker.touch(table.id, cap["sid"])
+    cart_id = await cart_store.cart_id(session, table.id)
+    catalog = (await menu_cache.get(session)).catalog
+    # Version and lines from one read: a write committing after it is newer than
+    # `version` and reaches the client as its own delta.
+    lines = await cart_store.lines(session, cart_id)
+    version = _version(lines)
+    if since_version is None or not 0 <= since_version <= version:
+        # Full cart; also when the client is ahead of us (lines lost and reloaded).
+        live = [l for l in lines if l["state"] != "removed"]
+        return CartOut(cart_id=cart_id, version=version, items=_items_out(live, catalog))
+    changed = [l for l in lines if l["v"] > since_version]
+    return CartOut(cart_id=cart_id, version=version, since_version=since_version, items=_items_out(changed, catalog))
+
+@router.post("/cart/items", response_model=AddCartItemOut)
 async def add_item(
     payload: AddCartItemIn,
     table_token: str,
@@ -67,49 +113,129 @@ async def add_item(
     if not anon_user_id:
         raise HTTPException(400, "missing anon_user_id")
 
-    res = await session.execute(select(Table).where(Table.opaque_uid==opaque))
-    table = res.scalar_one_or_none()
+    table = await table_resolver.resolve(session, opaque)
     if not table or table.id != cap.get("tid"):
         raise HTTPException(403, "Token mismatch")
+    session_tracker.touch(table.id, cap["sid"])
 
     async def compute():
-        cart = await _cart_for_table(session, table.id)
-        lock_key = f"lock:cart:{cart.id}"
-        await redis.setnx(lock_key, "1")
-        await redis.expire(lock_key, 5)
-
         # Validate item
-        res2 = await session.execute(select(Item).where(Item.id == payload.item_id))
-        item = res2.scalar_one_or_none()
-        if not item or not await is_item_available(session, payload.item_id):
-            await redis.delete(lock_key)
+        if not await is_item_available(session, payload.item_id):
             raise HTTPException(400, "Item unavailable")
 
-        ci = CartItem(
-            id=str(uuid.uuid4()),
-            cart_id=cart.id,
-            item_id=payload.item_id,
-            quantity=max(1, payload.quantity or 1),
-            options=payload.options or {},
-            notes=_sanitize(payload.notes),
-            added_by=anon_user_id,
-            state="in_cart"
-        )
-        session.add(ci)
-        await session.commit()
-        await redis.delete(lock_key)
-        await _broadcast(table.id, "cart_updated", {"cart_id": cart.id})
-
-        # Return updated cart
-        items = (await session.execute(select(CartItem).where(CartItem.cart_id==cart.id))).scalars().all()
-        return {"cart_id": cart.id, "items": [{
-            "id": i.id, "client_uid": None, "item_id": i.item_id, "title": str(i.item_id), "quantity": i.quantity,
-            "options": i.options, "notes": i.notes, "added_by": i.added_by, "state": i.state
-        } for i in items]}
+        line = _new_line(payload, anon_user_id)
+        catalog = (await menu_cache.get(session)).catalog
+        async with _cart_writer(table.id) as lease:
+            cart_id = await cart_store.cart_id(session, table.id)
+            line["v"] = version = await cart_store.next_version(session, cart_id)
+            added = {**_items_out([line], catalog)[0], "client_uid": payload.client_uid}
+            await cart_store.save(session, cart_id, [line],
+                                  events=[(table.id, "cart_updated", _cart_delta(cart_id, version, added=[added]))],
+                                  lease=lease)
+
+        # Return the new line; clients already hold the rest
+        return {"cart_id": cart_id, "version": version, "item": added}
 
     result, reused = await idempotent(f"{idem_key}:{cap['sid']}", compute=compute)
     return result
 
+_MAX_OPS = 50
+
+@router.post("/cart/ops", response_model=CartOpsOut)
+async def apply_ops(
+    payload: CartOpsIn,
+    table_token: str,
+    session_cap: str,
+    anon_user_id: str,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Apply an ordered batch of add/update/remove operations under one cart lease,
+    write them in one statement and broadcast one delta. Every operation carries
+    its own idempotency key, so a replayed offline queue applies each edit once.
+    Operations that no longer apply (unavailable item, line already submitted or
+    removed) are rejected individually and do not fail the batch."""
+    opaque = extract_opaque(table_token)
+    cap = verify_session_cap(session_cap)
+    if not opaque or not cap:
+        raise HTTPException(401, "Invalid token")
+    if not anon_user_id:
+        raise HTTPException(400, "missing anon_user_id")
+    if not payload.ops or len(payload.ops) > _MAX_OPS:
+        raise HTTPException(400, f"between 1 and {_MAX_OPS} operations per batch")
+
+    table = await table_resolver.resolve(session, opaque)
+    if not table or table.id != cap.get("tid"):
+        raise HTTPException(403, "Token mismatch")
+    session_tracker.touch(table.id, cap["sid"])
+
+    async with _cart_writer(table.id) as lease:
+        cart_id = await cart_store.cart_id(session, table.id)
+        lines = {l["id"]: l for l in await cart_store.lines(session, cart_id)}
+        before = set(lines)
+        catalog = (await menu_cache.get(session)).catalog
+        staged: dict[str, dict] = {}
+        client_uids: dict[str, str] = {}
+        version = None
+
+        async def run(op: CartOpIn) -> dict:
+            nonlocal version
+            if op.op == "add":
+                if op.item is None:
+                    return {"status": "rejected", "detail": "missing item"}
+                if not await is_item_available(session, op.item.item_id):
+                    return {"status": "rejected", "detail": "Item unavailable"}
+                line = _new_line(op.item, anon_user_id)
+            else:
+                line = lines.get(op.line_id)
+                if line is None or line["state"] != "in_cart":
+                    return {"status": "rejected", "detail": "Line not in cart"}
+                if op.op == "remove":
+                    line = {**line, "state": "removed"}
+                else:
+                    line = {**line,
+                            "quantity": line["quantity"] if op.quantity is None else max(1, op.quantity),
+                            "options": line["options"] if op.options is None else op.options,
+                            "notes": line["notes"] if op.notes is None else _sanitize(op.notes)}
+            if version is None:
+                version = await cart_store.next_version(session, cart_id)
+            line["v"] = version
+            lines[line["id"]] = staged[line["id"]] = line
+            if op.op == "add":
+                client_uids[line["id"]] = op.item.client_uid
+            return {"status": "applied", "item": {**_items_out([line], catalog)[0], "client_uid": client_uids.get(line["id"])}}
+
+        results = []
+        # Each op's key stays reserved until the batch is saved, so its result is only
+        # recorded for an edit that was written.
+        pending = Pending()
+        try:
+            for op in payload.ops:
+                key = f"ops:{op.idem_key}:{cap['sid']}"
+                result, reused = await idempotent(key, compute=lambda op=op: run(op), pending=pending)
+                if reused and result["status"] == "applied":
+                    result = {**result, "status": "replayed"}
+                results.append({"idem_key": op.idem_key, **result})
+            if staged:
+                out = {i: {**_items_out([l], catalog)[0], "client_uid": client_uids.get(i)} for i, l in staged.items()}
+                live = [i for i, l in staged.items() if l["state"] != "removed"]
+                delta = _cart_delta(
+                    cart_id, version,
+                    added=[out[i] for i in live if i not in before],
+                    changed=[out[i] for i in live if i in before],
+                    removed=[i for i in staged if i not in live],
+                )
+                await cart_store.save(session, cart_id, list(staged.values()),
+                                      events=[(table.id, "cart_updated", delta)], lease=lease)
+        except BaseException:
+            await pending.release()  # nothing was written; let the client retry these keys
+            raise
+        await pending.finish()
+
+        if not staged:
+            version = _version(lines.values())
+
+    return {"cart_id": cart_id, "version": version, "results": results}
+
 @router.post("/cart/submit", response_model=SubmitOut)
 async def submit_cart(
     table_token: str,
@@ -123,41 +249,50 @@ async def submit_cart(
     if not opaque or not cap:
         raise HTTPException(401, "Invalid token")
 
-    res = await session.execute(select(Table).where(Table.opaque_uid==opaque))
-    table = res.scalar_one_or_none()
+    table = await table_resolver.resolve(session, opaque)
     if not table or table.id != cap.get("tid"):
         raise HTTPException(403, "Token mismatch")
+    session_tracker.touch(table.id, cap["sid"])
+
+    queued = settings.order_intake == "queue"
 
     async def compute():
-        cart = await _cart_for_table(session, table.id)
-        items = (await session.execute(
-            select(CartItem).where(CartItem.cart_id==cart.id, CartItem.state=="in_cart")
-        )).scalars().all()
-        if not items:
-            raise HTTPException(400, "Cart empty")
-
-        # Create order snapshot
-        order_id = str(uuid.uuid4())
-        from app.services.pricing import compute_totals
-        # NOTE: for demo pricing we use a flat "10.00" per item; replace with item.price in a fuller impl.
-        line_items = [{"quantity": i.quantity, "price_each": "10.00"} for i in items]
-        totals = compute_totals(line_items, tax_inclusive=False)
-
-        order = Order(id=order_id, table_id=table.id,
-                      subtotal=totals["subtotal"], tax=totals["tax"], total=totals["total"])
-        session.add(order)
-        for i in items:
-            oi = OrderItem(id=str(uuid.uuid4()), order_id=order_id, item_id=i.item_id,
-                           title_snapshot=str(i.item_id), quantity=i.quantity,
-                           price_each="10.00", options=i.options, notes=i.notes, state="submitted")
-            session.add(oi)
-            i.state = "submitted"
-
-        session.add(OrderEvent(order_id=order_id, order_item_id=None,
-                               actor_table_user=anon_user_id, action="submitted", reason=None))
-        await session.commit()
-        await _broadcast(table.id, "order_submitted", {"order_id": order_id})
-        return {"order_id": order_id, "state": "submitted"}
+        async with _cart_writer(table.id) as lease:
+            cart_id = await cart_store.cart_id(session, table.id)
+            async with cart_store.submitting(session, cart_id, lease) as (items, version):
+                if not items:
+                    raise HTTPException(400, "Cart empty")
+
+                # Price from one menu snapshot; its version is stamped on the order so the
+                # snapshot can be reproduced without re-reading items.
+                snap = await menu_cache.get(session)
+                if any(i["item_id"] not in snap.catalog for i in items):
+                    raise HTTPException(400, "Item unavailable")
+                priced = _items_out(items, snap.catalog)
+
+                # Create order snapshot
+                from app.services.pricing import compute_totals, tax_rate_for
+                line_items = [{"quantity": p["quantity"], "price_each": p["price_each"], "tax_rate": tax_rate_for(p["tax_class"])}
+                              for p in priced]
+                totals = compute_totals(line_items, tax_inclusive=False)
+                order = order_entry(str(uuid.uuid4()), table.id, cart_id, version, snap.version_token,
+                                    totals, priced, anon_user_id)
+
+                stage(session, table.id, "cart_updated", _cart_delta(
+                    cart_id, version, changed=[{**p, "state": "submitted", "version": version} for p in priced]))
+                # Queued: this transaction only moves the cart; an intake consumer writes the order.
+                entry = await enqueue(order) if queued else None
+                if not queued:
+                    add_order(session, order)
+                try:
+                    await lease.fence(session, cart_id)
+                    await session.commit()
+                except BaseException:
+                    if entry:
+                        await discard(entry)
+                    raise
+            outbox_relay.kick()
+        return {"order_id": order["id"], "state": "queued" if queued else "submitted"}
 
     result, reused = await idempotent(f"submit:{idem_key}:{cap['sid']}", compute=compute)
     return result
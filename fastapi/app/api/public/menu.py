@@ -1,37 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_async_session
-from app.schemas.common import CategoryOut, ItemOut
-from app.models.menu import Category, Item
 from app.tokens import extract_opaque
-from app.models.tables import Table
+from app.services.menu_cache import menu_cache, etag_matches
+from app.services.locales import negotiate
+from app.services.availability import overlay
+from app.services.tables import table_resolver
 
 router = APIRouter(prefix="/api/public", tags=["public"])
 
-@router.get("/menu", response_model=dict)
-async def get_menu(table_token: str = Query(...), session: AsyncSession = Depends(get_async_session)):
+@router.get("/menu")
+async def get_menu(request: Request, table_token: str = Query(...), lang: str | None = Query(None), session: AsyncSession = Depends(get_async_session)):
     # Accept signed token, JSON bootstrap, or raw opaque; just ensure table exists.
     opaque = extract_opaque(table_token)
     if not opaque:
         raise HTTPException(400, "Invalid table token")
-    res = await session.execute(select(Table).where(Table.opaque_uid == opaque))
-    if not res.scalar_one_or_none():
+    if not await table_resolver.resolve(session, opaque):
         raise HTTPException(404, "Unknown table")
 
-    cats = (await session.execute(select(Category).where(Category.active==True).order_by(Category.sort_order))).scalars().all()
-    items = (await session.execute(select(Item).where(Item.active==True).order_by(Item.sort_order))).scalars().all()
+    # Served from the process-wide snapshot; the DB is only read when the menu version moves.
+    snap = await menu_cache.get(session)
+    headers = {"Cache-Control": "no-cache"}
+    if lang is not None:
+        # Single-locale projection; unsupported or "auto" falls back to Accept-Language.
+        lang = negotiate(lang, request.headers.get("accept-language"))
+        headers.update({"Vary": "Accept-Language", "Content-Language": lang})
+    # Only items orderable right now (dayparts/date ranges); clients refetch at the next boundary.
+    body, etag = snap.view(lang)
+    headers["ETag"] = etag
+    next_change = snap.schedule.next_change()
+    if next_change:
+        headers["X-Menu-Valid-Until"] = str(int(next_change.timestamp()))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    def url_for(item):
-        return f"/media/{item.image_path}" if item.image_path else None
+@router.get("/menu/changes")
+async def get_menu_changes(request: Request, since: str = Query(...), table_token: str = Query(...), lang: str | None = Query(None), session: AsyncSession = Depends(get_async_session)):
+    opaque = extract_opaque(table_token)
+    if not opaque:
+        raise HTTPException(400, "Invalid table token")
+    if not await table_resolver.resolve(session, opaque):
+        raise HTTPException(404, "Unknown table")
+
+    if lang is not None:
+        lang = negotiate(lang, request.headers.get("accept-language"))
+    body = await menu_cache.changes_since(session, since, lang)
+    if body is None:
+        # Version unknown here (never existed or pruned): the client must refetch /menu.
+        raise HTTPException(410, "Unknown menu version")
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
+
+@router.get("/menu/availability")
+async def get_menu_availability(request: Request, table_token: str = Query(...), session: AsyncSession = Depends(get_async_session)):
+    # Hot 86 overlay, fetched apart from the cached menu body (pushed as availability_changed).
+    opaque = extract_opaque(table_token)
+    if not opaque:
+        raise HTTPException(400, "Invalid table token")
+    if not await table_resolver.resolve(session, opaque):
+        raise HTTPException(404, "Unknown table")
 
-    return {
-        "categories": [CategoryOut(
-            id=c.id, title_i18n=c.title_i18n, description_i18n=c.description_i18n, sort_order=c.sort_order
-        ).model_dump() for c in cats],
-        "items": [ItemOut(
-            id=i.id, category_id=i.category_id, title_i18n=i.title_i18n,
-            description_i18n=i.description_i18n, price=str(i.price), tax_class=i.tax_class,
-            dietary_tags=i.dietary_tags, sort_order=i.sort_order, image_url=url_for(i), is_86=i.is_86
-        ).model_dump() for i in items]
-    }
+    await overlay.refresh(session)
+    headers = {"ETag": overlay.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), overlay.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=overlay.body, media_type="application/json", headers=headers)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_session
+from app.auth.deps import staff_required
+from app.models.menu import Item
+from app.schemas.staff import AvailabilityIn
+from app.services.availability import overlay
+
+router = APIRouter(prefix="/api/staff", tags=["staff"])
+
+@router.post("/items/{item_id}/availability")
+async def set_item_availability(item_id: str, payload: AvailabilityIn, session: AsyncSession = Depends(get_async_session), user=Depends(staff_required)):
+    # 86 toggles only touch the overlay; the cached menu version stays put.
+    res = await session.execute(update(Item).where(Item.id==item_id).values(is_86=not payload.available))
+    if not res.rowcount: raise HTTPException(404, "item not found")
+    await session.commit()
+    await overlay.set(item_id, payload.available)
+    return {"ok": True, "item_id": item_id, "available": payload.available}
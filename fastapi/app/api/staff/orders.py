@@ -1,35 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+import base64, json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import Integer, cast, func, select, tuple_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_async_session
 from app.auth.deps import staff_required
-from app.models.orders import Order, OrderEvent
+from app.models.orders import Order, OrderEvent, OrderItem
 from app.schemas.staff import ActionIn
-from app.redis_ext import redis, channel_for_table, channel_staff
-import json
+from app.services.outbox import stage, outbox_relay
+from app.services.intake import intake_workers
 
 router = APIRouter(prefix="/api/staff", tags=["staff"])
 
-def _to_row(o: Order):
+def _to_row(o, items: list[dict], now: datetime):
     return {
         "id": o.id, "table_id": o.table_id, "state": o.state,
-        "items": [], "created_at": o.created_at.isoformat() if o.created_at else "",
-        "elapsed_s": 0
+        "items": items, "created_at": o.created_at.isoformat() if o.created_at else "",
+        "elapsed_s": max(0, int((now - o.created_at).total_seconds())) if o.created_at else 0,
+        "ticket_s": o.ticket_seconds,
     }
 
+def _to_item(i) -> dict:
+    return {"id": i.id, "item_id": i.item_id, "title": i.title_snapshot, "quantity": i.quantity,
+            "options": i.options, "notes": i.notes, "state": i.state}
+
+# One encoder for every listing, built once; rows hold only JSON-native values,
+# so nothing goes through FastAPI's per-field response encoding.
+_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, check_circular=False).encode
+
+# Orders page on (state, created_at, id), newest first within a state, each state
+# read as one range of ix_orders_state_created_id; a page touches at most one range
+# per listed state, however many orders the table has accumulated.
+ACTIVE_STATES = ("submitted", "accepted", "in_prep", "ready")
+ALL_STATES = ACTIVE_STATES + ("served", "voided", "comped")
+
+def _states(state: str | None) -> list[str]:
+    if not state:
+        return list(ACTIVE_STATES)
+    if state == "all":
+        return list(ALL_STATES)
+    return sorted({s for s in state.split(",") if s})
+
+def _encode_cursor(o) -> str:
+    return base64.urlsafe_b64encode(json.dumps([o.state, o.created_at.isoformat(), o.id]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[str, datetime, str]:
+    try:
+        state, created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return state, datetime.fromisoformat(created_at), order_id
+    except Exception:
+        raise HTTPException(400, "bad cursor")
+
 @router.get("/orders")
-async def list_orders(state: str | None = None, session: AsyncSession = Depends(get_async_session), user=Depends(staff_required)):
-    q = select(Order)
-    if state:
-        q = q.where(Order.state==state)
-    orders = (await session.execute(q.order_by(Order.created_at.desc()))).scalars().all()
-    out = [_to_row(o) for o in orders]
-    return {"orders": out}
-
-async def _broadcast_state(table_id: int, order_id: str, new_state: str):
-    msg = json.dumps({"event": "order_state_changed", "data": {"order_id": order_id, "state": new_state}})
-    await redis.publish(channel_for_table(table_id), msg)
-    await redis.publish(channel_staff(), msg)
+async def list_orders(state: str | None = None, cursor: str | None = None, limit: int = Query(50, ge=1, le=200),
+                      session: AsyncSession = Depends(get_async_session), user=Depends(staff_required)):
+    """Active orders by default; `state` takes one state, a comma-separated list or "all".
+    Pass the returned next_cursor to get the following page.
+
+    Two queries per page: the orders, one LIMITed branch per state in a UNION ALL,
+    and all of their lines by order id. Timers are against the database clock, read
+    with the orders, so they agree with created_at whatever the app server's clock says.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    branches = []
+    for st in _states(state):
+        if after and st > after[0]:
+            continue  # pages before the cursor already covered this state
+        q = select(Order.id, Order.table_id, Order.state, Order.created_at, Order.ticket_seconds).where(Order.state == st)
+        if after and st == after[0]:
+            q = q.where(tuple_(Order.created_at, Order.id) < (after[1], after[2]))
+        # Each branch as a derived table, so its LIMIT stays inside it in any dialect.
+        branches.append(select(q.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).subquery()))
+    orders = []
+    if branches:
+        u = union_all(*branches).subquery()
+        q = select(u, func.now().label("now")).order_by(u.c.state.desc(), u.c.created_at.desc(), u.c.id.desc())
+        orders = (await session.execute(q.limit(limit + 1))).all()
+    page = orders[:limit]
+    items: dict[str, list[dict]] = {o.id: [] for o in page}
+    if page:
+        q = select(OrderItem).where(OrderItem.order_id.in_(list(items))).order_by(OrderItem.created_at, OrderItem.id)
+        for i in (await session.execute(q)).scalars():
+            items[i.order_id].append(_to_item(i))
+    body = {"orders": [_to_row(o, items[o.id], o.now) for o in page],
+            "next_cursor": _encode_cursor(page[-1]) if len(orders) > limit else None}
+    return Response(_encode(body).encode(), media_type="application/json")
+
+def _stage_state(session: AsyncSession, o: Order):
+    # Committed with the transition and relayed afterwards; see app.services.outbox.
+    stage(session, o.table_id, "order_state_changed", {"order_id": o.id, "state": o.state})
 
 @router.post("/orders/{order_id}/accept")
 async def accept_order(order_id: str, session: AsyncSession = Depends(get_async_session), user=Depends(staff_required)):
@@ -38,8 +97,9 @@ async def accept_order(order_id: str, session: AsyncSession = Depends(get_async_
     if not o: raise HTTPException(404, "order not found")
     o.state = "accepted"
     session.add(OrderEvent(order_id=o.id, action="accepted", actor_user_id=user["uid"]))
+    _stage_state(session, o)
     await session.commit()
-    await _broadcast_state(o.table_id, o.id, o.state)
+    outbox_relay.kick()
     return {"ok": True, "state": o.state}
 
 @router.post("/orders/{order_id}/ready")
@@ -49,8 +109,9 @@ async def ready_order(order_id: str, session: AsyncSession = Depends(get_async_s
     if not o: raise HTTPException(404, "order not found")
     o.state = "ready"
     session.add(OrderEvent(order_id=o.id, action="ready", actor_user_id=user["uid"]))
+    _stage_state(session, o)
     await session.commit()
-    await _broadcast_state(o.table_id, o.id, o.state)
+    outbox_relay.kick()
     return {"ok": True, "state": o.state}
 
 @router.post("/orders/{order_id}/served")
@@ -59,9 +120,12 @@ async def served_order(order_id: str, session: AsyncSession = Depends(get_async_
     o = res.scalar_one_or_none()
     if not o: raise HTTPException(404, "order not found")
     o.state = "served"
+    # Time to serve, on the database clock that stamped created_at.
+    o.ticket_seconds = cast(func.extract("epoch", func.now() - Order.created_at), Integer)
     session.add(OrderEvent(order_id=o.id, action="served", actor_user_id=user["uid"]))
+    _stage_state(session, o)
     await session.commit()
-    await _broadcast_state(o.table_id, o.id, o.state)
+    outbox_relay.kick()
     return {"ok": True, "state": o.state}
 
 @router.post("/orders/{order_id}/void")
@@ -71,6 +135,12 @@ async def void_order(order_id: str, payload: ActionIn, session: AsyncSession = D
     if not o: raise HTTPException(404, "order not found")
     o.state = "voided"
     session.add(OrderEvent(order_id=o.id, action="voided", actor_user_id=user["uid"], reason=(payload.reason or "")[:255]))
+    _stage_state(session, o)
     await session.commit()
-    await _broadcast_state(o.table_id, o.id, o.state)
+    outbox_relay.kick()
     return {"ok": True, "state": o.state}
+
+@router.get("/intake")
+async def intake_stats(user=Depends(staff_required)):
+    """Order intake queue depth, in-flight count and lag (see app.services.intake)."""
+    return await intake_workers.stats()
@@ -1,4 +1,4 @@
 from .users import User
 from .tables import Table, TableSession
-from .menu import Category, Item, OptionGroup, Option, MenuVersion
-from .orders import Cart, CartItem, Order, OrderItem, OrderEvent
+from .menu import Category, Item, OptionGroup, Option, MenuVersion, MenuChange
+from .orders import Cart, CartItem, Order, OrderItem, OrderEvent, OutboxEvent
@@ -1,3 +1,5 @@
+from datetime import datetime
+from decimal import Decimal
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import String, DateTime, func, Boolean, Integer, Numeric, JSON
 from app.db import Base
@@ -17,7 +19,7 @@ class Item(Base):
     category_id: Mapped[str | None] = mapped_column(String(36), nullable=True)  # can be many-to-many via join in future
     title_i18n: Mapped[dict] = mapped_column(JSON, default={})
     description_i18n: Mapped[dict] = mapped_column(JSON, default={})
-    price: Mapped = mapped_column(Numeric(10, 2))
+    price: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     tax_class: Mapped[str] = mapped_column(String(32), default="standard")
     dietary_tags: Mapped[list[str] | None] = mapped_column(JSON, default=[])
     availability: Mapped[dict | None] = mapped_column(JSON, default=None)  # dayparts, date ranges
@@ -40,12 +42,19 @@ class Option(Base):
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     group_id: Mapped[str] = mapped_column(String(36), index=True)
     name_i18n: Mapped[dict] = mapped_column(JSON, default={})
-    price_delta: Mapped = mapped_column(Numeric(10, 2), default=0)
+    price_delta: Mapped[Decimal | None] = mapped_column(Numeric(10, 2), default=0)
     max_per_item: Mapped[int] = mapped_column(Integer, default=3)
     is_exclusion: Mapped[bool] = mapped_column(Boolean, default=False)
 
 class MenuVersion(Base):
     __tablename__ = "menu_versions"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
     version_token: Mapped[str] = mapped_column(String(64), index=True)
+
+class MenuChange(Base):
+    __tablename__ = "menu_changes"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    version_id: Mapped[int] = mapped_column(Integer, index=True)  # menu_versions.id that introduced the change
+    entity: Mapped[str] = mapped_column(String(16))  # 'category' or 'item'
+    entity_id: Mapped[str] = mapped_column(String(36))
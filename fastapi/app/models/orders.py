@@ -1,12 +1,15 @@
+from datetime import datetime
+from decimal import Decimal
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, DateTime, func, Boolean, Integer, Numeric, JSON
+from sqlalchemy import String, DateTime, func, Boolean, Integer, BigInteger, Numeric, JSON, Text, Index
 from app.db import Base
 
 class Cart(Base):
     __tablename__ = "carts"
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
-    table_id: Mapped[int] = mapped_column(Integer, index=True)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
+    table_id: Mapped[int] = mapped_column(Integer, index=True, unique=True)  # one live cart per table
+    fence: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")  # token of the last lease that wrote
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 class CartItem(Base):
     __tablename__ = "cart_items"
@@ -18,24 +21,29 @@ class CartItem(Base):
     notes: Mapped[str | None] = mapped_column(String(280), nullable=True)
     added_by: Mapped[str] = mapped_column(String(64))  # anonymous table user id (ephemeral)
     state: Mapped[str] = mapped_column(String(16), default="in_cart")  # transitions
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version: Mapped[int] = mapped_column(Integer, default=0)  # cart version of the last change
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class Order(Base):
     __tablename__ = "orders"
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     table_id: Mapped[int] = mapped_column(Integer, index=True)
     state: Mapped[str] = mapped_column(String(16), default="submitted")  # submitted, accepted, in_prep, ready, served, voided, comped
-    subtotal: Mapped = mapped_column(Numeric(10,2), default=0)
-    tax: Mapped = mapped_column(Numeric(10,2), default=0)
-    service_charge: Mapped = mapped_column(Numeric(10,2), default=0)
-    discount_total: Mapped = mapped_column(Numeric(10,2), default=0)
-    total: Mapped = mapped_column(Numeric(10,2), default=0)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    subtotal: Mapped[Decimal | None] = mapped_column(Numeric(10,2), default=0)
+    tax: Mapped[Decimal | None] = mapped_column(Numeric(10,2), default=0)
+    service_charge: Mapped[Decimal | None] = mapped_column(Numeric(10,2), default=0)
+    discount_total: Mapped[Decimal | None] = mapped_column(Numeric(10,2), default=0)
+    total: Mapped[Decimal | None] = mapped_column(Numeric(10,2), default=0)
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     menu_version: Mapped[str | None] = mapped_column(String(64), nullable=True)
     ticket_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True)  # computed when served
 
+    __table_args__ = (
+        Index("ix_orders_state_created_id", "state", "created_at", "id"),  # staff listing, keyset pages
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
@@ -43,11 +51,11 @@ class OrderItem(Base):
     item_id: Mapped[str] = mapped_column(String(36))
     title_snapshot: Mapped[str] = mapped_column(String(255))
     quantity: Mapped[int] = mapped_column(Integer, default=1)
-    price_each: Mapped = mapped_column(Numeric(10,2), default=0)
+    price_each: Mapped[Decimal | None] = mapped_column(Numeric(10,2), default=0)
     options: Mapped[dict] = mapped_column(JSON, default={})
     notes: Mapped[str | None] = mapped_column(String(280), nullable=True)
     state: Mapped[str] = mapped_column(String(16), default="submitted")
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 class OrderEvent(Base):
     __tablename__ = "order_events"
@@ -58,4 +66,11 @@ class OrderEvent(Base):
     actor_table_user: Mapped[str | None] = mapped_column(String(64), nullable=True)  # anonymous table user
     action: Mapped[str] = mapped_column(String(32))  # e.g., in_cart, submitted, accepted, etc.
     reason: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)  # relay order
+    table_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None: staff channel only
+    message: Mapped[str] = mapped_column(Text)  # published as-is
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
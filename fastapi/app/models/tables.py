@@ -1,3 +1,4 @@
+from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import String, Integer, DateTime, func, Boolean
 from app.db import Base
@@ -8,11 +9,11 @@ class Table(Base):
     name: Mapped[str] = mapped_column(String(64), unique=True)
     opaque_uid: Mapped[str] = mapped_column(String(64), unique=True, index=True)  # printed in QR link
     active: Mapped[bool] = mapped_column(Boolean, default=True)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 class TableSession(Base):
     __tablename__ = "table_sessions"
     id: Mapped[str] = mapped_column(String(36), primary_key=True)  # device session id
     table_id: Mapped[int] = mapped_column(Integer, index=True)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now())
-    last_seen_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
 
 class SessionStartIn(BaseModel):
     table_token: str
@@ -28,11 +28,44 @@ class CartItemOut(BaseModel):
     notes: Optional[str] = None
     added_by: str
     state: str
+    version: int = 0
+    price_each: Optional[str] = None  # None once the item has left the menu
+    tax_class: Optional[str] = None
 
 class CartOut(BaseModel):
     cart_id: str
+    version: int = 0
+    since_version: Optional[int] = None  # set when items holds only lines changed after it
     items: List[CartItemOut] = []
 
+class AddCartItemOut(BaseModel):
+    cart_id: str
+    version: int
+    item: CartItemOut
+
+class CartOpIn(BaseModel):
+    op: Literal["add", "update", "remove"]
+    idem_key: str
+    item: Optional[AddCartItemIn] = None  # add
+    line_id: Optional[str] = None         # update, remove
+    quantity: Optional[int] = None        # update; unset fields are kept
+    options: Optional[Dict] = None
+    notes: Optional[str] = None
+
+class CartOpsIn(BaseModel):
+    ops: List[CartOpIn]
+
+class CartOpOut(BaseModel):
+    idem_key: str
+    status: str  # applied | replayed | rejected
+    detail: Optional[str] = None
+    item: Optional[CartItemOut] = None
+
+class CartOpsOut(BaseModel):
+    cart_id: str
+    version: int
+    results: List[CartOpOut] = []
+
 class SubmitOut(BaseModel):
     order_id: str
-    state: str
+    state: str  # submitted | queued (ORDER_INTAKE=queue: written shortly, then order_submitted)
@@ -22,3 +22,6 @@ class OrderRow(BaseModel):
 
 class ActionIn(BaseModel):
     reason: str | None = None
+
+class AvailabilityIn(BaseModel):
+    available: bool
@@ -0,0 +1,54 @@
+import hashlib, json, time
+from app.db import AsyncSession
+from app.config import settings
+from app.redis_ext import redis, channel_menu
+
+# Hot 86 state, kept out of the cached menu document so flipping it never
+# invalidates the snapshot. Redis hash: item_id -> "1" (available) / "0" (86'd);
+# items without a field are available.
+AVAIL_KEY = "menu:avail"
+_SEEDED = "_seeded"
+
+class AvailabilityOverlay:
+    def __init__(self):
+        self.flags: dict[str, bool] = {}
+        self.body = b'{"unavailable":[]}'
+        self.etag = '"a0"'
+        self._synced_at = 0.0
+
+    async def refresh(self, session: AsyncSession, force: bool = False):
+        if not force and time.monotonic() - self._synced_at < settings.availability_check_seconds:
+            return
+        raw = await redis.hgetall(AVAIL_KEY)
+        if _SEEDED not in raw:
+            raw = await self._seed(session)
+        self._apply({k: v == "1" for k, v in raw.items() if k != _SEEDED})
+        self._synced_at = time.monotonic()
+
+    async def _seed(self, session: AsyncSession) -> dict:
+        from sqlalchemy import select
+        from app.models.menu import Item
+        res = await session.execute(select(Item.id).where(Item.is_86 == True))
+        mapping = {item_id: "0" for item_id in res.scalars().all()}
+        mapping[_SEEDED] = "1"
+        await redis.hset(AVAIL_KEY, mapping=mapping)
+        return mapping
+
+    def _apply(self, flags: dict[str, bool]):
+        if flags == self.flags:
+            return
+        self.flags = flags
+        self.body = json.dumps({"unavailable": sorted(k for k, v in flags.items() if not v)}, separators=(",", ":")).encode()
+        self.etag = '"a' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+
+    async def is_available(self, session: AsyncSession, item_id: str) -> bool:
+        await self.refresh(session)
+        return self.flags.get(item_id, True)
+
+    async def set(self, item_id: str, available: bool):
+        await redis.hset(AVAIL_KEY, item_id, "1" if available else "0")
+        self._apply({**self.flags, item_id: available})
+        msg = json.dumps({"event": "availability_changed", "data": {"item_id": item_id, "available": available}})
+        await redis.publish(channel_menu(), msg)
+
+overlay = AvailabilityOverlay()
@@ -0,0 +1,116 @@
+import asyncio, time
+from contextlib import asynccontextmanager
+from app.config import settings
+from app.redis_ext import redis
+
+# Single-writer serialization of cart mutations per table.
+#
+# Within a worker, operations on one table queue on an asyncio.Lock (FIFO, no
+# polling); only the head of that queue competes for the cross-worker lease.
+# The lease is an atomic SET NX PX holding a fencing token from a per-table
+# counter. The token goes into the write itself: a database write stamps it on
+# the cart row (carts.fence) in the same transaction, conditional on the stored
+# token being older (Lease.fence), and a Redis cart write goes through a script
+# that checks the lease key still holds it. A holder that stalls past its
+# lease therefore cannot overwrite the next holder's write, even after it has
+# started writing. Waiters in other workers block on a wake-up list that the
+# releasing holder pushes to, bounded by the lease TTL in case a holder dies.
+
+_LEASE_KEY = "lease:cart:{}"
+_FENCE_KEY = "lease:cart:{}:fence"
+_WAKE_KEY = "lease:cart:{}:wake"
+
+# A counter lost with Redis data restarts from Redis time in milliseconds, above
+# the tokens it handed out before (and stamped on carts.fence), not at 1.
+_ACQUIRE = """
+local ttl = redis.call('pttl', KEYS[1])
+if ttl ~= -2 then
+  if ttl < 1 then ttl = 1 end
+  return -ttl
+end
+if redis.call('exists', KEYS[2]) == 0 then
+  redis.call('set', KEYS[2], redis.call('time')[1] .. '000')
+end
+local token = redis.call('incr', KEYS[2])
+redis.call('set', KEYS[1], token, 'PX', ARGV[1])
+return token
+"""
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  redis.call('del', KEYS[1])
+  redis.call('rpush', KEYS[2], ARGV[1])
+  redis.call('ltrim', KEYS[2], -1, -1)
+  redis.call('pexpire', KEYS[2], ARGV[2])
+  return 1
+end
+return 0
+"""
+
+class LeaseLost(Exception):
+    pass
+
+class Lease:
+    def __init__(self, table_id: int, token: int):
+        self.table_id = table_id
+        self.token = token
+
+    @property
+    def key(self) -> str:
+        return _LEASE_KEY.format(self.table_id)
+
+    async def fence(self, session, cart_id: str):
+        """Stamp this lease's token on the cart row in the caller's transaction, just
+        before it commits; raise LeaseLost if a later lease has already written. Once
+        per lease: the token must be strictly newer than the stored one."""
+        if not self.token:
+            return
+        from sqlalchemy import update
+        from app.models.orders import Cart
+        res = await session.execute(
+            update(Cart).where(Cart.id == cart_id, Cart.fence < self.token).values(fence=self.token))
+        if not res.rowcount:
+            raise LeaseLost(self.table_id)
+
+class CartSerializer:
+    def __init__(self, distributed: bool = True):
+        self.distributed = distributed
+        self._queues: dict[int, asyncio.Lock] = {}
+        self._waiting: dict[int, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, table_id: int):
+        queue = self._queues.setdefault(table_id, asyncio.Lock())
+        self._waiting[table_id] = self._waiting.get(table_id, 0) + 1
+        try:
+            async with queue:
+                lease = await self._acquire(table_id) if self.distributed else Lease(table_id, 0)
+                try:
+                    yield lease
+                finally:
+                    if lease.token:
+                        await self._release(lease)
+        finally:
+            self._waiting[table_id] -= 1
+            if not self._waiting[table_id]:
+                del self._waiting[table_id]
+                del self._queues[table_id]
+
+    async def _acquire(self, table_id: int) -> Lease:
+        keys = [_LEASE_KEY.format(table_id), _FENCE_KEY.format(table_id)]
+        deadline = time.monotonic() + settings.cart_lease_wait_seconds
+        while True:
+            res = await redis.eval(_ACQUIRE, 2, *keys, settings.cart_lease_ms)
+            if res > 0:
+                return Lease(table_id, res)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LeaseLost(table_id)
+            # Held elsewhere: sleep until released (or the lease's TTL runs out).
+            await redis.blpop(_WAKE_KEY.format(table_id), timeout=max(0.01, min(-res / 1000, remaining)))
+
+    async def _release(self, lease: Lease):
+        await redis.eval(_RELEASE, 2, _LEASE_KEY.format(lease.table_id), _WAKE_KEY.format(lease.table_id),
+                         lease.token, settings.cart_lease_ms)
+
+cart_lock = CartSerializer()
@@ -1,29 +1,172 @@
-import json, asyncio, hashlib
+import asyncio, hashlib, json, time, uuid
+from collections import OrderedDict
+from app.config import settings
 from app.redis_ext import redis
 
+# Idempotent execution of a request's side effects. The first caller for a key
+# computes; its result is kept for `ttl` seconds and handed to every later
+# caller with reused=True.
+#
+# Cheapest tier first:
+#   - in process: recent results (an LRU of IDEMPOTENCY_MEMO_SIZE entries) and
+#     computations running in this worker, which duplicates simply await;
+#   - Redis: one script call either reserves the key or returns what holds it,
+#     a result or another worker's reservation. A waiter blocks on the key's
+#     wake list, pushed when the holder finishes or gives up, for no longer
+#     than the reservation's TTL in case the holder died.
+# A computation that raises releases its reservation at once, so a retry
+# computes again rather than waiting for the reservation to lapse. When the
+# computation only stages work that the caller commits later, pass a Pending:
+# its keys stay reserved until the commit and are finished (or released) then,
+# so a crash in between never leaves a result for work that did not happen.
+#
+# The key holds the result as JSON, or "?<token>" while reserved.
+
 IDEMP_PREFIX = "idem:"
+_RESERVE_MS = 15000
+
+_RESERVE = """
+local v = redis.call('get', KEYS[1])
+if v then
+  return {v, redis.call('pttl', KEYS[1])}
+end
+redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+redis.call('del', KEYS[2])
+return false
+"""
+
+# Record the result unless another one landed after our reservation lapsed, then wake waiters.
+_FINISH = """
+local v = redis.call('get', KEYS[1])
+if not v or v == ARGV[1] then
+  redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+redis.call('rpush', KEYS[2], '1')
+redis.call('pexpire', KEYS[2], ARGV[4])
+return 1
+"""
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  redis.call('del', KEYS[1])
+  redis.call('rpush', KEYS[2], '0')
+  redis.call('pexpire', KEYS[2], ARGV[2])
+end
+return 0
+"""
+
+_FAILED = object()
+_memo: "OrderedDict[str, tuple[float, str]]" = OrderedDict()  # cache key -> (expires at, result json)
+_inflight: dict[str, asyncio.Future] = {}
+
+def _cache_key(key: str) -> str:
+    return IDEMP_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+def _recall(cache_key: str) -> str | None:
+    hit = _memo.get(cache_key)
+    if hit is None:
+        return None
+    if hit[0] < time.monotonic():
+        del _memo[cache_key]
+        return None
+    _memo.move_to_end(cache_key)
+    return hit[1]
+
+def _remember(cache_key: str, encoded: str, ttl: int):
+    _memo[cache_key] = (time.monotonic() + ttl, encoded)
+    _memo.move_to_end(cache_key)
+    while len(_memo) > settings.idempotency_memo_size:
+        _memo.popitem(last=False)
+
+async def _reserve(cache_key: str) -> tuple[str | None, str | None]:
+    """Reserve `cache_key`: (token, None), or (None, result json) if it is already done."""
+    wake = cache_key + ":wake"
+    token = "?" + uuid.uuid4().hex
+    while True:
+        held = await redis.eval(_RESERVE, 2, cache_key, wake, token, _RESERVE_MS)
+        if held is None:
+            return token, None
+        value, pttl = held
+        if not value.startswith("?"):
+            return None, value
+        # Reserved elsewhere. BLMOVE onto the same list leaves the wake-up in place, so
+        # every waiter sees it; a lapsed reservation is simply taken over on the next pass.
+        await redis.blmove(wake, wake, max(0.01, pttl / 1000), "LEFT", "RIGHT")
+
+async def _release(cache_key: str, token: str):
+    try:
+        await redis.eval(_RELEASE, 2, cache_key, cache_key + ":wake", token, _RESERVE_MS)
+    except Exception:
+        pass  # the reservation lapses on its own
+
+def _settle(cache_key: str, encoded, ttl: int):
+    # Hand the outcome to duplicates waiting in this worker.
+    _inflight.pop(cache_key).set_result(encoded)
+    if encoded is not _FAILED:
+        _remember(cache_key, encoded, ttl)
+
+class Pending:
+    """Results of idempotent(..., pending=...) calls, held back until the caller's
+    write commits: finish() records them, release() frees the keys for a retry."""
+
+    def __init__(self):
+        self._held: dict[str, tuple[str, str, int]] = {}  # cache key -> (token, result json, ttl)
+
+    async def finish(self):
+        held, self._held = self._held, {}
+        if not held:
+            return
+        try:
+            pipe = redis.pipeline()
+            for cache_key, (token, encoded, ttl) in held.items():
+                pipe.eval(_FINISH, 2, cache_key, cache_key + ":wake", token, encoded, ttl, _RESERVE_MS)
+            await pipe.execute()
+        finally:
+            # The write committed either way; this worker at least serves its results.
+            for cache_key, (_, encoded, ttl) in held.items():
+                _settle(cache_key, encoded, ttl)
+
+    async def release(self):
+        held, self._held = self._held, {}
+        for cache_key, (token, _, ttl) in held.items():
+            await _release(cache_key, token)
+            _settle(cache_key, _FAILED, ttl)
+
+async def idempotent(key: str, ttl: int = 60*60, compute=None, pending: Pending | None = None):
+    cache_key = _cache_key(key)
+    if pending is not None and cache_key in pending._held:
+        # Repeated within the batch: its first run is not committed yet, but will be with ours.
+        return json.loads(pending._held[cache_key][1]), True
+    while True:
+        encoded = _recall(cache_key)
+        if encoded is not None:
+            return json.loads(encoded), True
+        running = _inflight.get(cache_key)
+        if running is None:
+            break
+        encoded = await asyncio.shield(running)
+        if encoded is not _FAILED:
+            return json.loads(encoded), True
+        # The computation in this worker failed and released the key; try it ourselves.
 
-async def idempotent(key: str, ttl: int = 60*60, compute=None):
-    cache_key = IDEMP_PREFIX + hashlib.sha256(key.encode()).hexdigest()
-    # Use SETNX to reserve
-    ok = await redis.setnx(cache_key + ":lock", "1")
-    if ok:
-        await redis.expire(cache_key + ":lock", 15)  # short lock
-        result = await compute()
-        await redis.set(cache_key, json.dumps(result), ex=ttl)
-        await redis.delete(cache_key + ":lock")
+    _inflight[cache_key] = asyncio.get_running_loop().create_future()
+    encoded = _FAILED
+    try:
+        token, encoded = await _reserve(cache_key)
+        if token is None:
+            return json.loads(encoded), True
+        try:
+            result = await compute()
+        except BaseException:
+            encoded = _FAILED
+            await _release(cache_key, token)
+            raise
+        encoded = json.dumps(result)
+        if pending is not None:
+            pending._held[cache_key] = (token, encoded, ttl)
+            return result, False
+        await redis.eval(_FINISH, 2, cache_key, cache_key + ":wake", token, encoded, ttl, _RESERVE_MS)
         return result, False
-    # If existing result
-    cached = await redis.get(cache_key)
-    if cached:
-        return json.loads(cached), True
-    # Busy-wait briefly
-    for _ in range(10):
-        await asyncio.sleep(0.2)
-        cached = await redis.get(cache_key)
-        if cached:
-            return json.loads(cached), True
-    # Fallback compute
-    result = await compute()
-    await redis.set(cache_key, json.dumps(result), ex=ttl)
-    return result, False
+    finally:
+        if pending is None or cache_key not in pending._held:
+            _settle(cache_key, encoded, ttl)
@@ -0,0 +1,187 @@
+import asyncio, json, time, uuid
+from app.db import AsyncSession
+from app.config import settings
+from app.redis_ext import redis
+from app.services.outbox import stage, outbox_relay
+
+# Order intake. With ORDER_INTAKE=sync (default) submit writes the order in
+# its own transaction. With ORDER_INTAKE=queue, submit commits only the cart
+# transition and appends the priced order to a Redis Stream; a pool of
+# consumers (IntakeWorkers) writes queued orders in batched transactions and
+# emits order_submitted, through the outbox, once each one is persisted.
+#
+# An entry is appended before the submit commits its cart and discarded if
+# that commit fails. A consumer writes an order only once its cart lines read
+# back as submitted at the entry's version, i.e. once that commit landed; until
+# then the entry stays pending and is retried, for INTAKE_GIVE_UP_SECONDS at
+# most. Orders are inserted by id and skipped if present, so an entry that is
+# delivered twice (consumer died before acking) writes nothing the second time.
+# The stream is only as durable as Redis persistence (AOF) makes it.
+
+_STREAM = "orders:intake"
+_GROUP = "persist"
+
+def order_entry(order_id: str, table_id: int, cart_id: str, version: int, menu_version: str,
+                totals: dict, priced: list[dict], actor: str) -> dict:
+    """The order as written, JSON-safe. Order item ids are fixed here so that a
+    queued entry always writes the same rows."""
+    return {
+        "id": order_id, "table_id": table_id, "cart_id": cart_id, "version": version,
+        "menu_version": menu_version, "actor": actor, "at": time.time(),
+        "subtotal": str(totals["subtotal"]), "tax": str(totals["tax"]), "total": str(totals["total"]),
+        "lines": [
+            {"id": str(uuid.uuid4()), "line_id": p["id"], "item_id": p["item_id"], "title": p["title"],
+             "quantity": p["quantity"], "price_each": str(p["price_each"]), "options": p["options"], "notes": p["notes"]}
+            for p in priced
+        ],
+    }
+
+def _order_row(order: dict) -> dict:
+    return {"id": order["id"], "table_id": order["table_id"], "menu_version": order["menu_version"],
+            "subtotal": order["subtotal"], "tax": order["tax"], "total": order["total"]}
+
+def _add_details(session: AsyncSession, order: dict):
+    from app.models.orders import OrderItem, OrderEvent
+    session.add_all([
+        OrderItem(id=l["id"], order_id=order["id"], item_id=l["item_id"], title_snapshot=l["title"],
+                  quantity=l["quantity"], price_each=l["price_each"], options=l["options"], notes=l["notes"],
+                  state="submitted")
+        for l in order["lines"]
+    ])
+    session.add(OrderEvent(order_id=order["id"], order_item_id=None,
+                           actor_table_user=order["actor"], action="submitted", reason=None))
+    stage(session, order["table_id"], "order_submitted", {"order_id": order["id"]})
+
+def add_order(session: AsyncSession, order: dict):
+    """Write the order, its lines, event and order_submitted in the caller's transaction."""
+    from app.models.orders import Order
+    session.add(Order(**_order_row(order)))
+    _add_details(session, order)
+
+async def enqueue(order: dict) -> str:
+    return await redis.xadd(_STREAM, {"order": json.dumps(order)})
+
+async def discard(entry_id: str):
+    try:
+        await redis.xdel(_STREAM, entry_id)
+    except Exception:
+        pass  # a consumer will find the cart lines unsubmitted and give the entry up
+
+def _entry_time(entry_id: str) -> float:
+    return int(entry_id.split("-", 1)[0]) / 1000
+
+class IntakeWorkers:
+    def __init__(self):
+        self._tasks: list[asyncio.Task] = []
+
+    async def persist(self, orders: list[dict]) -> list[dict]:
+        """Write the orders whose cart commit has landed, in one transaction; returns
+        the orders that are done with (written, already written or given up)."""
+        from sqlalchemy import select
+        from sqlalchemy.dialects.postgresql import insert
+        from app.db import AsyncSessionLocal
+        from app.models.orders import CartItem, Order
+        line_ids = [l["line_id"] for o in orders for l in o["lines"]]
+        now = time.time()
+        async with AsyncSessionLocal() as session:
+            q = select(CartItem.id, CartItem.version).where(CartItem.id.in_(line_ids), CartItem.state == "submitted")
+            landed = dict((await session.execute(q)).all())
+            ready = [o for o in orders if all(landed.get(l["line_id"]) == o["version"] for l in o["lines"])]
+            if ready:
+                stmt = insert(Order.__table__).values([_order_row(o) for o in ready]).on_conflict_do_nothing()
+                new = set((await session.execute(stmt.returning(Order.__table__.c.id))).scalars().all())
+                for o in ready:
+                    if o["id"] in new:
+                        _add_details(session, o)
+                await session.commit()
+                if new:
+                    outbox_relay.kick()
+        ready_ids = {o["id"] for o in ready}
+        return [o for o in orders if o["id"] in ready_ids or now - o["at"] > settings.intake_give_up_seconds]
+
+    async def consume(self, entries) -> int:
+        """Persist one batch of (entry id, fields) and ack what is done; returns how many."""
+        if not entries:
+            return 0
+        # Fields are None for an entry deleted while pending (its submit failed).
+        orders = {e: json.loads(fields["order"]) for e, fields in entries if fields}
+        done = {o["id"] for o in await self.persist(list(orders.values()))} if orders else set()
+        acked = [e for e, _ in entries if e not in orders or orders[e]["id"] in done]
+        if acked:
+            pipe = redis.pipeline()
+            pipe.xack(_STREAM, _GROUP, *acked)
+            pipe.xdel(_STREAM, *acked)
+            await pipe.execute()
+        return len(acked)
+
+    async def _ensure_group(self):
+        try:
+            await redis.xgroup_create(_STREAM, _GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self, name: str, start: str, block: int | None) -> list:
+        streams = await redis.xreadgroup(_GROUP, name, {_STREAM: start}, count=settings.intake_batch_size, block=block)
+        return streams[0][1] if streams else []
+
+    async def _run(self, name: str):
+        failures, backlog, claimed_at = 0, False, 0.0
+        while True:
+            try:
+                if failures:
+                    await asyncio.sleep(min(0.5 * 2 ** failures, 30))
+                    await self._ensure_group()
+                batches = []
+                if time.monotonic() - claimed_at > 5:
+                    # Take over entries left pending by a consumer that died.
+                    claimed_at = time.monotonic()
+                    _next, stale, *_ = await redis.xautoclaim(_STREAM, _GROUP, name, 10000, "0-0",
+                                                              count=settings.intake_batch_size)
+                    batches.append(stale)
+                if backlog:
+                    # Our own entries whose submit had not committed its cart yet; usually
+                    # a few milliseconds, as entries are appended just before that commit.
+                    await asyncio.sleep(0.1)
+                    batches.append(await self._read(name, "0", None))
+                batches.append(await self._read(name, ">", None if backlog else 1000))
+                backlog = False
+                for entries in batches:
+                    if await self.consume(entries) < len(entries):
+                        backlog = True
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                failures = min(failures + 1, 6)  # Redis or DB down; entries stay pending.
+
+    async def start(self):
+        if settings.order_intake != "queue" or self._tasks:
+            return
+        await self._ensure_group()
+        self._tasks = [asyncio.create_task(self._run(f"{uuid.uuid4().hex[:8]}-{n}"))
+                       for n in range(settings.intake_consumers)]
+
+    async def stats(self) -> dict:
+        """Queue depth (entries not yet persisted), how many are in flight with a
+        consumer, and lag: the age in seconds of the oldest unpersisted entry."""
+        pipe = redis.pipeline(transaction=False)
+        pipe.xlen(_STREAM)
+        pipe.xrange(_STREAM, count=1)
+        pipe.xpending(_STREAM, _GROUP)
+        try:
+            depth, oldest, pending = await pipe.execute()
+        except Exception:
+            depth, oldest, pending = 0, [], {"pending": 0}  # stream or group not created yet
+        return {
+            "mode": settings.order_intake, "depth": depth, "pending": pending["pending"],
+            "lag_seconds": round(time.time() - _entry_time(oldest[0][0]), 3) if oldest else 0.0,
+        }
+
+    async def close(self):
+        tasks, self._tasks = self._tasks, []
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+intake_workers = IntakeWorkers()
@@ -1,11 +1,12 @@
 from app.db import AsyncSession
+from app.services.menu_cache import menu_cache
+from app.services.availability import overlay
 
-# Placeholder hooks for 86 status, quantity deductions, etc.
+# O(1) checks against in-memory state: the active, in-schedule menu comes from
+# the menu snapshot, 86 status from the availability overlay. No per-call SELECT.
 async def is_item_available(session: AsyncSession, item_id: str) -> bool:
-    from sqlalchemy import select
-    from app.models.menu import Item
-    res = await session.execute(select(Item).where(Item.id==item_id))
-    item = res.scalar_one_or_none()
-    if not item or not item.active or item.is_86:
+    snap = await menu_cache.get(session)
+    _segment, orderable = snap.schedule.lookup()
+    if item_id not in orderable:
         return False
-    return True
+    return await overlay.is_available(session, item_id)
@@ -0,0 +1,229 @@
+import asyncio, json, time, uuid
+from datetime import datetime
+from sqlalchemy import select
+from app.db import AsyncSession
+from app.config import settings
+from app.redis_ext import redis, channel_menu
+from app.schemas.common import (
+    CategoryOut, ItemOut, OptionGroupOut, CategoryLocalizedOut, ItemLocalizedOut, OptionGroupLocalizedOut,
+)
+from app.services.locales import supported_locales, pick
+from app.services.schedule import ScheduleIndex
+
+# Shared across workers: the token of the newest menu version. Admin writes bump it,
+# every worker compares it against the snapshot it holds in memory.
+MENU_VERSION_KEY = "menu:version"
+# Encoded deltas kept per snapshot, keyed by (since, lang, schedule segment).
+DELTA_CACHE_SIZE = 64
+
+def _encode(doc: dict) -> bytes:
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode()
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def _group_modifiers(groups, options) -> dict[str, list[dict]]:
+    """Join option groups and options in memory: item_id -> embedded option groups."""
+    opts_by_group: dict[str, list[dict]] = {}
+    for o in options:
+        opts_by_group.setdefault(o.group_id, []).append(dict(
+            id=o.id, name_i18n=o.name_i18n or {}, price_delta=str(o.price_delta),
+            max_per_item=o.max_per_item, is_exclusion=o.is_exclusion
+        ))
+    by_item: dict[str, list[dict]] = {}
+    for g in groups:
+        by_item.setdefault(g.item_id, []).append(OptionGroupOut(
+            id=g.id, name_i18n=g.name_i18n or {}, required=g.required, min_qty=g.min_qty, max_qty=g.max_qty,
+            options=opts_by_group.get(g.id, [])
+        ).model_dump())
+    return by_item
+
+def build_document(cats, items, groups=(), options=()) -> dict:
+    def url_for(item):
+        return f"/media/{item.image_path}" if item.image_path else None
+
+    modifiers = _group_modifiers(groups, options)
+    return {
+        "categories": [CategoryOut(
+            id=c.id, title_i18n=c.title_i18n, description_i18n=c.description_i18n, sort_order=c.sort_order
+        ).model_dump() for c in cats],
+        "items": [ItemOut(
+            id=i.id, category_id=i.category_id, title_i18n=i.title_i18n,
+            description_i18n=i.description_i18n, price=str(i.price), tax_class=i.tax_class,
+            dietary_tags=i.dietary_tags, sort_order=i.sort_order, image_url=url_for(i),
+            option_groups=modifiers.get(i.id, [])
+        ).model_dump() for i in items]
+    }
+
+def project(doc: dict, lang: str) -> dict:
+    """Flatten the *_i18n maps of a menu document down to a single locale."""
+    return {
+        "categories": [CategoryLocalizedOut(
+            id=c["id"], title=pick(c["title_i18n"], lang), description=pick(c["description_i18n"], lang),
+            sort_order=c["sort_order"]
+        ).model_dump() for c in doc["categories"]],
+        "items": [ItemLocalizedOut(
+            id=i["id"], category_id=i["category_id"], title=pick(i["title_i18n"], lang),
+            description=pick(i["description_i18n"], lang), price=i["price"], tax_class=i["tax_class"],
+            dietary_tags=i["dietary_tags"], sort_order=i["sort_order"], image_url=i["image_url"],
+            option_groups=[OptionGroupLocalizedOut(
+                **{k: g[k] for k in ("id", "required", "min_qty", "max_qty")}, name=pick(g["name_i18n"], lang),
+                options=[{**{k: o[k] for k in ("id", "price_delta", "max_per_item", "is_exclusion")},
+                          "name": pick(o["name_i18n"], lang)} for o in g["options"]]
+            ) for g in i.get("option_groups", [])]
+        ).model_dump() for i in doc["items"]],
+        "lang": lang,
+    }
+
+class MenuSnapshot:
+    """Immutable, pre-encoded public menu for one menu version, plus one projection per locale."""
+    def __init__(self, version_token: str, doc: dict, rules: dict | None = None):
+        self.version_token = version_token
+        self.doc = doc
+        self.body = _encode({**doc, "version": version_token})
+        self.etag = f'"{version_token}"'
+        self.localized = {
+            lang: _encode({**project(doc, lang), "version": version_token}) for lang in supported_locales()
+        }
+        self.categories = {c["id"]: c for c in doc["categories"]}
+        self.items = {i["id"]: i for i in doc["items"]}
+        # item_id -> (title in the default locale, price, tax class): everything a cart
+        # line or order line needs, resolved for a whole cart with plain dict lookups.
+        self.catalog = {
+            i["id"]: (pick(i["title_i18n"], settings.locale_default) or i["id"], i["price"], i["tax_class"])
+            for i in doc["items"]
+        }
+        self.schedule = ScheduleIndex(rules or {}, self.items)
+        self.views: dict[tuple, tuple[bytes, str]] = {}
+        self.deltas: dict[tuple, bytes] = {}
+
+    def localized_etag(self, lang: str) -> str:
+        return f'"{self.version_token}.{lang}"'
+
+    def view(self, lang: str | None = None, when: datetime | None = None) -> tuple[bytes, str]:
+        """Encoded body and ETag of the menu as orderable at `when` (dayparts/date ranges applied)."""
+        key, orderable = self.schedule.lookup(when)
+        if len(orderable) == len(self.items):
+            return (self.body, self.etag) if lang is None else (self.localized[lang], self.localized_etag(lang))
+        hit = self.views.get((key, lang))
+        if hit is None:
+            doc = {**self.doc, "items": [i for i in self.doc["items"] if i["id"] in orderable]}
+            tag = f"{self.version_token}.s{key[0]}-{key[1]}"
+            if lang is not None:
+                doc, tag = project(doc, lang), f"{tag}.{lang}"
+            hit = (_encode({**doc, "version": self.version_token}), f'"{tag}"')
+            self.views[(key, lang)] = hit
+        return hit
+
+    def delta(self, since: str, changed, lang: str | None = None, orderable=None) -> bytes:
+        """Encode the entities named in `changed` ((entity, id) pairs) against this snapshot.
+
+        Anything no longer in the snapshot (deactivated or deleted), or an item outside
+        `orderable` when given, is reported as removed.
+        """
+        out = {"categories": [], "items": []}
+        removed = {"categories": [], "items": []}
+        for entity, entity_id in sorted(set(changed)):
+            index, key = (self.categories, "categories") if entity == "category" else (self.items, "items")
+            if entity_id in index and (orderable is None or key == "categories" or entity_id in orderable):
+                out[key].append(index[entity_id])
+            else:
+                removed[key].append(entity_id)
+        if lang is not None:
+            out = project(out, lang)
+        return _encode({"since": since, "version": self.version_token, **out, "removed": removed})
+
+class MenuCache:
+    def __init__(self):
+        self.snapshot: MenuSnapshot | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def stage_bump(self, session: AsyncSession, changes=()) -> str:
+        # Adds the new menu_versions row (and its change log) to the caller's transaction;
+        # call publish() after commit. `changes` is a list of (entity, entity_id) pairs.
+        from app.models.menu import MenuVersion, MenuChange
+        token = uuid.uuid4().hex
+        mv = MenuVersion(version_token=token)
+        session.add(mv)
+        if changes:
+            await session.flush()
+            session.add_all([MenuChange(version_id=mv.id, entity=e, entity_id=eid) for e, eid in changes])
+        return token
+
+    async def publish(self, session: AsyncSession, token: str):
+        await redis.set(MENU_VERSION_KEY, token)
+        self.snapshot = await self._build(session, token)
+        self._checked_at = time.monotonic()
+        await redis.publish(channel_menu(), json.dumps({"event": "menu_updated", "data": {"version": token}}))
+
+    async def get(self, session: AsyncSession) -> MenuSnapshot:
+        snap = self.snapshot
+        if snap and time.monotonic() - self._checked_at < settings.menu_cache_check_seconds:
+            return snap
+        async with self._lock:
+            if self.snapshot and time.monotonic() - self._checked_at < settings.menu_cache_check_seconds:
+                return self.snapshot
+            token = await self._current_token(session)
+            if not self.snapshot or self.snapshot.version_token != token:
+                self.snapshot = await self._build(session, token)
+            self._checked_at = time.monotonic()
+            return self.snapshot
+
+    async def changes_since(self, session: AsyncSession, since: str, lang: str | None = None) -> bytes | None:
+        """Delta from `since` to the current version, or None if `since` is not a known version."""
+        snap = await self.get(session)
+        segment, orderable = snap.schedule.lookup()
+        cached = snap.deltas.get((since, lang, segment))
+        if cached is not None:
+            return cached
+        if since == snap.version_token:
+            changed = []
+        else:
+            from app.models.menu import MenuVersion, MenuChange
+            since_id = (await session.execute(
+                select(MenuVersion.id).where(MenuVersion.version_token == since)
+            )).scalar_one_or_none()
+            if since_id is None:
+                return None
+            changed = (await session.execute(
+                select(MenuChange.entity, MenuChange.entity_id).where(MenuChange.version_id > since_id).distinct()
+            )).all()
+        body = snap.delta(since, changed, lang, orderable)
+        if len(snap.deltas) < DELTA_CACHE_SIZE:
+            snap.deltas[(since, lang, segment)] = body
+        return body
+
+    async def _current_token(self, session: AsyncSession) -> str:
+        token = await redis.get(MENU_VERSION_KEY)
+        if token:
+            return token
+        # Cold start: adopt the newest recorded version, or record the first one.
+        from app.models.menu import MenuVersion
+        res = await session.execute(select(MenuVersion.version_token).order_by(MenuVersion.id.desc()).limit(1))
+        token = res.scalar_one_or_none()
+        if not token:
+            token = await self.stage_bump(session)
+            await session.commit()
+        await redis.set(MENU_VERSION_KEY, token, nx=True)
+        return await redis.get(MENU_VERSION_KEY) or token
+
+    async def _build(self, session: AsyncSession, token: str) -> MenuSnapshot:
+        from app.models.menu import Category, Item, OptionGroup, Option
+        cats = (await session.execute(select(Category).where(Category.active==True).order_by(Category.sort_order))).scalars().all()
+        items = (await session.execute(select(Item).where(Item.active==True).order_by(Item.sort_order))).scalars().all()
+        # Modifiers for every active item in two set-based queries, never per item.
+        groups = (await session.execute(
+            select(OptionGroup).join(Item, Item.id == OptionGroup.item_id).where(Item.active==True).order_by(OptionGroup.id)
+        )).scalars().all()
+        options = (await session.execute(
+            select(Option).join(OptionGroup, OptionGroup.id == Option.group_id)
+            .join(Item, Item.id == OptionGroup.item_id).where(Item.active==True).order_by(Option.id)
+        )).scalars().all()
+        rules = {i.id: i.availability for i in items if i.availability}
+        return MenuSnapshot(token, build_document(cats, items, groups, options), rules)
+
+menu_cache = MenuCache()
@@ -1,5 +1,22 @@
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List, Dict
+from fractions import Fraction
+from functools import lru_cache
+from typing import List, Dict, Mapping, Sequence
+from app.config import settings
+
+# Prices are integer minor units (cents) and lines are parallel arrays, so pricing a
+# tab is integer multiply-adds; exact rational arithmetic happens once per distinct
+# tax rate, never per line.
+#
+# Rounding (ROUND_HALF_UP, i.e. half away from zero, to the cent):
+#   per line   - line amounts quantity * (unit + option delta) are exact integers and
+#                never rounded. Line tax (per_line=True) is the exact line tax rounded
+#                on its own; it is for display and need not add up to the order tax.
+#   per order  - tax-exclusive: subtotal is the exact sum of lines; tax is the exact
+#                sum of line taxes, rounded once.
+#                tax-inclusive: subtotal is the exact sum of line nets (line / (1 + rate)),
+#                rounded once; tax is the exact sum of line taxes (line - net), rounded
+#                once. Total is always rounded subtotal + rounded tax.
 
 def to_decimal(x) -> Decimal:
     return Decimal(str(x))
@@ -7,22 +24,95 @@ def to_decimal(x) -> Decimal:
 def money(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
+@lru_cache(maxsize=4096)
+def _cents(text: str) -> int:
+    cents = Decimal(text) * 100
+    if cents != cents.to_integral_value():
+        raise ValueError(f"amount {text!r} has sub-cent precision")
+    return int(cents)
+
+def to_cents(x) -> int:
+    """Decimal-ish amount to integer cents; sub-cent amounts are refused, not rounded.
+    Memoized on the text, since a tab repeats a handful of menu prices."""
+    return _cents(str(x))
+
+def from_cents(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+def div_half_up(num: int, den: int) -> int:
+    """num / den (den > 0) rounded half away from zero, in integers."""
+    whole, rest = divmod(abs(num), den)
+    if 2 * rest >= den:
+        whole += 1
+    return whole if num >= 0 else -whole
+
+def round_half_up(x: Fraction) -> int:
+    return div_half_up(x.numerator, x.denominator)
+
+@lru_cache(maxsize=1)
+def _tax_rates() -> dict[str, Decimal]:
+    pairs = (p.split(":", 1) for p in settings.tax_rates.split(",") if ":" in p)
+    return {k.strip(): Decimal(r.strip()) for k, r in pairs}
+
+def tax_rate_for(tax_class: str | None, default: Decimal = Decimal("0.10")) -> Decimal:
+    return _tax_rates().get(tax_class or "standard", default)
+
+def price_lines(
+    quantities: Sequence[int],
+    unit_cents: Sequence[int],
+    option_cents: Sequence[int] | None = None,
+    tax_classes: Sequence | None = None,
+    rates: Mapping | None = None,
+    tax_inclusive: bool = False,
+    default_rate: Decimal = Decimal("0.10"),
+    per_line: bool = False,
+) -> dict:
+    """Totals in cents for lines given as parallel arrays.
+
+    `option_cents` is the per-unit option delta of each line. `tax_classes` names each
+    line's class and `rates` maps a class to its rate (a missing class, or no classes at
+    all, uses `default_rate`). With per_line=True the result also has `lines` and
+    `line_tax`, the exact line amounts and their individually rounded taxes.
+    """
+    if option_cents is None:
+        amounts = [q * u for q, u in zip(quantities, unit_cents)]
+    else:
+        amounts = [q * (u + o) for q, u, o in zip(quantities, unit_cents, option_cents)]
+    if tax_classes is None:
+        by_class = {None: sum(amounts)}
+    else:
+        by_class = {}
+        for cls, amount in zip(tax_classes, amounts):
+            by_class[cls] = by_class.get(cls, 0) + amount
+    rate_of = {cls: Fraction(to_decimal((rates or {}).get(cls, default_rate))) for cls in by_class}
+
+    gross = sum(by_class.values())
+    if tax_inclusive:
+        net = sum((Fraction(amount) / (1 + rate_of[cls]) for cls, amount in by_class.items()), Fraction(0))
+        subtotal, tax = round_half_up(net), round_half_up(gross - net)
+    else:
+        subtotal = gross
+        tax = round_half_up(sum((amount * rate_of[cls] for cls, amount in by_class.items()), Fraction(0)))
+    out = {"subtotal_cents": subtotal, "tax_cents": tax, "total_cents": subtotal + tax}
+
+    if per_line:
+        # Line tax is amount * n / d with rate n/d exclusive, amount * n / (d + n) inclusive.
+        ratio = {cls: (r.numerator, r.denominator + r.numerator if tax_inclusive else r.denominator)
+                 for cls, r in rate_of.items()}
+        classes = tax_classes if tax_classes is not None else [None] * len(amounts)
+        line_tax = []
+        for amount, cls in zip(amounts, classes):
+            n, d = ratio[cls]
+            line_tax.append(div_half_up(amount * n, d))
+        out["lines"], out["line_tax"] = amounts, line_tax
+    return out
+
 def compute_totals(line_items: List[Dict], tax_inclusive: bool = False, tax_rate: Decimal = Decimal("0.10")) -> dict:
-    subtotal = Decimal("0.00")
-    tax = Decimal("0.00")
-    for li in line_items:
-        qty = to_decimal(li.get("quantity", 1))
-        price_each = to_decimal(li.get("price_each", "0"))
-        line_sub = qty * price_each
-        if tax_inclusive:
-            base = (line_sub / (Decimal("1.0") + tax_rate))
-            line_tax = line_sub - base
-            subtotal += base
-            tax += line_tax
-        else:
-            subtotal += line_sub
-            tax += line_sub * tax_rate
-    subtotal = money(subtotal)
-    tax = money(tax)
-    total = money(subtotal + tax)
-    return {"subtotal": subtotal, "tax": tax, "total": total}
+    """Decimal totals for line dicts (quantity, price_each, optional tax_rate), via price_lines."""
+    quantities = [int(li.get("quantity", 1)) for li in line_items]
+    prices = [to_cents(li.get("price_each", "0")) for li in line_items]
+    classes = [li.get("tax_rate", tax_rate) for li in line_items]
+    res = price_lines(quantities, prices, tax_classes=classes, rates={r: r for r in classes},
+                      tax_inclusive=tax_inclusive, default_rate=tax_rate)
+    return {"subtotal": from_cents(res["subtotal_cents"]), "tax": from_cents(res["tax_cents"]),
+            "total": from_cents(res["total_cents"])}
@@ -0,0 +1,130 @@
+"""Compiled Item.availability rules.
+
+Rule shape (all keys optional; an item without rules is always orderable)::
+
+    {"dayparts": [{"days": ["mon", "tue"], "start": "11:00", "end": "14:30"}],
+     "date_ranges": [{"start": "2026-12-01", "end": "2026-12-31"}]}
+
+Dayparts are local wall-clock times (settings.timezone); an end at or before the
+start runs past midnight. Date ranges are inclusive. An item with dayparts must
+be inside one of them, and an item with date ranges must be inside one of those.
+
+Every item's rules are compiled once per menu version into two interval indexes
+(minute-of-week and date ordinal). A lookup is then two bisects plus a memoised
+set per (weekly segment, date segment) pair, whatever the menu size.
+"""
+from bisect import bisect_right
+from datetime import datetime, date, timedelta
+from zoneinfo import ZoneInfo
+from app.config import settings
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+
+def _minutes(hhmm: str) -> int:
+    h, m = str(hhmm).split(":", 1)
+    return int(h) * 60 + int(m)
+
+def _day_index(d) -> int:
+    return int(d) % 7 if isinstance(d, int) else DAYS.index(str(d)[:3].lower())
+
+def _weekly_intervals(dayparts) -> list[tuple[int, int]]:
+    out = []
+    for dp in dayparts:
+        start, end = _minutes(dp.get("start", "00:00")), _minutes(dp.get("end", "24:00"))
+        length = end - start if end > start else DAY_MINUTES - start + end
+        for d in dp.get("days") or DAYS:
+            s = _day_index(d) * DAY_MINUTES + start
+            e = s + length
+            if e <= WEEK_MINUTES:
+                out.append((s, e))
+            else:
+                out += [(s, WEEK_MINUTES), (0, e - WEEK_MINUTES)]
+    return out
+
+def _date_intervals(ranges) -> list[tuple[int, int]]:
+    out = []
+    for r in ranges:
+        start = date.fromisoformat(r["start"]).toordinal() if r.get("start") else date.min.toordinal()
+        end = date.fromisoformat(r["end"]).toordinal() + 1 if r.get("end") else date.max.toordinal()
+        out.append((start, end))
+    return out
+
+class _IntervalIndex:
+    """Elementary segments over all interval endpoints, each with the ids covering it."""
+    def __init__(self, intervals: dict[str, list[tuple[int, int]]]):
+        self.bounds = sorted({p for ivs in intervals.values() for iv in ivs for p in iv})
+        sets = [set() for _ in range(len(self.bounds) + 1)]
+        for key, ivs in intervals.items():
+            for s, e in ivs:
+                for seg in range(bisect_right(self.bounds, s), bisect_right(self.bounds, e)):
+                    sets[seg].add(key)
+        self.sets = [frozenset(s) for s in sets]
+
+    def segment(self, x: int) -> int:
+        return bisect_right(self.bounds, x)
+
+    def next_bound(self, x: int) -> int | None:
+        seg = self.segment(x)
+        return self.bounds[seg] if seg < len(self.bounds) else None
+
+class ScheduleIndex:
+    def __init__(self, rules: dict[str, dict], item_ids):
+        self.all = frozenset(item_ids)
+        weekly, dated = {}, {}
+        for item_id, rule in rules.items():
+            if item_id not in self.all or not isinstance(rule, dict):
+                continue
+            try:
+                if rule.get("dayparts"):
+                    weekly[item_id] = _weekly_intervals(rule["dayparts"])
+                if rule.get("date_ranges"):
+                    dated[item_id] = _date_intervals(rule["date_ranges"])
+            except (KeyError, ValueError, TypeError, AttributeError):
+                # Malformed rules never hide an item; fix them in admin instead.
+                weekly.pop(item_id, None)
+                dated.pop(item_id, None)
+        self.weekly, self.weekly_items = _IntervalIndex(weekly), frozenset(weekly)
+        self.dated, self.dated_items = _IntervalIndex(dated), frozenset(dated)
+        self.restricted = bool(weekly or dated)
+        self._memo: dict[tuple[int, int], frozenset] = {}
+
+    @staticmethod
+    def _local(when: datetime | None) -> datetime:
+        tz = ZoneInfo(settings.timezone)
+        return datetime.now(tz) if when is None else when.astimezone(tz)
+
+    @staticmethod
+    def _week_minute(local: datetime) -> int:
+        return local.weekday() * DAY_MINUTES + local.hour * 60 + local.minute
+
+    def lookup(self, when: datetime | None = None) -> tuple[tuple[int, int], frozenset]:
+        """(segment key, ids orderable at `when`); the key changes only when the set can."""
+        if not self.restricted:
+            return (0, 0), self.all
+        local = self._local(when)
+        key = (self.weekly.segment(self._week_minute(local)), self.dated.segment(local.toordinal()))
+        hit = self._memo.get(key)
+        if hit is None:
+            w, d = key
+            hit = self.all - (self.weekly_items - self.weekly.sets[w]) - (self.dated_items - self.dated.sets[d])
+            self._memo[key] = hit
+        return key, hit
+
+    def next_change(self, when: datetime | None = None) -> datetime | None:
+        """Earliest local time after `when` at which the orderable set may change."""
+        if not self.restricted:
+            return None
+        local = self._local(when)
+        candidates = []
+        minute = self._week_minute(local)
+        nb = self.weekly.next_bound(minute)
+        if nb is None and self.weekly.bounds:
+            nb = self.weekly.bounds[0] + WEEK_MINUTES
+        if nb is not None:
+            candidates.append(local.replace(second=0, microsecond=0) + timedelta(minutes=nb - minute))
+        nd = self.dated.next_bound(local.toordinal())
+        if nd is not None and nd < date.max.toordinal():
+            candidates.append(datetime.combine(date.fromordinal(nd), datetime.min.time(), local.tzinfo))
+        return min(candidates) if candidates else None
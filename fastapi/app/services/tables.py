@@ -0,0 +1,81 @@
+import asyncio, time
+from app.db import AsyncSession
+from app.config import settings
+from app.redis_ext import redis, channel_tables
+
+# opaque_uid -> table, resolved once per TTL instead of on every diner request.
+# Tables are edited rarely and out of band, so entries also carry a TTL; an
+# explicit invalidate() drops them here and, through Redis, in every worker.
+# Unknown opaques are never cached so that a newly added table resolves at once.
+
+class TableRef:
+    __slots__ = ("id", "name", "active")
+
+    def __init__(self, id: int, name: str, active: bool):
+        self.id = id
+        self.name = name
+        self.active = active
+
+class TableResolver:
+    def __init__(self):
+        self.entries: dict[str, tuple[float, TableRef]] = {}
+        self._listener: asyncio.Task | None = None
+
+    def cached(self, opaque: str) -> TableRef | None:
+        hit = self.entries.get(opaque)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        return None
+
+    def store(self, opaque: str, ref: TableRef):
+        self.entries[opaque] = (time.monotonic() + settings.table_cache_ttl_seconds, ref)
+
+    def drop(self, opaque: str | None = None):
+        if opaque is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(opaque, None)
+
+    async def resolve(self, session: AsyncSession, opaque: str) -> TableRef | None:
+        self._ensure_listener()
+        ref = self.cached(opaque)
+        if ref is not None:
+            return ref
+        ref = await self._load(session, opaque)
+        if ref is None:
+            self.drop(opaque)
+        else:
+            self.store(opaque, ref)
+        return ref
+
+    async def _load(self, session: AsyncSession, opaque: str) -> TableRef | None:
+        from sqlalchemy import select
+        from app.models.tables import Table
+        row = (await session.execute(
+            select(Table.id, Table.name, Table.active).where(Table.opaque_uid == opaque)
+        )).first()
+        return TableRef(row.id, row.name, bool(row.active)) if row else None
+
+    async def invalidate(self, opaque: str | None = None):
+        """Forget one table (or all of them) in every worker."""
+        self.drop(opaque)
+        await redis.publish(channel_tables(), opaque or "*")
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel_tables())
+            async for msg in pubsub.listen():
+                if msg and msg.get("type") == "message":
+                    self.drop(None if msg["data"] == "*" else msg["data"])
+        except Exception:
+            # Invalidations may have been missed; start cold and resubscribe on the next resolve.
+            self.drop()
+        finally:
+            await pubsub.aclose()
+
+table_resolver = TableResolver()
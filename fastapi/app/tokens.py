@@ -1,4 +1,6 @@
 import time, json, hmac, hashlib, base64, re
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional
 from app.config import settings
 
@@ -9,19 +11,60 @@ def _b64d(s: str) -> bytes:
     pad = '=' * (-len(s) % 4)
     return base64.urlsafe_b64decode(s + pad)
 
+@lru_cache(maxsize=32)
+def _kid(key: str) -> str:
+    # Derived from the key material so a key keeps its id when it moves from K1 to K0.
+    return _b64e(hashlib.sha256(b"kid:" + key.encode()).digest()[:6])
+
 def sign(payload: dict, key: str) -> str:
     body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
     sig = hmac.new(key.encode(), body, hashlib.sha256).digest()
-    return _b64e(body) + "." + _b64e(sig)
+    return _kid(key) + "." + _b64e(body) + "." + _b64e(sig)
+
+# token -> (kid, payload, exp) for recently verified tokens; bounded LRU.
+_memo: "OrderedDict[str, tuple[str, dict, int | None]]" = OrderedDict()
+
+def _remember(token: str, kid: str, payload: dict):
+    exp = payload.get("exp") if isinstance(payload, dict) else None
+    if exp is not None and exp < time.time():
+        return
+    _memo[token] = (kid, payload, exp)
+    if len(_memo) > settings.token_memo_size:
+        _memo.popitem(last=False)
 
 def verify(token: str, keys: list[str]) -> Optional[dict]:
+    hit = _memo.get(token)
+    if hit is not None:
+        kid, payload, exp = hit
+        if exp is not None and exp < time.time():
+            del _memo[token]
+            return None
+        if any(_kid(k) == kid for k in keys):
+            _memo.move_to_end(token)
+            return payload
+        return None
     try:
-        body_b64, sig_b64 = token.split(".", 1)
+        parts = token.split(".")
+        if len(parts) == 3:
+            kid, body_b64, sig_b64 = parts
+            key = next((k for k in keys if _kid(k) == kid), None)
+            if key is None:
+                return None
+            candidates = [key]
+        elif len(parts) == 2:
+            # Tokens issued before key ids: try each key.
+            body_b64, sig_b64 = parts
+            candidates = keys
+        else:
+            return None
         body = _b64d(body_b64)
-        for k in keys:
+        sig = _b64d(sig_b64)
+        for k in candidates:
             expect = hmac.new(k.encode(), body, hashlib.sha256).digest()
-            if hmac.compare_digest(expect, _b64d(sig_b64)):
-                return json.loads(body.decode())
+            if hmac.compare_digest(expect, sig):
+                payload = json.loads(body.decode())
+                _remember(token, _kid(k), payload)
+                return payload
         return None
     except Exception:
         return None
@@ -39,20 +82,22 @@ _ALLOWED_OPAQUE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
 def extract_opaque(token_or_raw: str) -> Optional[str]:
     if not token_or_raw:
         return None
+    # Raw opaque? (cheapest check first; signed tokens always contain '.')
+    if _ALLOWED_OPAQUE.match(token_or_raw):
+        return token_or_raw
+    # JSON-ish (bootstrap from client)?
+    if token_or_raw[0] == "{":
+        try:
+            j = json.loads(token_or_raw)
+            if isinstance(j, dict) and "tab" in j and _ALLOWED_OPAQUE.match(j["tab"] or ""):
+                return j["tab"]
+        except Exception:
+            pass
+        return None
     # Signed?
     data = parse_table_token(token_or_raw)
     if data and "tab" in data:
         return data["tab"]
-    # JSON-ish (bootstrap from client)?
-    try:
-        j = json.loads(token_or_raw)
-        if isinstance(j, dict) and "tab" in j and _ALLOWED_OPAQUE.match(j["tab"] or ""):
-            return j["tab"]
-    except Exception:
-        pass
-    # Raw opaque?
-    if _ALLOWED_OPAQUE.match(token_or_raw):
-        return token_or_raw
     return None
 
 def issue_session_cap(table_id: int, session_id: str, ttl_seconds: int = 600) -> str:
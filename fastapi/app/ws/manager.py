@@ -1,6 +1,6 @@
 import asyncio, json
 from typing import Dict, Set
-from app.redis_ext import redis, channel_for_table, channel_staff
+from app.redis_ext import redis, channel_for_table, channel_staff, channel_menu
 from starlette.websockets import WebSocket
 
 class WSManager:
@@ -32,13 +32,13 @@ class WSManager:
 
     async def _listen_table(self, table_id: int, ws: WebSocket):
         pubsub = redis.pubsub()
-        await pubsub.subscribe(channel_for_table(table_id))
+        await pubsub.subscribe(channel_for_table(table_id), channel_menu())
         try:
             async for msg in pubsub.listen():
                 if msg and msg.get("type") == "message":
                     await ws.send_text(msg["data"])
         finally:
-            await pubsub.unsubscribe(channel_for_table(table_id))
+            await pubsub.unsubscribe(channel_for_table(table_id), channel_menu())
 
     async def _listen_staff(self, ws: WebSocket):
         pubsub = redis.pubsub()
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends
 from starlette.websockets import WebSocketState
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_async_session
 from app.tokens import extract_opaque, verify_session_cap
 from app.ws.manager import manager
-from app.models.tables import Table
+from app.services.tables import table_resolver
+from app.services.session_tracker import session_tracker
 from app.auth.deps import staff_required
 from app.config import settings
 
@@ -28,15 +28,16 @@ async def ws_table(websocket: WebSocket, token: str = Query(...), session_id: st
         cap = verify_session_cap(session_cap)
         if not opaque or not cap:
             await websocket.close(code=4401); return
-        res = await db.execute(select(Table).where(Table.opaque_uid==opaque))
-        table = res.scalar_one_or_none()
+        table = await table_resolver.resolve(db, opaque)
         if not table or table.id != cap.get("tid"):
             await websocket.close(code=4403); return
+        session_tracker.touch(table.id, cap["sid"])
         await manager.connect_table(table.id, websocket)
         await websocket.send_json({"event": "hello", "data": {"table_id": table.id}})
         while True:
             # No client->server messages required; keep alive by reading
             await websocket.receive_text()
+            session_tracker.touch(table.id, cap["sid"])
     except WebSocketDisconnect:
         pass
     finally:
@@ -54,6 +54,13 @@ def qr():
                 print(f"QR for {name} -> {url}")
     asyncio.run(_qr())
 
+@cli.command()
+def invalidate_tables():
+    # Run after editing the tables table by hand so workers drop their cached opaque_uid lookups.
+    from app.services.tables import table_resolver
+    asyncio.run(table_resolver.invalidate())
+    print("Table cache invalidated in all workers.")
+
 @cli.command()
 def assets():
     # Fingerprint static asset files by content hash (basic; keep original filenames for dev)
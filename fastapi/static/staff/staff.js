@@ -13,28 +13,42 @@
   qs('#refreshBtn').onclick=()=>loadOrders();
   qs('#filterState').onchange=()=>loadOrders();
 
-  async function loadOrders(){
+  async function loadOrders(cursor){
+    const params=new URLSearchParams();
     const state=qs('#filterState').value;
-    const r=await fetch('/api/staff/orders'+(state?`?state=${encodeURIComponent(state)}`:''));
+    if(state) params.set('state', state);
+    if(cursor) params.set('cursor', cursor);
+    const r=await fetch('/api/staff/orders?'+params);
     if(!r.ok){ ordersEl.textContent='Not authorized'; return; }
-    const data=await r.json(); renderOrders(data.orders);
+    const data=await r.json(); renderOrders(data.orders, !cursor, data.next_cursor);
   }
 
-  function renderOrders(list){
-    ordersEl.innerHTML='';
+  function renderOrders(list, fresh, next){
+    if(fresh) ordersEl.innerHTML='';
+    ordersEl.querySelector('.more')?.remove();
     list.forEach(o=>{
       const card=document.createElement('div'); card.className='card';
       const row=document.createElement('div'); row.className='row';
-      row.innerHTML=`<div><strong>Table ${o.table_id}</strong> — <span class="badge">${o.state}</span></div><div>${new Date(o.created_at).toLocaleTimeString()}</div>`;
+      row.innerHTML=`<div><strong>Table ${o.table_id}</strong> — <span class="badge">${o.state}</span></div><div>${new Date(o.created_at).toLocaleTimeString()} · ${mins(o.ticket_s ?? o.elapsed_s)}</div>`;
+      const lines=document.createElement('ul');
+      o.items.forEach(i=>{ const li=document.createElement('li'); li.textContent=`${i.quantity}× ${i.title}${i.notes?' — '+i.notes:''}`; lines.appendChild(li); });
       const actions=document.createElement('div');
       ['accept','ready','served','void'].forEach(a=>{
         const b=document.createElement('button'); b.textContent=a; b.onclick=()=>act(o.id,a); actions.appendChild(b);
       });
-      card.appendChild(row); card.appendChild(actions);
+      card.appendChild(row); card.appendChild(lines); card.appendChild(actions);
       ordersEl.appendChild(card);
     });
+    if(next){
+      const b=document.createElement('button'); b.className='more'; b.textContent='Load more';
+      b.onclick=()=>loadOrders(next); ordersEl.appendChild(b);
+    }
   }
 
+  // Timers come from the server (elapsed_s, or ticket_s once served), so every
+  // screen shows the same age whatever its own clock says.
+  function mins(s){ return `${Math.floor(s/60)}m ${String(s%60).padStart(2,'0')}s`; }
+
   async function act(id, action){
     const path=action==='void'?`/api/staff/orders/${id}/void`:`/api/staff/orders/${id}/${action}`;
     const headers={'X-CSRF-Token': csrf(),'Content-Type':'application/json'};
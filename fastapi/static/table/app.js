@@ -19,7 +19,7 @@
     return btoa(JSON.stringify({tab: opaque, bootstrap:true}));
   }
 
-  const state={menu:{categories:[],items:[]}, cart:{cart_id:null, items:[]}, table_name:'', session_id:null, session_cap:null, ws:null};
+  const state={menu:{categories:[],items:[]}, unavailable:new Set(), cart:{cart_id:null, items:[]}, table_name:'', session_id:null, session_cap:null, ws:null};
 
   async function startSession(){
     const r=await fetch('/api/public/session/start', {
@@ -33,9 +33,36 @@
   }
 
   async function loadMenu(){
-    const r = await fetch('/api/public/menu?table_token='+encodeURIComponent(atob(tableToken)));
+    const r = await fetch('/api/public/menu?table_token='+encodeURIComponent(atob(tableToken))+'&lang=auto');
     const data = await r.json();
     state.menu=data;
+    // Dayparts: the server tells us when the orderable set next changes.
+    const until=parseInt(r.headers.get('X-Menu-Valid-Until')||'0', 10);
+    clearTimeout(state.menuTimer);
+    if(until){ state.menuTimer=setTimeout(loadMenu, Math.max(1000, until*1000-Date.now()+500)); }
+    renderMenu();
+  }
+
+  async function loadAvailability(){
+    const r = await fetch('/api/public/menu/availability?table_token='+encodeURIComponent(atob(tableToken)));
+    if(!r.ok) return;
+    const data = await r.json();
+    state.unavailable=new Set(data.unavailable);
+    renderMenu();
+  }
+
+  async function syncMenu(){
+    if(!state.menu.version) return loadMenu();
+    const r = await fetch('/api/public/menu/changes?table_token='+encodeURIComponent(atob(tableToken))+'&lang=auto&since='+encodeURIComponent(state.menu.version));
+    if(!r.ok) return loadMenu();
+    const d = await r.json();
+    const merge=(list, upserts, removed)=>{
+      const drop=new Set(removed.concat(upserts.map(x=>x.id)));
+      return list.filter(x=>!drop.has(x.id)).concat(upserts).sort((a,b)=>a.sort_order-b.sort_order);
+    };
+    state.menu.categories=merge(state.menu.categories, d.categories, d.removed.categories);
+    state.menu.items=merge(state.menu.items, d.items, d.removed.items);
+    state.menu.version=d.version;
     renderMenu();
   }
 
@@ -47,9 +74,36 @@
     renderCart();
   }
 
+  async function syncCart(){
+    // Fetch only the lines changed since our version; the server falls back to the full cart.
+    const cur=state.cart.version||0;
+    if(!cur) return loadCart();
+    const r=await fetch('/api/public/cart?table_token='+encodeURIComponent(atob(tableToken))+'&session_cap='+encodeURIComponent(state.session_cap)+'&since_version='+cur);
+    if(!r.ok) return;
+    const d=await r.json();
+    if(d.since_version==null){ state.cart=d; renderCart(); return; }
+    const fresh=new Map(d.items.map(x=>[x.id, x]));
+    const known=new Set(state.cart.items.map(x=>x.id));
+    state.cart.items=state.cart.items.map(x=>fresh.get(x.id)||x).concat(d.items.filter(x=>!known.has(x.id))).filter(x=>x.state!=='removed');
+    state.cart.version=d.version;
+    renderCart();
+  }
+
+  function applyCartDelta(d){
+    // Versioned cart_updated delta; anything but the next version means we missed one.
+    const cur=state.cart.version||0;
+    if(d.version<=cur) return;
+    if(d.version!==cur+1){ syncCart(); return; }
+    const changed=new Map(d.changed.map(x=>[x.id, x]));
+    const drop=new Set(d.removed.concat(d.added.map(x=>x.id), d.added.map(x=>'pending:'+x.client_uid)));
+    state.cart.items=state.cart.items.filter(x=>!drop.has(x.id)).map(x=>changed.get(x.id)||x).concat(d.added);
+    state.cart.version=d.version;
+    renderCart();
+  }
+
   function optimisticAdd(item){
     const client_uid=genId();
-    const entry={id:'pending:'+client_uid, client_uid, item_id:item.id, title:item.title_i18n?.en||'Item', quantity:1, options:{}, notes:null, added_by:anonId, state:'in_cart'};
+    const entry={id:'pending:'+client_uid, client_uid, item_id:item.id, title:item.title||'Item', quantity:1, options:{}, notes:null, added_by:anonId, state:'in_cart'};
     state.cart.items.push(entry);
     renderCart();
     const idem=genId();
@@ -67,19 +121,32 @@
     if(!navigator.onLine) return;
     const q = JSON.parse(localStorage.getItem(changeQueueKey)||'[]');
     if(q.length===0) return;
-    const ev=q.shift();
+    // Send the whole queue as one batch; each edit keeps its own idempotency key.
+    const batch=q.splice(0, 50);
     localStorage.setItem(changeQueueKey, JSON.stringify(q));
     try{
-      if(ev.type==='add'){
-        const r=await fetch('/api/public/cart/items?table_token='+encodeURIComponent(atob(tableToken))+'&session_cap='+encodeURIComponent(state.session_cap)+'&anon_user_id='+encodeURIComponent(anonId), {
-          method:'POST', headers:{'Content-Type':'application/json', 'Idempotency-Key': ev.idem},
-          body: JSON.stringify(ev.payload)
-        });
-        if(r.ok){ const data=await r.json(); state.cart=data; renderCart(); }
+      const ops=batch.map(ev=>ev.type==='add' ? {op:'add', idem_key:ev.idem, item:ev.payload} : {op:ev.type, idem_key:ev.idem, ...ev.payload});
+      const r=await fetch('/api/public/cart/ops?table_token='+encodeURIComponent(atob(tableToken))+'&session_cap='+encodeURIComponent(state.session_cap)+'&anon_user_id='+encodeURIComponent(anonId), {
+        method:'POST', headers:{'Content-Type':'application/json'},
+        body: JSON.stringify({ops})
+      });
+      if(r.ok){
+        const data=await r.json();
+        // Swap our placeholders for the real lines; if the socket beat us to it, they are already there.
+        const uids=new Set(batch.filter(ev=>ev.type==='add').map(ev=>'pending:'+ev.payload.client_uid));
+        state.cart.items=state.cart.items.filter(x=>!uids.has(x.id));
+        const items=data.results.filter(x=>x.status==='applied').map(x=>x.item);
+        applyCartDelta({version:data.version,
+          added:items.filter(x=>x.state!=='removed' && !state.cart.items.some(y=>y.id===x.id)),
+          changed:items.filter(x=>x.state!=='removed' && state.cart.items.some(y=>y.id===x.id)),
+          removed:items.filter(x=>x.state==='removed').map(x=>x.id)});
+        renderCart();
+      }else if(r.status>=500 || r.status===409){
+        throw new Error('retry');
       }
     }catch(e){
-      // requeue with backoff
-      setTimeout(()=>{ enqueueChange(ev); }, 1000);
+      // requeue with backoff, ahead of anything queued meanwhile
+      setTimeout(()=>{ localStorage.setItem(changeQueueKey, JSON.stringify(batch.concat(JSON.parse(localStorage.getItem(changeQueueKey)||'[]')))); }, 1000);
     }
     if(JSON.parse(localStorage.getItem(changeQueueKey)||'[]').length>0){ flushQueue(); }
   }
@@ -88,14 +155,21 @@
     if(state.ws){ try{state.ws.close();}catch{} }
     const url=`${location.protocol==='https:'?'wss':'ws'}://${location.host}/ws/table?token=${encodeURIComponent(atob(tableToken))}&session_id=${encodeURIComponent(state.session_id)}&session_cap=${encodeURIComponent(state.session_cap)}`;
     const ws=new WebSocket(url);
-    ws.onopen=()=>{};
+    ws.onopen=()=>{
+      if(state.ws_opened){ syncCart(); }  // deltas may have been missed while disconnected
+      state.ws_opened=true;
+    };
     ws.onmessage=(ev)=>{
       try{
         const msg=JSON.parse(ev.data);
-        if(msg.event==='cart_updated'){ loadCart(); }
+        if(msg.event==='cart_updated'){ applyCartDelta(msg.data); }
         if(msg.event==='order_submitted'){ notify('Order submitted'); }
         if(msg.event==='order_state_changed'){ notify('Order '+msg.data.state); }
-        if(msg.event==='menu_updated'){ loadMenu(); }
+        if(msg.event==='menu_updated'){ syncMenu(); }
+        if(msg.event==='availability_changed'){
+          if(msg.data.available){ state.unavailable.delete(msg.data.item_id); } else { state.unavailable.add(msg.data.item_id); }
+          renderMenu();
+        }
       }catch{}
     };
     ws.onclose=()=>{ setTimeout(connectWS, 2000); };
@@ -105,7 +179,7 @@
   function renderMenu(){
     const cats=qs('#categories'); cats.innerHTML='';
     state.menu.categories.forEach((c,i)=>{
-      const b=document.createElement('button'); b.className='tab'; b.textContent=c.title_i18n?.en || 'Category'; b.setAttribute('role','tab'); b.setAttribute('aria-selected', i===0 ? 'true':'false');
+      const b=document.createElement('button'); b.className='tab'; b.textContent=c.title || 'Category'; b.setAttribute('role','tab'); b.setAttribute('aria-selected', i===0 ? 'true':'false');
       b.onclick=()=>{ document.querySelectorAll('.tab').forEach(x=>x.setAttribute('aria-selected','false')); b.setAttribute('aria-selected','true'); renderItems(c.id); };
       cats.appendChild(b);
     });
@@ -113,10 +187,10 @@
   }
   function renderItems(catId){
     const el=qs('#items'); el.innerHTML='';
-    const items=state.menu.items.filter(i=>i.category_id===catId && !i.is_86);
+    const items=state.menu.items.filter(i=>i.category_id===catId && !state.unavailable.has(i.id));
     items.forEach(it=>{
       const div=document.createElement('div'); div.className='card';
-      const t=document.createElement('div'); t.textContent=(it.title_i18n?.en)||'Item';
+      const t=document.createElement('div'); t.textContent=it.title||'Item';
       const p=document.createElement('div'); p.className='muted'; p.textContent=`$${it.price}`;
       const btn=document.createElement('button'); btn.className='primary'; btn.textContent='Add';
       btn.onclick=()=>optimisticAdd(it);
@@ -144,6 +218,7 @@
   (async function(){
     await startSession();
     await loadMenu();
+    await loadAvailability();
     await loadCart();
     connectWS();
     setInterval(flushQueue, 1500);
@@ -0,0 +1,46 @@
+import asyncio, json, time
+from app.services import intake
+
+class _Redis:
+    def __init__(self):
+        self.acked=[]
+        self.deleted=[]
+    def pipeline(self, transaction=True):
+        return _Pipe(self)
+
+class _Pipe:
+    def __init__(self, fake):
+        self.fake=fake
+        self.ops=[]
+    def xack(self, stream, group, *ids):
+        self.ops.append((self.fake.acked, ids))
+    def xdel(self, stream, *ids):
+        self.ops.append((self.fake.deleted, ids))
+    async def execute(self):
+        for into, ids in self.ops:
+            into.extend(ids)
+
+def _entry(entry_id, order_id, at=None):
+    order={"id": order_id, "table_id": 7, "version": 3, "at": at or time.time(), "lines": []}
+    return entry_id, {"order": json.dumps(order)}
+
+def test_consume_acks_written_and_stale_entries_only(monkeypatch):
+    fake=_Redis()
+    monkeypatch.setattr(intake, "redis", fake)
+    monkeypatch.setattr(intake.settings, "intake_give_up_seconds", 60)
+    workers=intake.IntakeWorkers()
+    seen=[]
+    async def persist(orders):
+        seen.append([o["id"] for o in orders])
+        return [o for o in orders if o["id"]=="o1" or time.time()-o["at"]>60]
+    workers.persist=persist
+
+    entries=[
+        _entry("1-0", "o1"),                        # cart committed: written
+        _entry("2-0", "o2"),                        # cart commit not landed yet: stays pending
+        _entry("3-0", "o3", at=time.time()-120),    # submit failed long ago: given up
+        ("4-0", None),                              # deleted while pending
+    ]
+    assert asyncio.run(workers.consume(entries))==3
+    assert seen==[["o1", "o2", "o3"]]  # one batch, one transaction
+    assert fake.acked==fake.deleted==["1-0", "3-0", "4-0"]
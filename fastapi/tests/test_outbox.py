@@ -0,0 +1,69 @@
+import asyncio
+from app.services import outbox
+
+class _Redis:
+    def __init__(self, fail=0):
+        self.fail=fail
+        self.sent=[]
+        self.leader=None
+    def pipeline(self, transaction=True):
+        return _Pipe(self)
+    async def eval(self, script, numkeys, key, token, ttl):
+        if self.leader in (None, token):
+            self.leader=token
+            return 1
+        return 0
+
+class _Pipe:
+    def __init__(self, fake):
+        self.fake=fake
+        self.queued=[]
+    def publish(self, channel, msg):
+        self.queued.append((channel, msg))
+    async def execute(self):
+        if self.fake.fail:
+            self.fake.fail-=1
+            raise ConnectionError("redis down")
+        self.fake.sent.extend(self.queued)
+
+def _relay(rows):
+    relay=outbox.OutboxRelay()
+    async def fetch(limit):
+        return [(i, *rows[i]) for i in sorted(rows)[:limit]]
+    async def delete(ids):
+        for i in ids:
+            del rows[i]
+    relay._fetch=fetch
+    relay._delete=delete
+    return relay
+
+def test_relay_publishes_in_order_in_batches_and_retries(monkeypatch):
+    fake=_Redis(fail=1)
+    monkeypatch.setattr(outbox, "redis", fake)
+    msgs={i: outbox.message("order_state_changed", {"n": i}) for i in range(1, 6)}
+    rows={i: (7 if i%2 else None, msgs[i]) for i in msgs}  # even ids are staff-only
+    relay=_relay(rows)
+
+    async def scenario():
+        try:
+            await relay.relay(limit=2)
+        except ConnectionError:
+            pass
+        assert len(rows)==5 and fake.sent==[]  # nothing deleted until Redis took the batch
+        assert await relay.relay(limit=2)==2
+        assert await relay.relay(limit=2)==2
+        assert await relay.relay(limit=2)==1
+        assert await relay.relay(limit=2)==0
+    asyncio.run(scenario())
+    assert rows=={}
+    assert [c for c, _ in fake.sent]==["table:7", "staff:all", "staff:all", "table:7", "staff:all", "staff:all", "table:7", "staff:all"]
+    assert [m for c, m in fake.sent if c=="staff:all"]==[msgs[i] for i in range(1, 6)]
+
+def test_only_the_lease_holder_relays(monkeypatch):
+    fake=_Redis()
+    monkeypatch.setattr(outbox, "redis", fake)
+    a, b=outbox.OutboxRelay(), outbox.OutboxRelay()
+
+    async def scenario():
+        return await a._lead(), await b._lead(), await a._lead()
+    assert asyncio.run(scenario())==(True, False, True)
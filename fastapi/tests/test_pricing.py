@@ -13,4 +13,58 @@ def test_tax_inclusive():
     res=compute_totals(lines, tax_inclusive=True, tax_rate=Decimal("0.10"))
     assert str(res["subtotal"])=="10.00"
     assert str(res["tax"])=="1.00"
-    assert str(res["total"])=="11.00"
\ No newline at end of file
+    assert str(res["total"])=="11.00"
+
+def test_per_line_tax_rate():
+    lines=[{"quantity":1,"price_each":"10.00","tax_rate":Decimal("0.08")},{"quantity":1,"price_each":"10.00"}]
+    res=compute_totals(lines, tax_inclusive=False, tax_rate=Decimal("0.10"))
+    assert str(res["tax"])=="1.80"
+    assert str(res["total"])=="21.80"
+
+def _reference_totals(line_items, tax_inclusive=False, tax_rate=Decimal("0.10")):
+    # The Decimal-per-line implementation compute_totals replaced; the oracle below.
+    from app.services.pricing import to_decimal, money
+    subtotal = Decimal("0.00")
+    tax = Decimal("0.00")
+    for li in line_items:
+        qty = to_decimal(li.get("quantity", 1))
+        price_each = to_decimal(li.get("price_each", "0"))
+        rate = to_decimal(li["tax_rate"]) if "tax_rate" in li else tax_rate
+        line_sub = qty * price_each
+        if tax_inclusive:
+            base = (line_sub / (Decimal("1.0") + rate))
+            subtotal += base
+            tax += line_sub - base
+        else:
+            subtotal += line_sub
+            tax += line_sub * rate
+    subtotal = money(subtotal)
+    tax = money(tax)
+    return {"subtotal": subtotal, "tax": tax, "total": money(subtotal + tax)}
+
+def test_matches_decimal_reference_on_random_corpus():
+    import random
+    rng=random.Random(20261018)
+    rates=[Decimal(r) for r in ("0", "0.05", "0.08", "0.0825", "0.10", "0.125", "0.2")]
+    for case in range(3000):
+        lines=[]
+        for _ in range(rng.choice((0, 1, 2, 5, 20, 60))):
+            li={"quantity": rng.randint(1, 12), "price_each": str(Decimal(rng.randint(-500, 50000)).scaleb(-2))}
+            if rng.random()<0.6:
+                li["tax_rate"]=rng.choice(rates)
+            lines.append(li)
+        inclusive=rng.random()<0.5
+        default=rng.choice(rates)
+        assert compute_totals(lines, inclusive, default)==_reference_totals(lines, inclusive, default), (case, lines)
+
+def test_price_lines_options_classes_and_line_rounding():
+    from app.services.pricing import price_lines
+    rates={"standard": Decimal("0.10"), "food": Decimal("0.08")}
+    res=price_lines([2, 1, 3], [1005, 250, 333], option_cents=[50, 0, 0], tax_classes=["standard", "food", "food"],
+                    rates=rates, per_line=True)
+    assert res["lines"]==[2110, 250, 999]
+    assert res["line_tax"]==[211, 20, 80]  # 79.92 rounds to 80 on its own
+    assert res["tax_cents"]==211+100  # 211 + round(1249 * 0.08 = 99.92)
+    assert res["total_cents"]==3359+311
+    inc=price_lines([1], [1100], tax_classes=["standard"], rates=rates, tax_inclusive=True)
+    assert (inc["subtotal_cents"], inc["tax_cents"], inc["total_cents"])==(1000, 100, 1100)
@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from app.services.schedule import ScheduleIndex
+
+RULES={
+    "lunch":{"dayparts":[{"days":["mon","tue","wed","thu","fri"],"start":"11:00","end":"14:30"}]},
+    "late":{"dayparts":[{"start":"22:00","end":"02:00"}]},
+    "xmas":{"date_ranges":[{"start":"2026-12-24","end":"2026-12-25"}]},
+}
+IDS=["lunch","late","xmas","always"]
+
+def at(s):
+    return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
+
+def test_dayparts_and_date_ranges():
+    idx=ScheduleIndex(RULES, IDS)
+    assert idx.lookup(at("2026-10-19T12:00"))[1]=={"lunch","always"}      # Monday lunch
+    assert idx.lookup(at("2026-10-18T12:00"))[1]=={"always"}              # Sunday
+    assert idx.lookup(at("2026-10-19T01:30"))[1]=={"late","always"}       # overnight spill-over
+    assert idx.lookup(at("2026-12-24T23:00"))[1]=={"late","xmas","always"}
+
+def test_next_change_and_unrestricted_menu():
+    idx=ScheduleIndex(RULES, IDS)
+    assert idx.next_change(at("2026-10-19T12:00"))==at("2026-10-19T14:30")
+    plain=ScheduleIndex({}, IDS)
+    assert plain.lookup()[1]==frozenset(IDS) and plain.next_change() is None
+
+def test_malformed_rules_do_not_hide_items():
+    idx=ScheduleIndex({"bad":{"dayparts":[{"start":"nope"}]}}, ["bad"])
+    assert "bad" in idx.lookup(at("2026-10-19T12:00"))[1]
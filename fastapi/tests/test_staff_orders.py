@@ -0,0 +1,88 @@
+import asyncio, json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from app.db import Base
+from app.models.orders import Order, OrderItem
+from app.api.staff import orders as staff
+
+class _Session:
+    # The listing's statements run as built on SQLite, one execute() per query.
+    def __init__(self, sync):
+        self.sync=sync
+        self.queries=[]
+    async def execute(self, q):
+        self.queries.append(q)
+        return self.sync.execute(q)
+
+def _db():
+    engine=create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Order.__table__, OrderItem.__table__])
+    db=Session(engine)
+    t0=datetime(2026, 1, 1)
+    states=["served", "submitted", "ready", "served", "accepted", "voided"]
+    for i in range(30):
+        # Pairs of orders share a second, so the cursor has to break ties on id.
+        st=states[i % 6]
+        db.add(Order(id=f"o{i:02d}", table_id=1, state=st, created_at=t0 + timedelta(seconds=i // 2),
+                     ticket_seconds=300 + i if st=="served" else None))
+        for n in range(i % 3):
+            db.add(OrderItem(id=f"o{i:02d}-{n}", order_id=f"o{i:02d}", item_id="m1", title_snapshot=f"Dish {n}",
+                             quantity=2, options={"size": "L"}, state="submitted", created_at=t0 + timedelta(seconds=n)))
+    db.commit()
+    return db
+
+def _page(session, state, cursor, limit):
+    return json.loads(asyncio.run(staff.list_orders(state=state, cursor=cursor, limit=limit, session=session, user=None)).body)
+
+def _walk(session, state):
+    seen, cursor=[], None
+    while True:
+        before=len(session.queries)
+        page=_page(session, state, cursor, 4)
+        assert len(session.queries) - before==2  # the orders, then all their lines
+        seen+=page["orders"]
+        cursor=page["next_cursor"]
+        if not cursor:
+            return seen
+
+def test_pages_walk_every_order_once_in_key_order():
+    db=_db()
+    session=_Session(db)
+    everything=[o["id"] for o in _walk(session, "all")]
+    key=lambda o: (o.state, o.created_at, o.id)
+    assert everything==[o.id for o in sorted(db.query(Order), key=key, reverse=True)]
+
+    active=_walk(session, None)
+    assert {o["state"] for o in active}=={"submitted", "ready", "accepted"}
+    assert len(active)==15
+
+def test_rows_carry_their_lines_and_timers_from_one_clock():
+    session=_Session(_db())
+    page=_page(session, "all", None, 50)
+    assert len(session.queries)==2 and page["next_cursor"] is None
+    rows={o["id"]: o for o in page["orders"]}
+    assert [i["id"] for i in rows["o05"]["items"]]==["o05-0", "o05-1"]
+    assert rows["o05"]["items"][0]=={"id": "o05-0", "item_id": "m1", "title": "Dish 0", "quantity": 2,
+                                     "options": {"size": "L"}, "notes": None, "state": "submitted"}
+    assert rows["o03"]["items"]==[]
+    # Every row is timed against the same instant: elapsed differs exactly as created_at does.
+    assert rows["o00"]["elapsed_s"] - rows["o29"]["elapsed_s"]==14
+    assert rows["o00"]["ticket_s"]==300 and rows["o01"]["ticket_s"] is None
+
+def test_served_stamps_ticket_time_on_the_database_clock(monkeypatch):
+    monkeypatch.setattr(staff.outbox_relay, "kick", lambda: None)
+    o=Order(id="o1", table_id=1, state="ready")
+    added=[]
+    class _Tx:
+        async def execute(self, q):
+            return SimpleNamespace(scalar_one_or_none=lambda: o)
+        def add(self, obj):
+            added.append(obj)
+        async def commit(self):
+            pass
+    assert asyncio.run(staff.served_order("o1", session=_Tx(), user={"uid": "u1"}))=={"ok": True, "state": "served"}
+    sql=str(o.ticket_seconds.compile(dialect=postgresql.dialect()))
+    assert "EXTRACT(epoch FROM now() - orders.created_at)" in sql
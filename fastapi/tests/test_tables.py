@@ -0,0 +1,19 @@
+from app.config import settings
+from app.services.tables import TableResolver, TableRef
+
+def test_resolver_caches_and_drops_entries():
+    r=TableResolver()
+    r.store("abc", TableRef(1, "T1", True))
+    assert r.cached("abc").id==1
+    assert r.cached("nope") is None
+    r.drop("abc")
+    assert r.cached("abc") is None
+    r.store("a", TableRef(1, "T1", True)); r.store("b", TableRef(2, "T2", False))
+    r.drop()
+    assert r.entries=={}
+
+def test_resolver_entries_expire(monkeypatch):
+    r=TableResolver()
+    monkeypatch.setattr(settings, "table_cache_ttl_seconds", 0)
+    r.store("abc", TableRef(1, "T1", True))
+    assert r.cached("abc") is None
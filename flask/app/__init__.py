@@ -196,6 +196,7 @@ def create_app():
         "pool_recycle": 280,  # avoid stale connections
     }
     app.config["UPLOAD_FOLDER"] = upload_dir
+    app.config["MENU_CACHE_TTL"] = int(_get_any(["MENU_CACHE_TTL"], "60"))
 
     # Init extensions
     db.init_app(app)
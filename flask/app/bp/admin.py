@@ -4,6 +4,7 @@ from flask import Blueprint, render_template, request, jsonify, send_file, abort
 from flask_login import login_required
 from sqlalchemy import asc
 from app.util.decorators import roles_required
+from app.util import menu_cache
 from app.model.models import Role, MenuCategory, MenuItem, Table
 from app import db
 
@@ -56,6 +57,7 @@ def add_category():
     c = MenuCategory(name=name, sort_order=sort)
     db.session.add(c)
     db.session.commit()
+    menu_cache.invalidate()
     return jsonify({'ok': True, 'category': {'id': c.id, 'name': c.name, 'sort_order': c.sort_order}})
 
 @bp.post('/api/menu/item')
@@ -73,6 +75,7 @@ def add_item():
     )
     db.session.add(mi)
     db.session.commit()
+    menu_cache.invalidate()
     return jsonify({'ok': True, 'item': mi.to_dict()})
 
 @bp.put('/api/menu/item/<int:item_id>')
@@ -88,6 +91,7 @@ def update_item(item_id):
     if 'image_url' in data: mi.image_url = data['image_url'].strip()
     if 'is_active' in data: mi.is_active = bool(data['is_active'])
     db.session.commit()
+    menu_cache.invalidate()
     return jsonify({'ok': True, 'item': mi.to_dict()})
 
 @bp.delete('/api/menu/item/<int:item_id>')
@@ -97,4 +101,5 @@ def delete_item(item_id):
     mi = MenuItem.query.get_or_404(item_id)
     db.session.delete(mi)
     db.session.commit()
+    menu_cache.invalidate()
     return jsonify({'ok': True})
@@ -1,8 +1,8 @@
-from flask import Blueprint, render_template, request, abort, jsonify
+from flask import Blueprint, current_app, render_template, request, abort, jsonify
 from flask_login import current_user, login_required
-from sqlalchemy import asc
 from app import db, socketio
-from app.model.models import Table, MenuCategory, MenuItem, TableCart, TableCartItem, Order, OrderItem, OrderStatus, table_cart_state
+from app.model.models import Table, MenuItem, TableCart, TableCartItem, Order, OrderItem, OrderStatus, table_cart_state
+from app.util import menu_cache
 
 from flask_socketio import join_room, leave_room, emit
 
@@ -14,15 +14,13 @@ def room_for_table(code: str) -> str:
 @bp.route('/')
 def home():
     # Landing page could explain scanning QR; simple redirect to a demo table if you want
-    return render_template('diner/table.html', table=None, categories=[], items=[])
+    return render_template('diner/table.html', table=None)
 
 @bp.route('/t/<code>')
 def table_page(code):
     table = Table.query.filter_by(code=code).first()
     if not table: abort(404)
-    cats = MenuCategory.query.order_by(asc(MenuCategory.sort_order), asc(MenuCategory.name)).all()
-    items = MenuItem.query.filter_by(is_active=True).all()
-    return render_template('diner/table.html', table=table, categories=cats, items=items)
+    return render_template('diner/table.html', table=table, menu_html=menu_cache.menu_html())
 
 # --- Socket.IO (table rooms) ---
 @socketio.on('join_table')
@@ -42,15 +40,9 @@ def on_leave_table(data):
 # --- REST-ish endpoints to manipulate the cart and orders ---
 @bp.get('/api/menu')
 def api_menu():
-    cats = MenuCategory.query.order_by(MenuCategory.sort_order).all()
-    out = []
-    for c in cats:
-        out.append({
-            'id': c.id,
-            'name': c.name,
-            'items': [i.to_dict() for i in c.items if i.is_active]
-        })
-    return jsonify(out)
+    resp = current_app.response_class(menu_cache.menu_json(), mimetype='application/json')
+    resp.add_etag()
+    return resp.make_conditional(request)
 
 def get_or_create_cart(table_id: int, user_id: int|None):
     cart = TableCart.query.filter_by(table_id=table_id, user_id=user_id).first()
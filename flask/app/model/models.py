@@ -121,31 +121,51 @@ def cents_to_str(cents: int) -> str:
     return f"${cents/100:.2f}"
 
 def table_cart_state(table_id: int):
-    """Aggregate current cart by user and overall for a table."""
-    carts = TableCart.query.filter_by(table_id=table_id).all()
-    users = {c.user_id: (c.user.name if c.user else "Guest") for c in carts}
+    """Aggregate current cart by user and overall for a table.
+
+    One outer-joined query (carts -> users, items -> menu items) regardless of how
+    many carts or lines the table has; rows arrive grouped by cart, in id order.
+    """
+    rows = (
+        db.session.query(
+            TableCart.id, TableCart.user_id, User.name,
+            TableCartItem.id, TableCartItem.menu_item_id, TableCartItem.qty, TableCartItem.notes,
+            MenuItem.name, MenuItem.price_cents,
+        )
+        .select_from(TableCart)
+        .outerjoin(User, User.id == TableCart.user_id)
+        .outerjoin(TableCartItem, TableCartItem.cart_id == TableCart.id)
+        .outerjoin(MenuItem, MenuItem.id == TableCartItem.menu_item_id)
+        .filter(TableCart.table_id == table_id)
+        .order_by(TableCart.id, TableCartItem.id)
+        .all()
+    )
     per_user = {}
     total_cents = 0
     items_flat = []
-    for c in carts:
-        ui = []
-        for it in c.items:
-            price = it.menu_item.price_cents if it.menu_item else 0
-            total_cents += price * it.qty
-            entry = {
-                'cart_item_id': it.id,
-                'menu_item_id': it.menu_item_id,
-                'name': it.menu_item.name if it.menu_item else '',
-                'qty': it.qty,
-                'notes': it.notes,
-                'price_cents': price
+    cart_id = None
+    for cid, user_id, user_name, item_id, menu_item_id, qty, notes, item_name, price_cents in rows:
+        if cid != cart_id:
+            cart_id = cid
+            ui = []
+            per_user[user_id or 0] = {
+                'user_label': user_name or 'Guest',
+                'items': ui
             }
-            ui.append(entry)
-            items_flat.append(entry)
-        per_user[c.user_id or 0] = {
-            'user_label': users.get(c.user_id, 'Guest'),
-            'items': ui
+        if item_id is None:
+            continue  # cart without lines
+        price = price_cents or 0
+        total_cents += price * qty
+        entry = {
+            'cart_item_id': item_id,
+            'menu_item_id': menu_item_id,
+            'name': item_name or '',
+            'qty': qty,
+            'notes': notes,
+            'price_cents': price
         }
+        ui.append(entry)
+        items_flat.append(entry)
     return {
         'per_user': per_user,
         'all_items': items_flat,
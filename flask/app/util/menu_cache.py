@@ -0,0 +1,78 @@
+"""Process-local cache of the diner menu.
+
+The menu only changes through the admin CRUD routes, so the rendered menu
+fragment for /t/<code> and the encoded /api/menu body are built once (with
+categories and items loaded in two queries) and reused until invalidate() is
+called. Entries also expire after MENU_CACHE_TTL seconds so that other worker
+processes and out-of-band edits (seed scripts, db tools) converge.
+"""
+import json
+import threading
+import time
+
+from flask import current_app, render_template
+from markupsafe import Markup
+from sqlalchemy import asc
+from sqlalchemy.orm import selectinload
+
+from app.model.models import MenuCategory
+
+_lock = threading.Lock()
+_entries = {}
+_generation = 0
+
+
+def invalidate():
+    """Drop cached menu renderings; call after committing a menu change."""
+    global _generation
+    with _lock:
+        _entries.clear()
+        _generation += 1
+
+
+def _categories():
+    # Items are loaded with one IN query; MenuItem.category then resolves from
+    # the identity map instead of issuing a lazy SELECT per item.
+    return (
+        MenuCategory.query
+        .options(selectinload(MenuCategory.items))
+        .order_by(asc(MenuCategory.sort_order), asc(MenuCategory.name))
+        .all()
+    )
+
+
+def _cached(key, build):
+    ttl = current_app.config.get("MENU_CACHE_TTL", 60)
+    now = time.monotonic()
+    hit = _entries.get(key)
+    if hit and now - hit[0] < ttl:
+        return hit[1]
+    gen = _generation
+    value = build()
+    with _lock:
+        # An invalidate() while building means the value may already be stale.
+        if gen == _generation:
+            _entries[key] = (now, value)
+    return value
+
+
+def menu_html() -> Markup:
+    """Rendered menu grid for the diner table page."""
+    return _cached(
+        "html",
+        lambda: Markup(render_template("diner/_menu.html", categories=_categories())),
+    )
+
+
+def menu_json() -> bytes:
+    """Encoded /api/menu response body."""
+    def build():
+        out = []
+        for c in _categories():
+            out.append({
+                'id': c.id,
+                'name': c.name,
+                'items': [i.to_dict() for i in c.items if i.is_active]
+            })
+        return json.dumps(out, separators=(",", ":")).encode("utf-8")
+    return _cached("json", build)
@@ -0,0 +1,52 @@
+from flask import Flask
+from sqlalchemy import event
+from app import db
+from app.model.models import User, Table, MenuCategory, MenuItem, TableCart, TableCartItem, table_cart_state
+
+def _app():
+    app=Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    return app
+
+def _seed(carts, lines):
+    db.session.add_all([Table(id=1, code="t1", label="T1"), MenuCategory(id=1, name="Mains")])
+    db.session.add_all([MenuItem(id=i, category_id=1, name=f"Dish {i}", price_cents=100*i) for i in (1, 2, 3)])
+    db.session.add(User(id=1, email="a@x", name="Aki", password_hash="-"))
+    for c in range(1, carts+1):
+        db.session.add(TableCart(id=c, table_id=1, user_id=1 if c==1 else None))
+        db.session.add_all([TableCartItem(cart_id=c, menu_item_id=1+n%3, qty=2, notes="") for n in range(lines)])
+    db.session.commit()
+
+def _count_queries(fn):
+    seen=[]
+    listener=lambda *a, **k: seen.append(a[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        result=fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return result, len(seen)
+
+def test_cart_state_shape():
+    with _app().app_context():
+        db.create_all()
+        _seed(carts=2, lines=2)
+        state=table_cart_state(1)
+        assert state["per_user"][1]["user_label"]=="Aki"
+        assert state["per_user"][0]["user_label"]=="Guest"
+        assert [e["name"] for e in state["per_user"][1]["items"]]==["Dish 1", "Dish 2"]
+        assert len(state["all_items"])==4
+        assert state["total_cents"]==2*(100+200)*2 and state["total_str"]=="$12.00"
+
+def test_cart_state_query_count_is_constant():
+    counts=[]
+    for carts, lines in ((1, 1), (8, 25)):
+        with _app().app_context():
+            db.create_all()
+            _seed(carts, lines)
+            db.session.expunge_all()
+            state, n=_count_queries(lambda: table_cart_state(1))
+            assert len(state["all_items"])==carts*lines
+            counts.append(n)
+    assert counts==[1, 1]